@@ -0,0 +1,195 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Benchmarks for opening packages, iterating resources, loading dataframes, searching the index
+and resolving urls.
+
+Run with:
+
+    python -m benchmarks.run --rows 100000 --save baseline.json
+
+and later compare against the saved results with:
+
+    python -m benchmarks.run --rows 100000 --compare baseline.json
+
+The comparison exits with status 1 if any benchmark is slower than the baseline by more
+than the threshold, and with status 2, without running the benchmarks, if the baseline was run
+with different data sizes.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import timeit
+from statistics import median
+
+# Arguments that set the size of the synthetic data, which must match for results to be comparable
+DATA_ARGS = ('resources', 'rows', 'columns', 'index_size')
+
+
+def time_it(f, repeat=3, number=1):
+    """Return the minimum and median time for one call of f"""
+    times = [t / number for t in timeit.repeat(f, repeat=repeat, number=number)]
+    return {'min': min(times), 'median': median(times)}
+
+
+def make_packages(root, args):
+    from benchmarks.synthetic import make_package
+
+    plain = make_package(root, 'plain', args.resources, args.rows, args.columns, schema=False)
+    schema = make_package(root, 'schema', args.resources, args.rows, args.columns, schema=True)
+    transforms = make_package(root, 'transforms', args.resources, args.rows, args.columns,
+                              schema=True, transforms=True)
+    refs = make_package(root, 'refs', args.resources, 10, 3, schema=False, upstream=schema)
+
+    return {'plain': plain, 'schema': schema, 'transforms': transforms, 'refs': refs}
+
+
+def make_index(path, n):
+    from metapack.index import SearchIndex
+
+    idx = SearchIndex(path)
+
+    for i in range(n):
+        name = 'example{}.com-dataset_{}'.format(i % 50, i)
+        for version in (1, 2):
+            idx.add_entry('ident-{}'.format(i), '{}-{}'.format(name, version), name, version, 'zip',
+                          'metapack+file:/packages/{}-{}.zip'.format(name, version))
+
+    idx.write()
+
+    return SearchIndex(path)
+
+
+def run_benchmarks(args):
+    """Run the benchmarks on synthetic packages in a temporary directory, and return the results"""
+    from collections import deque
+    from os.path import join
+
+    from rowgenerators import parse_app_url
+
+    from metapack import open_package
+
+    results = {}
+
+    def bench(name, f, repeat=args.repeat, number=1):
+        results[name] = time_it(f, repeat, number)
+        print('{:<40} {:>10.4f} {:>10.4f}'.format(name, results[name]['min'], results[name]['median']))
+
+    def consume(itr):
+        deque(itr, maxlen=0)
+
+    with tempfile.TemporaryDirectory(prefix='metapack-bench-') as root:
+        pkgs = make_packages(root, args)
+
+        print('{:<40} {:>10} {:>10}'.format('Benchmark', 'Min', 'Median'))
+
+        for kind in ('plain', 'schema', 'transforms', 'refs'):
+            bench('open_package.{}'.format(kind), lambda: open_package(pkgs[kind]), number=5)
+
+        for kind in ('plain', 'schema', 'transforms'):
+            r = open_package(pkgs[kind]).resource('resource_0')
+
+            bench('iter.{}'.format(kind), lambda: consume(iter(r)))
+            bench('iterdict.{}'.format(kind), lambda: consume(r.iterdict))
+            bench('dataframe.{}'.format(kind), lambda: r.dataframe())
+            bench('read_csv.{}'.format(kind), lambda: r.read_csv())
+
+        ref = open_package(pkgs['refs']).reference('ref_0')
+
+        bench('iter.reference', lambda: consume(iter(ref)))
+
+        def resolve():
+            ref.invalidate_url()
+            return ref.resolved_url
+
+        bench('resolved_url.reference', resolve, number=20)
+
+        url = 'metapack+file:{}/metadata.csv#resource_0'.format(pkgs['schema'])
+
+        bench('parse_app_url.metapack', lambda: parse_app_url(url), number=100)
+        bench('metapack_url.resource', lambda: parse_app_url(url).resource, number=5)
+
+        for backend, file_name in (('json', 'index.json'), ('sqlite', 'index.db')):
+            idx = make_index(join(root, file_name), args.index_size)
+
+            bench('index.search.exact.' + backend, lambda: idx.search('example1.com-dataset_1-2'), number=20)
+            bench('index.search.subset.' + backend, lambda: idx.search('dataset_1'), number=5)
+
+    return results
+
+
+def mismatched_args(args, baseline_args):
+    """Return the names of the data size arguments that differ from those of the baseline"""
+    return [name for name in DATA_ARGS if baseline_args.get(name) != getattr(args, name)]
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison of results to a baseline, and return the names of the benchmarks
+    that regressed"""
+
+    regressions = []
+
+    print('\n{:<40} {:>10} {:>10} {:>8}'.format('Benchmark', 'Baseline', 'Current', 'Ratio'))
+
+    for name, r in sorted(results.items()):
+        if name not in baseline:
+            continue
+
+        b = baseline[name]['min']
+        ratio = r['min'] / b if b else 1
+
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = ' *'
+
+        print('{:<40} {:>10.4f} {:>10.4f} {:>8.2f}{}'.format(name, b, r['min'], ratio, flag))
+
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.run', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-r', '--resources', type=int, default=2, help='Resources per package')
+    parser.add_argument('-n', '--rows', type=int, default=10000, help='Rows per resource')
+    parser.add_argument('-c', '--columns', type=int, default=10, help='Columns per resource')
+    parser.add_argument('-i', '--index-size', type=int, default=5000, help='Number of packages in the search index')
+    parser.add_argument('-R', '--repeat', type=int, default=3, help='Number of times to repeat each benchmark')
+    parser.add_argument('-s', '--save', help='Save the results to a JSON file')
+    parser.add_argument('-C', '--compare', help='Compare the results to a JSON file of saved results')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='Fractional slowdown, relative to the compared results, that counts as a regression')
+
+    args = parser.parse_args(args)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        mismatched = mismatched_args(args, baseline.get('args', {}))
+
+        if mismatched:
+            print("Can't compare to '{}', which was run with different values of: {}"
+                  .format(args.compare, ', '.join(mismatched)), file=sys.stderr)
+            return 2
+
+    results = run_benchmarks(args)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=4)
+
+    if args.compare:
+        if compare(results, baseline['results'], args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Generate synthetic filesystem packages for benchmarks.
+
+Each package has `resources` CSV data files of `rows` x `columns` values. Depending on the options,
+resources have schemas, schemas with transforms, and the package has references to the resources
+of another package through metapack+ urls.
+"""
+
+import csv
+from os import makedirs
+from os.path import join
+
+METADATA_HEADER = """Declare,metatab-latest
+Title,Synthetic benchmark package
+Identifier,{ident}
+Name,example.com-{name}-1
+Dataset,{name}
+Origin,example.com
+Version,1
+
+"""
+
+
+def write_data(path, rows, columns):
+    with open(path, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['id', 'label'] + ['col_{}'.format(i) for i in range(columns - 2)])
+        for i in range(rows):
+            w.writerow([i, 'label-{}'.format(i % 100)] + [(i * j) % 1000 for j in range(columns - 2)])
+
+
+def make_package(root, name, resources=2, rows=1000, columns=10, schema=True, transforms=False,
+                 upstream=None):
+    """Write a package to `root/name` and return the path to the package directory.
+
+    :param upstream: Path to another package. If set, the package has a metapack+ reference to each of the
+        resources in the upstream package
+    """
+    from uuid import uuid5, NAMESPACE_URL
+
+    pkg_dir = join(root, name)
+    makedirs(join(pkg_dir, 'data'), exist_ok=True)
+
+    lines = [METADATA_HEADER.format(ident=uuid5(NAMESPACE_URL, name), name=name)]
+
+    if upstream:
+        lines.append('Section,References,Name')
+        for i in range(resources):
+            lines.append('Reference,metapack+file:{}/metadata.csv#resource_{},ref_{}'.format(upstream, i, i))
+        lines.append('')
+
+    lines.append('Section,Resources,Name,Schema')
+
+    for i in range(resources):
+        write_data(join(pkg_dir, 'data', 'resource_{}.csv'.format(i)), rows, columns)
+        lines.append('Datafile,data/resource_{}.csv,resource_{},{}'.format(i, i, 'schema' if schema else ''))
+
+    if schema:
+        lines.append('')
+        lines.append('Section,Schema,DataType,Transform')
+        lines.append('Table,schema')
+        lines.append('Table.Column,id,integer,')
+        lines.append('Table.Column,label,string,{}'.format('str(v).upper()' if transforms else ''))
+        for i in range(columns - 2):
+            lines.append('Table.Column,col_{},integer,{}'.format(i, 'int(v)+1' if transforms else ''))
+
+    with open(join(pkg_dir, 'metadata.csv'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return pkg_dir
@@ -6,26 +6,49 @@ Record objects for the Simple Data Package format.
 
 from rowgenerators import get_cache # noqa: 401
 from .exc import *  # noqa: 403
-from .doc import MetapackDoc, Resolver  # noqa: 401
-from .package import open_package,  multi_open, Downloader, walk_packages  # noqa: 401
+from .package import open_package,  multi_open, Downloader, walk_packages, enable_doc_cache, disable_doc_cache  # noqa: 401
 from .appurl import MetapackUrl, MetapackDocumentUrl, MetapackResourceUrl, MetapackPackageUrl  # noqa: 401
-from .terms import Resource  # noqa: 401
 from metapack.appurl import is_metapack_url  # noqa: 401
 import rowgenerators.appurl.url  # noqa: 401
 from rowgenerators import set_default_cache_name  # noqa: 401
-from pkg_resources import get_distribution, DistributionNotFound  # noqa: 401
-import metapack.jupyter  # noqa: 401
 
 # from metapack.jupyter.magic import load_ipython_extension, unload_ipython_extension
 
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    __version__ = 'unknown'
-finally:
-    del get_distribution, DistributionNotFound
+# Attributes that are imported on first use, because their modules are slow to import; the terms
+# module imports pandas, and the jupyter module is only used in notebooks.
+_lazy_attributes = {
+    'MetapackDoc': ('metapack.doc', 'MetapackDoc'),
+    'Resolver': ('metapack.doc', 'Resolver'),
+    'Resource': ('metapack.terms', 'Resource'),
+    'jupyter': ('metapack.jupyter', None),
+}
+
+
+def __getattr__(name):
+    from importlib import import_module
+
+    if name == '__version__':
+        from .util import package_version
+        v = package_version(__name__) or 'unknown'
+
+    elif name in _lazy_attributes:
+        module_name, attr = _lazy_attributes[name]
+        v = import_module(module_name)
+        if attr:
+            v = getattr(v, attr)
+
+    else:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+    globals()[name] = v
+
+    return v
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attributes) + ['__version__'])
+
 
 set_default_cache_name('metapack')
 
 rowgenerators.appurl.url.default_downloader = Downloader.get_instance()
-
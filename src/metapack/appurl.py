@@ -84,9 +84,9 @@ class MetapackDocumentUrl(Url, _MetapackUrl):
     @property
     def doc(self):
         """Return the metatab document for the URL"""
-        from metapack import MetapackDoc
+        from metapack.package import open_doc
         t = self.get_resource().get_target()
-        return MetapackDoc(t, package_url=self.package_url)
+        return open_doc(t, package_url=self.package_url)
 
     @property
     def generator(self):
@@ -0,0 +1,114 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Vectorized casting of whole dataframe columns to schema datatypes, for schemas that only
+use plain datatypes, so the per-cell casting in the row processor can be skipped.
+"""
+
+# Schema datatypes that can be cast with vectorized operations
+PLAIN_DATATYPES = (None, 'string', 'text', 'str', 'integer', 'int', 'number', 'float', 'date', 'datetime')
+
+# Maximum number of error messages recorded per column
+MAX_COLUMN_ERRORS = 20
+
+
+def _blank(s):
+    """Return a boolean Series that is true for null and empty values"""
+    return s.isna() | (s.astype(str).str.strip() == '')
+
+
+def _record_errors(errors, header, s, failed, datatype):
+    if failed.any():
+        errs = errors.setdefault(header, set())
+        for v in s[failed].unique()[:MAX_COLUMN_ERRORS]:
+            errs.add("Failed to cast '{}' to '{}' in column '{}'".format(v, datatype, header))
+
+
+def _to_int(v):
+    from decimal import Decimal
+
+    return int(Decimal(str(v).strip()))
+
+
+def _to_datetime(s):
+    """Parse each value separately, as the row processor does, rather than inferring one format
+    from the first value"""
+    import pandas as pd
+
+    if int(pd.__version__.split('.')[0]) >= 2:
+        return pd.to_datetime(s, errors='coerce', format='mixed')
+
+    return pd.to_datetime(s, errors='coerce')  # Older versions parse each value by default
+
+
+def _cast_integer(s, blank, datatype, header, errors):
+    """Cast to integers. Strings of digits are parsed exactly, rather than through floats, which can't
+    hold all 64 bit integers; other numbers, like '3.0', must be whole numbers"""
+    import pandas as pd
+
+    text = s.astype(str).str.strip()
+    digits = text.str.fullmatch(r'[+-]?\d+').fillna(False).astype(bool) & ~blank
+
+    v = pd.to_numeric(text.where(~blank & ~digits), errors='coerce')
+    whole = v.notna() & (v == v.round())
+
+    _record_errors(errors, header, s, ~blank & ~digits & ~whole, datatype)
+
+    ints = pd.to_numeric(text[digits], errors='coerce')
+
+    try:
+        if digits.any() and not pd.api.types.is_signed_integer_dtype(ints):
+            raise OverflowError()
+
+        # Assign arrays; assigning Series aligns them through float64
+        out = pd.Series(pd.NA, index=s.index, dtype='Int64')
+        out[digits] = ints.to_numpy()
+        out[whole] = v[whole].astype('Int64').array
+
+        return out
+    except (TypeError, ValueError, OverflowError):
+        # Values outside of the int64 range; keep Python ints in an object column, like the row processor
+        return pd.Series([_to_int(e) if ok else None for e, ok in zip(text, digits | whole)],
+                         index=s.index, dtype=object)
+
+
+def cast_column(s, datatype, header, errors):
+    """Cast a Series of source values to a schema datatype. Values that fail to cast become nulls, and
+    the failures are recorded in `errors`, a dict of column header to a set of messages """
+    import pandas as pd
+
+    if datatype in (None, 'string', 'text', 'str'):
+        return s
+
+    blank = _blank(s)
+
+    if datatype in ('integer', 'int'):
+        return _cast_integer(s, blank, datatype, header, errors)
+
+    if datatype in ('number', 'float'):
+        v = pd.to_numeric(s.where(~blank), errors='coerce')
+        _record_errors(errors, header, s, v.isna() & ~blank, datatype)
+        return v.astype('float64')
+
+    if datatype in ('date', 'datetime'):
+        v = _to_datetime(s.where(~blank))
+        _record_errors(errors, header, s, v.isna() & ~blank, datatype)
+
+        if datatype == 'date':
+            # The row processor produces date objects, which pandas keeps in an object column
+            return v.dt.date.where(v.notna(), None)
+
+        return v
+
+    raise ValueError("Can't vectorize casting to datatype '{}'".format(datatype))
+
+
+def cast_frame(df, datatypes, errors):
+    """Cast all of the columns of a dataframe, in place, with a list of datatypes in the same
+    order as the columns """
+
+    for i, datatype in enumerate(datatypes):
+        df.isetitem(i, cast_column(df.iloc[:, i], datatype, df.columns[i], errors))
+
+    return df
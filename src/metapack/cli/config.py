@@ -5,15 +5,11 @@
 
 """
 
-from pkg_resources import (
-    DistributionNotFound,
-    get_distribution,
-    iter_entry_points
-)
 from tabulate import tabulate
 
 from metapack.cli.core import err, prt
 from metapack.package import Downloader
+from metapack.util import entry_point_dist, entry_points, package_version
 
 downloader = Downloader.get_instance()
 
@@ -54,7 +50,7 @@ def config(args):
     try:
 
         if args.version:
-            prt(get_distribution('metapack'))
+            prt('metapack', package_version('metapack'))
 
         elif args.cache:
             prt(downloader.cache.getsyspath('/'))
@@ -89,17 +85,16 @@ def print_versions():
 
     packages = []
     for pkg_name in main_packages:
-        try:
-            d = get_distribution(pkg_name)
-            packages.append([d.project_name, d.version])
+        version = package_version(pkg_name)
 
-        except (DistributionNotFound, ModuleNotFoundError) as e:
-            # package is not installed
-            print(e)
+        if version:
+            packages.append([pkg_name, version])
+        else:
+            print("The '{}' distribution was not found".format(pkg_name))
 
     prt(tabulate(packages, headers='Package Version'.split()))
     prt('')
-    prt(tabulate([(ep.name, ep.dist) for ep in iter_entry_points(group='mt.subcommands')],
+    prt(tabulate([(ep.name, entry_point_dist(ep)) for ep in entry_points('mt.subcommands')],
                  headers='Subcommand Package Version'.split()))
 
 
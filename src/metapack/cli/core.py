@@ -176,7 +176,7 @@ def dump_schema(doc, name):
 
 
 def get_table(doc, name):
-    t = doc.find_first('Root.Table', value=name)
+    t = doc.table(name)
 
     if not t:
 
@@ -296,7 +296,7 @@ type_map = {
 
 
 class MetapackCliMemo(object):
-    def __init__(self, args, downloader):
+    def __init__(self, args, downloader, writable=False):
         from os import getcwd
         from os.path import join
 
@@ -307,6 +307,8 @@ class MetapackCliMemo(object):
 
         self.cache = self.downloader.cache
 
+        self.writable = writable  # The command will modify the doc, so don't use a shared cached doc
+
         self.config = get_config()
 
         frag = ''
@@ -378,9 +380,9 @@ class MetapackCliMemo(object):
 
     @property
     def doc(self):
-        from metapack import MetapackDoc
+        from metapack.package import open_doc
         if self._doc is None:
-            self._doc = MetapackDoc(self.mt_file)
+            self._doc = open_doc(self.mt_file, writable=self.writable)
 
         return self._doc
 
@@ -420,7 +422,6 @@ def get_config():
     from os import environ
     from os.path import expanduser
     from pathlib import Path
-    import yaml
 
     def pexp(p):
         try:
@@ -440,16 +441,37 @@ def get_config():
         p = pexp(p)
 
         if p.exists():
-            with p.open() as f:
-                config = yaml.safe_load(f)
-                if not config:
-                    config = {}
-
-                config['_loaded_from'] = str(p)
+            config = dict(_load_config_file(p))
 
     return config
 
 
+_config_cache = {}
+
+
+def _load_config_file(p):
+    """Load a config file, caching it until the file changes, for processes that run many commands"""
+    import yaml
+
+    st = p.stat()
+    key = (str(p), st.st_mtime_ns, st.st_size)
+
+    if key not in _config_cache:
+        with p.open() as f:
+            config = yaml.safe_load(f)
+            if not config:
+                config = {}
+
+            config['_loaded_from'] = str(p)
+
+        for k in [k for k in _config_cache if k[0] == key[0]]:
+            del _config_cache[k]  # An older version of the file
+
+        _config_cache[key] = config
+
+    return _config_cache[key]
+
+
 def list_rr(doc):
     d = []
     for r in doc.resources():
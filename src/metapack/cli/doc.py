@@ -109,6 +109,9 @@ def doc_args(subparsers):
 
 
 def graph_cmd(args):
+    from metapack.package import enable_doc_cache
+
+    enable_doc_cache()  # The dependency walk re-opens the same upstream packages many times
 
     m = MetapackCliMemo(args, downloader)
 
@@ -280,6 +283,9 @@ def nodes_edges(m):
     return nodes, list(edges)
 
 def deps_cmd(args):
+    from metapack.package import enable_doc_cache
+
+    enable_doc_cache()  # The dependency walk re-opens the same upstream packages many times
 
     m = MetapackCliMemo(args, downloader)
 
@@ -15,13 +15,10 @@ from os.path import join
 from rowgenerators import parse_app_url
 from rowgenerators.appurl.file import FileUrl
 from rowgenerators.appurl.web import S3Url
-from rowgenerators.exceptions import RowGeneratorError
 from tabulate import tabulate
 
-from metapack.constants import PACKAGE_PREFIX
-from metapack.exc import MetatabFileNotFound
 from metapack.index import SearchIndex, search_index_file
-from metapack.package import Downloader, open_package
+from metapack.package import Downloader
 
 from .core import err, prt
 
@@ -31,7 +28,8 @@ downloader = Downloader.get_instance()
 def index_args(subparsers):
     """Index packages for searching.
 
-    The index file is a JSON file, which is by default index.json in the cache.
+    The index file is a SQLite database, which is by default index.db in the cache. An
+    existing index.json file in the same directory is imported when the database is created.
     The file can be moved by setting the METAPACK_SEARCH_INDEX environmental variable.
 
     """
@@ -69,59 +67,84 @@ def index_args(subparsers):
     parser.add_argument('-r', '--result', action='store_true', default=False,
                         help="If mp -q flag set, still report results")
 
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of threads to use for opening packages")
+
+    parser.add_argument('-F', '--force', default=False, action='store_true',
+                        help="Re-index all packages, including those that have not changed since the last run")
+
     parser.add_argument('metatab_url', nargs='?', default='./',
                         help='URL to a metatab package or container for packages')
 
 
 def walk_packages(args, u):
-    from os import walk
-    from os.path import islink, join, isdir
+    from metapack.package import PACKAGE_FILE_FORMATS, walk_packages
+
+    # Notebooks aren't indexed, so don't bother opening them
+    formats = tuple(f for f in PACKAGE_FILE_FORMATS if f != 'ipynb')
+
+    yield from walk_packages(u.path, workers=args.jobs, formats=formats)
+
 
-    seen = set()
+def index_directory(args, u, idx):
+    """Index the packages under a directory. Only the packages whose source file has changed since they were
+    last indexed are opened, and the entries for sources that no longer exist are removed. Returns the number
+    of packages indexed, unchanged and removed"""
+    from os.path import abspath, sep
 
-    # Try all files as packages
-    if not isdir(u.path):
-        try:
-            yield open_package(u.path)
-        except (RowGeneratorError, MetatabFileNotFound):
-            pass
+    from metapack.index import source_fingerprint
+    from metapack.package import PACKAGE_FILE_FORMATS, open_candidates, package_candidates
 
-        return
+    root = abspath(u.path)
 
-    for root, dirs, files in walk(u.path):
+    manifest = idx.manifest()
 
-        try:
-            p = open_package(root)
+    # Notebooks aren't indexed, so don't bother opening them
+    formats = tuple(f for f in PACKAGE_FILE_FORMATS if f != 'ipynb')
 
-            # This was a package, so only recurse if it is a source package and has a _packages dir
+    found = set()
+    fingerprints = {}
+    n_unchanged = 0
+
+    def changed_candidates():
+        nonlocal n_unchanged
+
+        for path in package_candidates(root, formats):
+            path = abspath(path)
+            found.add(path)
+
+            fp = source_fingerprint(path)
+            e = manifest.get(path)
+
+            if not args.force and e and [e['mtime'], e['size']] == fp:
+                n_unchanged += 1
+                continue
 
-            if PACKAGE_PREFIX in dirs:
-                del dirs[:]
-                dirs.append(PACKAGE_PREFIX)
-            else:
-                del dirs[:]
+            fingerprints[path] = fp
+            yield path
 
-            if str(p.ref) not in seen:
-                yield p
+    opened = set()
 
-            seen.add(str(p.ref))
+    for path, p in open_candidates(changed_candidates(), args.jobs):
+        if p.ref.get_resource().get_target().target_format == 'ipynb':
             continue
 
-        except (RowGeneratorError, MetatabFileNotFound):
-            # directory is not a package, carry on
-            pass
+        prt('Adding: ', p.ref)
+        key = idx.add_package(p)
+        idx.set_source(path, fingerprints[path], p.get_value('Root.Modified'), p.get_value('Root.Version'), [key])
+        opened.add(path)
 
-        for f in files:
-            if not islink(join(root, f)):
-                try:
+    # Sources under the root that have disappeared, or have changed and are no longer packages
+    removed = [path for path in manifest
+               if (path == root or path.startswith(root + sep)) and
+               (path not in found or (path in fingerprints and path not in opened))]
 
-                    p = open_package(join(root, f))
-                    if str(p.ref) not in seen:
-                        yield p
-                    seen.add(str(p.ref))
-                except (RowGeneratorError, MetatabFileNotFound):
-                    # directory is not a package, carry on
-                    pass
+    for path in removed:
+        prt('Removing: ', path)
+
+    idx.remove_sources(removed)
+
+    return len(opened), n_unchanged, len(removed)
 
 
 def write_s3(m):
@@ -176,21 +199,14 @@ def index(args):
     elif args.load:
         load_index(args, idx)
     elif isinstance(u, FileUrl):
-        entries = []
-        for p in walk_packages(args, u):
-            if p.ref.get_resource().get_target().target_format == 'ipynb':
-                continue
-            prt('Adding: ', p.ref)
-            idx.add_package(p)
-            entries.append(p.name)
-            n_indexed += 1
+        n_indexed, n_unchanged, n_removed = index_directory(args, u, idx)
 
         write_index = True
 
-        prt("Indexed ", len(entries), 'entries')
+        prt("Indexed ", n_indexed, 'entries;', n_unchanged, 'unchanged,', n_removed, 'removed')
 
     elif isinstance(u, S3Url):
-        index_s3(u, idx)
+        n_indexed = index_s3(args, u, idx)
 
         if args.write:
             from metapack.package.s3 import S3Bucket
@@ -212,35 +228,23 @@ def index(args):
         idx.write()
 
 
-def index_s3(u, idx):
+def index_s3(args, u, idx):
     # S3 package collections are flat, so we don't have to walk recursively.
-    # However, we are only going to take the S3 packages, because they have the distribution
-    # information for the rest of the packages, so we can get info about Excel and Zip packages
-    # without opening them.
-    entries = []
-    import re
-
-    for e in u.list():
+    from metapack import s3index
 
-        if e.target_format == 'csv':
+    workers = args.jobs or s3index.DEFAULT_WORKERS
 
-            prt("Processing ", e)
+    def callback(key, entries):
+        prt("Processing ", key)
 
-            p = open_package(e)
-
-            for d in p.find('Root.Distribution'):
-                u = parse_app_url(d.value)
-
-                version_m = re.search('-([^-]+)$', p.name)
-
-                if u.target_format in ('xlsx', 'zip', 'csv'):
-                    idx.add_entry(p.identifier, p.name, p.nonver_name, version_m.group(1), u.target_format,
-                                  'metapack+' + str(u))
-
-                    entries.append(p.name)
+    n_indexed, n_unchanged, n_removed = s3index.index_s3(idx, u.netloc, u.path.lstrip('/'),
+                                                         client=s3index.s3_client(args.profile, workers=workers),
+                                                         workers=workers, force=args.force, callback=callback)
     idx.write()
 
-    prt("Indexed ", len(entries), 'entries to ', idx.path)
+    prt("Indexed ", n_indexed, 'objects;', n_unchanged, 'unchanged,', n_removed, 'removed, to', idx.path)
+
+    return n_indexed
 
 
 def dump_index(args, idx):
@@ -9,17 +9,17 @@ The program uses the Root.Distributions in the source package to locate packages
 """
 import argparse
 import sys
-from pkg_resources import (
-    DistributionNotFound,
-    get_distribution,
-    iter_entry_points
-)
 
 from tabulate import tabulate
 
 from metapack.cli.core import err, prt, warn
 from metapack.package import Downloader
-from metapack.util import iso8601_duration_as_seconds
+from metapack.util import (
+    entry_point_dist,
+    entry_points,
+    iso8601_duration_as_seconds,
+    package_version
+)
 
 from .core import MetapackCliMemo as _MetapackCliMemo
 
@@ -177,18 +177,14 @@ def print_versions(m):
 
     packages = []
     for pkg_name in main_packages:
-        try:
-            d = get_distribution(pkg_name)
-            packages.append([d.project_name, d.version])
-
-        except (DistributionNotFound, ModuleNotFoundError):
-            # package is not installed
+        version = package_version(pkg_name)
 
-            pass
+        if version:  # Else, the package is not installed
+            packages.append([pkg_name, version])
 
     prt(tabulate(packages, headers='Package Version'.split()))
     prt('')
-    prt(tabulate([(ep.name, ep.dist) for ep in iter_entry_points(group='mt.subcommands')],
+    prt(tabulate([(ep.name, entry_point_dist(ep)) for ep in entry_points('mt.subcommands')],
                  headers='Subcommand Package Version'.split()))
 
 
@@ -9,23 +9,84 @@ Root program for metapack programs
 import argparse
 import logging
 import sys
-from pkg_resources import (
-    DistributionNotFound,
-    get_distribution,
-    iter_entry_points
-)
 
 from metapack import Downloader
 from metapack.cli.core import cli_init, warn
+from metapack.util import entry_points, package_version
 
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    # package is not installed
-    pass
+__version__ = package_version('metapack')
 
 
-def base_parser():
+SUBCOMMAND_GROUP = 'mt.subcommands'
+
+
+def _manifest_path():
+    from os.path import join
+
+    return join(Downloader.get_instance().cache.getsyspath('/'), 'subcommands.json')
+
+
+def _entry_points_key(eps):
+    from metapack.util import entry_point_dist
+
+    return [[ep.name, ep.value, entry_point_dist(ep)] for ep in eps]
+
+
+def _subcommands(f):
+    """Return the name, help and aliases of each of the subcommands that a registration function adds"""
+
+    subparsers = argparse.ArgumentParser().add_subparsers()
+    f(subparsers)
+
+    helps = {a.dest: a.help for a in subparsers._choices_actions}
+
+    names = {}  # Aliases share the parser of the subcommand, which is added first
+    for name, p in subparsers.choices.items():
+        names.setdefault(id(p), []).append(name)
+
+    return [[n[0], helps.get(n[0]), n[1:]] for n in names.values()]
+
+
+def load_subcommand_manifest(eps):
+    """Return the cached subcommands for each entry point, or None if the cache is missing or
+    was made for a different set of entry points"""
+    import json
+
+    try:
+        with open(_manifest_path()) as f:
+            m = json.load(f)
+
+        if m['key'] == _entry_points_key(eps):
+            return m['subcommands']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return None
+
+
+def write_subcommand_manifest(eps, subcommands):
+    import json
+    import os
+
+    path = _manifest_path()
+    tmp = '{}.{}'.format(path, os.getpid())
+
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({'key': _entry_points_key(eps), 'subcommands': subcommands}, f)
+
+        os.replace(tmp, path)
+    except OSError:
+        pass  # The cache is only an optimization
+
+
+def _chosen_subcommand(args):
+    """Return the subcommand name in a list of arguments. The global options are all flags,
+    so it is the first argument that isn't an option"""
+    return next((a for a in args if not a.startswith('-')), None)
+
+
+def base_parser(args=None):
     """Entry program for running Metapack commands.
     """
     parser = argparse.ArgumentParser(
@@ -48,9 +109,36 @@ def base_parser():
 
     subparsers = parser.add_subparsers(help='Commands')
 
-    for ep in iter_entry_points(group='mt.subcommands'):
-        f = ep.load()
-        f(subparsers)
+    eps = entry_points(SUBCOMMAND_GROUP)
+
+    # With no arguments, build the complete parser, as for the documentation. Otherwise, use the
+    # cached names and help of the subcommands, and load only the module of the chosen subcommand.
+    manifest = load_subcommand_manifest(eps) if args is not None else None
+    chosen = _chosen_subcommand(args) if args is not None else None
+
+    def provides(ep_name):
+        return any(chosen == name or chosen in aliases for name, _, aliases in manifest.get(ep_name, []))
+
+    if manifest is None or (chosen and not any(provides(ep.name) for ep in eps)):
+        manifest = {}
+
+        for ep in eps:
+            f = ep.load()
+            manifest[ep.name] = _subcommands(f)
+            f(subparsers)
+
+        if args is not None:
+            write_subcommand_manifest(eps, manifest)
+
+        return parser
+
+    for ep in eps:
+        if chosen and provides(ep.name):
+            ep.load()(subparsers)
+        else:
+            for name, help, aliases in manifest[ep.name]:
+                kwargs = {'help': help} if help is not None else {}
+                subparsers.add_parser(name, aliases=aliases, **kwargs)
 
     return parser
 
@@ -62,10 +150,23 @@ def setup_downloader(args):
 
 
 def mp(args=None, do_cli_init=True):
+    from os import environ
+
     from .core import err
 
+    args = sys.argv[1:] if args is None else args
+
+    # Run the command in the `mp serve` daemon, if there is one
+    if environ.get('METAPACK_SOCKET') and _chosen_subcommand(args) != 'serve':
+        from .serve import forward
+
+        code = forward(environ['METAPACK_SOCKET'], args)
+
+        if code is not None:
+            return code
+
     try:
-        parser = base_parser()
+        parser = base_parser(args)
 
         parsed_args = parser.parse_args(args)
 
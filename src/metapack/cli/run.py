@@ -90,8 +90,13 @@ def run(subparsers):
 
     output_group = parser.add_argument_group("General output options")
 
-    output_group.add_argument('-S', '--sample', type=str, help="Sample values from a column")
+    output_group.add_argument('-S', '--sample', type=str, help="Count the values of a column in a random "
+                                                               "sample of rows. Set the sample size with -L")
+    output_group.add_argument('-K', '--sketch', action='store_true', help="With -S, estimate the distinct "
+                                                                          "and most common values of all rows")
     output_group.add_argument('-L', '--limit', type=int,  help="Limit the number of output rows ")
+    output_group.add_argument('-O', '--offset', type=int, help="Skip rows before the output rows. Local CSV files "
+                                                               "are read from the offset with a row index")
     output_group.add_argument('-N', '--number', action='store_true', help="Add line numbers as the first column")
     output_group.add_argument('-n', '--no-schema', action='store_true', help="Don't use the schema to tansform the "
                                                                              "data ")
@@ -99,6 +104,20 @@ def run(subparsers):
     parser.set_defaults(handler=None)
 
 
+def offset_rows(r, offset):
+    """Iterate the headers and the rows of a resource after skipping `offset` rows"""
+    from itertools import chain
+
+    if not offset:
+        return r
+
+    try:
+        return r.rows(offset)
+    except AttributeError:  # A row generator, for --no-schema
+        itr = iter(r)
+        return chain([next(itr)], islice(itr, offset, None))
+
+
 def run_run(args):
 
     m = MetapackCliMemo(args, downloader)
@@ -126,13 +145,21 @@ def run_run(args):
         list_rr(doc)
         sys.exit(1)
 
-    if m.args.sample:
+    if m.args.sample and m.args.sketch:
+
+        s = r.sketch(m.args.sample)
+
+        prt("{} rows, about {} distinct values".format(s.n, s.distinct))
+        prt(tabulate(s.most_common(10), headers='Value Count'.split()))
+
+    elif m.args.sample:
 
         from collections import Counter
 
         limit = m.args.limit if m.args.limit else 5000
 
-        c = Counter( r[m.args.sample] for r in islice(r.iterrows, None, limit))
+        # The sample is drawn from the whole resource, not just the first rows
+        c = Counter(row[0] for row in islice(r.sample(limit, columns=[m.args.sample]), 1, None))
 
         prt(tabulate(c.most_common(10), headers='Value Count'.split()))
 
@@ -144,20 +171,20 @@ def run_run(args):
 
         if m.args.truncate and not m.args.pivot:
             rows = []
-            for row in islice(r, None, limit):
+            for row in islice(offset_rows(r, m.args.offset), None, limit):
                 rows.append( str(c)[:m.args.truncate] for c in row)
 
         elif m.args.truncate and m.args.pivot:
             # Don't truncate the column names when pivoting
             rows = []
-            for i, row in enumerate(islice(r, None, limit)):
+            for i, row in enumerate(islice(offset_rows(r, m.args.offset), None, limit)):
                 if i == 0:
                     rows.append(row)
                 else:
                     rows.append(str(c)[:m.args.truncate] for c in row)
 
         else:
-            rows = list(islice(r, None, limit))
+            rows = list(islice(offset_rows(r, m.args.offset), None, limit))
 
         if m.args.pivot:
             rows = list(zip(*rows))
@@ -221,11 +248,11 @@ def run_run(args):
                 print(j, j,end='')
         elif m.args.tabs:
             w = csv.writer(sys.stdout, delimiter='\t')
-            for i,j in enumerate(gen_wrap(r)):
+            for i,j in enumerate(gen_wrap(offset_rows(r, m.args.offset))):
                 w.writerow(j)
 
         else: # m.args.csv:
 
             w = csv.writer(sys.stdout)
-            for i,j in enumerate(gen_wrap(r)):
+            for i,j in enumerate(gen_wrap(offset_rows(r, m.args.offset))):
                 w.writerow(j)
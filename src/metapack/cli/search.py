@@ -18,7 +18,8 @@ downloader = Downloader.get_instance()
 def search(subparsers):
     """Index packages for searching.
 
-    The index file is a JSON file, which is by default index.json in the cache.
+    The index file is a SQLite database, which is by default index.db in the cache. An
+    existing index.json file in the same directory is imported when the database is created.
     The file can be moved by setting the METAPACK_SEARCH_INDEX environmental variable.
 
     """
@@ -0,0 +1,321 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Run mp commands in a persistent daemon, so the interpreter startup, module imports and
+document parsing are paid once, rather than on every command.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+from metapack import Downloader
+from metapack.cli.core import err, prt
+
+downloader = Downloader.get_instance()
+
+SOCKET_ENV = 'METAPACK_SOCKET'
+
+
+def serve_args(subparsers):
+    """
+    The `mp serve` command runs a daemon that executes mp commands for thin clients. The daemon imports
+    the subcommand modules and pandas once, and keeps a cache of the opened documents. Each command runs
+    in a process forked from the daemon, so commands can't interfere with each other or with the daemon.
+
+    Set the METAPACK_SOCKET environmental variable to the socket path to make mp a client of the daemon:
+
+        mp serve --socket /tmp/mp.sock &
+        export METAPACK_SOCKET=/tmp/mp.sock
+        mp run metadata.csv#resource
+
+    The client passes its stdin, stdout and stderr to the daemon, so output is written directly to the
+    client's terminal or pipe. If the daemon is not running, mp runs the command itself.
+    """
+    parser = subparsers.add_parser(
+        'serve',
+        help='Run a daemon that executes mp commands for thin clients',
+        description=serve_args.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+
+    parser.set_defaults(run_command=run_serve)
+
+    parser.add_argument('-s', '--socket',
+                        help="Path of the unix socket. Defaults to the value of METAPACK_SOCKET, or "
+                             "'mp.sock' in the cache directory")
+
+    parser.add_argument('-C', '--cache-size', type=int, default=256,
+                        help='Maximum number of documents to keep in the document cache')
+
+    parser.add_argument('-p', '--preload', nargs='*', default=[],
+                        help='Packages to open when the daemon starts')
+
+    return parser
+
+
+def default_socket_path():
+    from os.path import join
+
+    return os.environ.get(SOCKET_ENV) or join(downloader.cache.getsyspath('/'), 'mp.sock')
+
+
+def send_command(sock, argv):
+    """Send a command, the environment and the stdio file descriptors to the daemon. The descriptors
+    are attached to the length prefix of the message"""
+    import array
+    import json
+    import struct
+
+    msg = json.dumps({'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)}).encode('utf8')
+
+    sock.sendmsg([struct.pack('!I', len(msg))],
+                 [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [0, 1, 2]))])
+    sock.sendall(msg)
+
+
+def receive_command(sock):
+    """Receive a command from a client, returning a dict with the argv, cwd, env and fds of the command"""
+    import array
+    import json
+    import struct
+
+    fds = array.array('i')
+
+    head, ancdata, _, _ = sock.recvmsg(4, socket.CMSG_LEN(3 * fds.itemsize))
+
+    for level, type_, data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+
+    if len(head) != 4 or len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError('Malformed command')
+
+    size, = struct.unpack('!I', head)
+
+    with sock.makefile('rb') as f:
+        msg = f.read(size)
+
+    command = json.loads(msg.decode('utf8'))
+    command['fds'] = list(fds)
+
+    return command
+
+
+def forward(socket_path, argv):
+    """Run a command in the daemon, and return its exit code, or None if the daemon isn't running"""
+    import json
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile('rb') as f:
+        send_command(sock, argv)
+
+        pid = None
+
+        while True:
+            try:
+                line = f.readline()
+            except KeyboardInterrupt:
+                if pid:
+                    os.kill(pid, signal.SIGINT)  # Let the command handle the interrupt, as it would locally
+                continue
+
+            if not line:
+                return 1  # The daemon closed the connection without reporting an exit code
+
+            msg = json.loads(line.decode('utf8'))
+
+            if 'pid' in msg:
+                pid = msg['pid']
+            elif 'exit' in msg:
+                return msg['exit']
+
+
+def _exit_code(code):
+    if code is None:
+        return 0
+    elif isinstance(code, int):
+        return code
+    else:
+        print(code, file=sys.stderr)
+        return 1
+
+
+class CommandHandler(socketserver.BaseRequestHandler):
+    """Run a command in the process forked for the request, with the client's stdio, working
+    directory and environment"""
+
+    def handle(self):
+        import json
+
+        from metapack.cli import core
+        from metapack.cli.mp import mp
+
+        command = self.server.command
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        self.request.sendall((json.dumps({'pid': os.getpid()}) + '\n').encode('utf8'))
+
+        for i, fd in enumerate(command['fds']):
+            os.dup2(fd, i)
+            os.close(fd)
+
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', closefd=False, buffering=1 if os.isatty(1) else -1)
+        sys.stderr = open(2, 'w', closefd=False, buffering=1)
+
+        env = dict(command['env'])
+        env.pop(SOCKET_ENV, None)  # Don't forward commands that the command runs
+
+        os.environ.clear()
+        os.environ.update(env)
+
+        sys.argv = ['mp'] + command['argv']
+
+        # Drop the daemon's log handlers; the command adds its own, for the client's streams
+        for logger in (core.logger, core.logger_err, core.debug_logger, core.download_logger):
+            logger.handlers.clear()
+
+        try:
+            os.chdir(command['cwd'])
+            code = _exit_code(mp(command['argv']))
+        except SystemExit as e:
+            code = _exit_code(e.code)
+        except KeyboardInterrupt:
+            code = 130
+        except Exception as e:
+            print('{}: {}'.format(type(e).__name__, e), file=sys.stderr)
+            code = 1
+
+        for f in (sys.stdout, sys.stderr):
+            try:
+                f.flush()
+            except OSError:  # The client's pipe was closed
+                pass
+
+        self.request.sendall((json.dumps({'exit': code}) + '\n').encode('utf8'))
+
+
+class CommandServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Accepts commands on a unix socket, and runs each one in a forked process. The command is read
+    and its package opened in the daemon before the fork, so the document cache of the daemon is
+    warm for later commands on the same package"""
+
+    def process_request(self, request, client_address):
+        try:
+            request.settimeout(10)
+            self.command = receive_command(request)
+            request.settimeout(None)
+        except (OSError, ValueError):
+            self.shutdown_request(request)
+            return
+
+        try:
+            warm_package(self.command['argv'], self.command['cwd'])
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            super().process_request(request, client_address)
+        finally:
+            for fd in self.command['fds']:
+                os.close(fd)
+
+
+def warm_package(argv, cwd):
+    """Open the local package that a command operates on, so it is in the document cache of
+    every command forked after this one"""
+    from os.path import exists, join
+
+    from metapack.cli.core import MetapackCliMemo
+
+    # The package is the first positional argument after the subcommand, or the current directory
+    ref = next((a for a in argv[1:] if not a.startswith('-')), None)
+
+    if ref and not ref.startswith('#') and not exists(join(cwd, ref.split('#')[0])):
+        return
+
+    old_cwd = os.getcwd()
+
+    try:
+        os.chdir(cwd)
+        MetapackCliMemo(argparse.Namespace(metatabfile=ref), downloader).doc
+    except Exception:
+        pass  # The command will report the error
+    finally:
+        os.chdir(old_cwd)
+
+
+def preload(refs, cache_size):
+    """Import the modules that commands use, and open the preloaded packages"""
+    from metapack.cli.mp import base_parser
+    from metapack.package import enable_doc_cache, open_package
+
+    enable_doc_cache(cache_size)
+
+    base_parser()  # Imports all of the subcommand modules
+
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        pass
+
+    import metapack.terms  # noqa: F401
+
+    for ref in refs:
+        try:
+            open_package(ref, downloader=downloader)
+        except Exception as e:
+            err("Failed to preload '{}': {}".format(ref, e))
+
+
+def run_serve(args):
+    path = args.socket or default_socket_path()
+
+    if os.path.exists(path):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.connect(path)
+            err("A daemon is already listening on '{}'".format(path))
+        except OSError:
+            os.unlink(path)  # Left behind by a daemon that did not shut down cleanly
+        finally:
+            s.close()
+
+    preload(args.preload, args.cache_size)
+
+    old_umask = os.umask(0o077)  # Only the owner can run commands
+
+    try:
+        server = CommandServer(path, CommandHandler)
+    finally:
+        os.umask(old_umask)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    prt("Listening on '{}'".format(path))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
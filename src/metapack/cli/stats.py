@@ -0,0 +1,82 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+CLI program for profiling the columns of resources
+"""
+
+import argparse
+import sys
+from os import environ
+
+from tabulate import tabulate
+
+from metapack import Downloader
+from metapack.cli.core import MetapackCliMemo, err, list_rr, prt, write_doc
+
+downloader = Downloader.get_instance()
+
+Downloader.context.update(environ)
+
+
+def stats_args(subparsers):
+    """
+    The `mp stats` command profiles the columns of a resource in one pass over the data: the number of
+    values and of empty values, the minimum, maximum and mean, the approximate number of distinct values,
+    the most common values, and the fraction of values that conform to the schema datatype.
+
+        mp stats metadata.csv#resource
+        mp stats -j 4 metadata.csv#resource    # Profile shards of a large CSV file in 4 processes
+        mp stats -w metadata.csv#resource      # Write the profile to the schema
+
+    With -w, the profile is written to the Table.Column terms of the schema as the properties Count,
+    Nulls, Min, Max, Mean, Distinct, Top and Conformance.
+    """
+    parser = subparsers.add_parser(
+        'stats',
+        help='Profile the columns of a resource',
+        description=stats_args.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+
+    parser.set_defaults(run_command=run_stats)
+
+    parser.add_argument('-j', '--processes', type=int,
+                        help='Number of processes for profiling shards of local CSV files')
+
+    parser.add_argument('-k', '--top', type=int, default=5,
+                        help='Number of most common values to report for each column')
+
+    parser.add_argument('-w', '--write', default=False, action='store_true',
+                        help='Write the profile to the schema and save the metadata file')
+
+    parser.add_argument('-c', '--csv', default=False, action='store_true',
+                        help='Output the profile as CSV')
+
+    parser.add_argument('metatabfile', nargs='?',
+                        help="Path or URL to a metatab file, with a resource fragment")
+
+    return parser
+
+
+def run_stats(args):
+    m = MetapackCliMemo(args, downloader, writable=args.write)
+
+    r = m.get_resource()
+
+    if not r:
+        prt('Select a resource to profile:')
+        list_rr(m.doc)
+        sys.exit(1)
+
+    ts = r.stats(processes=args.processes, k=args.top, write=args.write)
+
+    df = ts.dataframe()
+
+    if args.csv:
+        df.to_csv(sys.stdout, index=False)
+    else:
+        prt(tabulate(df, headers='keys', showindex=False))
+
+    if args.write and not write_doc(m.doc):
+        err("Can't write the profile to '{}', which is not a local file".format(m.doc.ref))
@@ -9,14 +9,10 @@ import argparse
 # from https://stackoverflow.com/a/10743550
 import contextlib
 import sys
-from pkg_resources import (
-    DistributionNotFound,
-    get_distribution,
-    iter_entry_points
-)
 from shlex import split
 
 from metapack.cli.core import err, prt
+from metapack.util import entry_points
 
 
 @contextlib.contextmanager
@@ -42,7 +38,7 @@ def exec_cmd(args):
 
     subparsers = parser.add_subparsers(help='Commands')
 
-    for ep in iter_entry_points(group='mt.subcommands'):
+    for ep in entry_points('mt.subcommands'):
         f = ep.load()
         f(subparsers)
 
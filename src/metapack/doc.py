@@ -29,6 +29,55 @@ class Resolver(WebResolver):
             return super().get_row_generator(ref, cache)
 
 
+def _load_dataframe(ref, name, kwargs):
+    """Load the dataframe for a resource in a worker process, for MetapackDoc.dataframes()"""
+    import pickle
+    from metapack.package import open_package
+
+    doc = open_package(ref)
+
+    r = doc.resource(name) or doc.reference(name)
+
+    df = r.dataframe(**kwargs)
+
+    try:
+        meta = r.post_iter_meta
+        pickle.dumps(meta)
+    except Exception:
+        meta = {}
+
+    return df, r.errors, meta
+
+
+class _MemoryBudget(object):
+    """Limit the total estimated size of the resources that are being loaded at once. A load that is larger
+    than the whole budget is allowed to run when nothing else is loading. """
+
+    def __init__(self, limit=None):
+        from threading import Condition
+
+        self.limit = limit
+        self.used = 0
+        self._cond = Condition()
+
+    def acquire(self, n):
+        if not self.limit:
+            return
+
+        with self._cond:
+            while self.used and self.used + n > self.limit:
+                self._cond.wait()
+            self.used += n
+
+    def release(self, n):
+        if not self.limit:
+            return
+
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
 class MetapackDoc(MetatabDoc):
     lib_dir_names = ('lib', 'pylib')  # Names of subdirs to look for to find a loadable module
 
@@ -56,6 +105,10 @@ class MetapackDoc(MetatabDoc):
 
         assert resolver is not None
 
+        # Lazily built maps from names to terms, for resource(), reference() and table(). Cleared
+        # whenever a term is added or removed.
+        self._term_indexes = {}
+
         if package_url is None:
             try:
                 package_url = ref.package_url
@@ -250,6 +303,51 @@ class MetapackDoc(MetatabDoc):
 
         assert False, "Should not get here. No idea why we did. Maybe errors in pylib/__init__.py?"
 
+    def add_term(self, *args, **kwargs):
+        self.invalidate_term_indexes()
+        return super().add_term(*args, **kwargs)
+
+    def remove_term(self, *args, **kwargs):
+        self.invalidate_term_indexes()
+        return super().remove_term(*args, **kwargs)
+
+    def invalidate_term_indexes(self):
+        """Clear the name indexes used by resource(), reference() and table(). Adding and
+        removing terms clears them automatically"""
+        self._term_indexes = {}
+
+    def _term_index(self, term, section, key, rebuild=False):
+        """Return a dict that maps a key of the terms found with term and section to the first
+        term with that key"""
+
+        try:
+            indexes = self._term_indexes
+        except AttributeError:  # Terms loaded before __init__ set the attribute
+            indexes = self._term_indexes = {}
+
+        idx_key = (term, tuple(section) if isinstance(section, (list, tuple)) else section, key)
+
+        if rebuild or idx_key not in indexes:
+            idx = {}
+            for t in self.find(term=term, section=section):
+                idx.setdefault(t.name if key == 'name' else t.value, t)
+
+            indexes[idx_key] = idx
+
+        return indexes[idx_key]
+
+    def _find_indexed(self, term, section, key, v):
+        """Find the first term by name or value, using an index"""
+
+        t = self._term_index(term, section, key).get(v)
+
+        if t is None or (t.name if key == 'name' else t.value) != v:
+            # Missing, or the term was changed after the index was built, so a term may have been
+            # renamed to v. Look again in a fresh index, which costs the same as a search.
+            t = self._term_index(term, section, key, rebuild=True).get(v)
+
+        return t
+
     def resources(self, term='Root.Resource', section='Resources'):
         return self.find(term=term, section=section)
 
@@ -258,13 +356,98 @@ class MetapackDoc(MetatabDoc):
         if name is None and self.default_resource is not None:
             name = self.default_resource
 
-        return self.find_first(term=term, name=name, section=section)
+        if name is None:
+            return self.find_first(term=term, section=section)
+
+        return self._find_indexed(term, section, 'name', name)
 
     def references(self, term='Root.*', section='References'):
         return self.find(term=term, section=section)
 
     def reference(self, name=None, term='Root.Reference', section='References'):
-        return self.find_first(term=term, name=name, section=section)
+
+        if name is None:
+            return self.find_first(term=term, section=section)
+
+        return self._find_indexed(term, section, 'name', name)
+
+    def table(self, name, term='Root.Table'):
+        """Return the first schema Table term with the given name"""
+
+        if name is None:
+            return None
+
+        return self._find_indexed(term, None, 'value', name)
+
+    def dataframes(self, names=None, workers=4, processes=0, memory_budget=None, **kwargs):
+        """Load the dataframes for several resources or references concurrently.
+
+        Downloads and loading run in a thread pool. If `processes` is non zero, the dataframes are built in a pool
+        of that many worker processes, which re-open the package, so row processing for different resources can run
+        on multiple cores. After loading, the casting errors and post iteration metadata are available in the
+        `errors` and `post_iter_meta` attributes of each resource, as they are after a call to dataframe()
+
+        :param names: Names of the resources or references to load. Defaults to all resources
+        :param workers: Number of threads for downloading and loading
+        :param processes: Number of worker processes for building dataframes, or 0 to build them in the threads
+        :param memory_budget: Maximum total size, in bytes, of the source files being loaded at one time
+        :param kwargs: Arguments for Resource.dataframe()
+        :return: A dict of DataFrames, keyed by resource name
+        """
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from multiprocessing import get_context
+        from os import stat
+
+        from metapack.exc import ResourceError
+
+        if names is None:
+            names = [r.name for r in self.resources()]
+
+        resources = {}
+        for name in names:
+            r = self.resource(name) or self.reference(name)
+            if r is None:
+                raise ResourceError("No resource or reference named '{}' in '{}'".format(name, self.name))
+            resources[name] = r
+
+        if processes and not isinstance(self.ref, MetapackDocumentUrl):
+            processes = 0  # Workers must be able to re-open the package from its url
+
+        budget = _MemoryBudget(memory_budget)
+
+        # The pool is first used from the loader threads, so the workers are spawned rather than forked
+        # from a multi-threaded process
+        process_pool = ProcessPoolExecutor(processes, mp_context=get_context('spawn')) if processes else None
+
+        def load(name):
+            r = resources[name]
+
+            try:
+                t = r.resolved_url.get_resource().get_target()  # Download before taking a share of the budget
+                size = stat(str(t.fspath)).st_size
+            except (AttributeError, TypeError, OSError):
+                size = 0
+
+            budget.acquire(size)
+
+            try:
+                if process_pool:
+                    df, r.errors, r.post_iter_meta = \
+                        process_pool.submit(_load_dataframe, str(self.ref), name, kwargs).result()
+                    return df
+                else:
+                    return r.dataframe(**kwargs)
+            finally:
+                budget.release(size)
+
+        try:
+            with ThreadPoolExecutor(max(workers, 1)) as pool:
+                futures = {name: pool.submit(load, name) for name in resources}
+
+                return {name: f.result() for name, f in futures.items()}
+        finally:
+            if process_pool:
+                process_pool.shutdown()
 
     def _repr_html_(self, **kwargs):
         """Produce HTML for Jupyter Notebook"""
@@ -34,3 +34,11 @@ class NoResourceError(ResourceError):
 
 class NoRowProcessor(ResourceError):
     pass
+
+
+class NoColumnError(ResourceError):
+    pass
+
+
+class FilterError(MetapackError):
+    pass
@@ -7,25 +7,9 @@ a data structure that can be used to generate documentation, such as a jira2 con
 """
 
 import datetime
+from functools import lru_cache
 
-from markdown import markdown as convert_markdown
-from metatab.doc import MetatabDoc
-from nameparser import HumanName
-from pybtex import PybtexEngine
-from pybtex.backends.html import Backend as HtmlBackend
-from pybtex.style.formatting import toplevel
-from pybtex.style.formatting.plain import Style
-from pybtex.style.template import (
-    field,
-    href,
-    optional,
-    optional_field,
-    sentence,
-    together,
-    words
-)
 from rowgenerators import parse_app_url
-from yaml import safe_dump
 
 from metapack.exc import PackageError
 
@@ -128,53 +112,84 @@ def contact(r):
     pass
 
 
-class MetatabStyle(Style):
-    # Minnesota Population Center. IPUMS Higher Ed: Version 1.0 [dataset]
-    # Minneapolis, MN: University of Minnesota, 2016. http://doi.org/10.18128/D100.V1.0.
+@lru_cache()
+def _citation_classes():
+    """Return the pybtex style and backend classes for citations. They subclass pybtex classes, so they
+    are created on first use, to keep pybtex from being imported with this module"""
+    from pybtex.backends.html import Backend as HtmlBackend
+    from pybtex.style.formatting import toplevel
+    from pybtex.style.formatting.plain import Style
+    from pybtex.style.template import (
+        field,
+        href,
+        optional,
+        optional_field,
+        sentence,
+        together,
+        words
+    )
+
+    class MetatabStyle(Style):
+        # Minnesota Population Center. IPUMS Higher Ed: Version 1.0 [dataset]
+        # Minneapolis, MN: University of Minnesota, 2016. http://doi.org/10.18128/D100.V1.0.
 
-    def format_url(self, e):
-        return words[
-            href[
-                field('url', raw=True),
-                field('url', raw=True)
+        def format_url(self, e):
+            return words[
+                href[
+                    field('url', raw=True),
+                    field('url', raw=True)
+                ]
             ]
-        ]
 
-    def format_accessed(self, e):
-        from dateutil.parser import parser
+        def format_accessed(self, e):
+            from dateutil.parser import parser
 
-        return words[
-            'Accessed',
-            field('accessdate', raw=True, apply_func=lambda v: str(parser().parse(v).strftime("%d %b %Y")))
-        ]
+            return words[
+                'Accessed',
+                field('accessdate', raw=True, apply_func=lambda v: str(parser().parse(v).strftime("%d %b %Y")))
+            ]
 
-    def format_dataset(self, e):
-        template = toplevel[
-            optional[sentence[field('origin')]],
-            self.format_btitle(e, 'title'),
-            optional[sentence[together['Version', field('version')]]],
-            optional[sentence[field('publisher')]],
-            optional[self.format_author_or_editor(e)],
-            optional[words[optional_field('month'), field('year')]],
-            self.format_web_refs(e),
-            self.format_accessed(e)
-        ]
+        def format_dataset(self, e):
+            template = toplevel[
+                optional[sentence[field('origin')]],
+                self.format_btitle(e, 'title'),
+                optional[sentence[together['Version', field('version')]]],
+                optional[sentence[field('publisher')]],
+                optional[self.format_author_or_editor(e)],
+                optional[words[optional_field('month'), field('year')]],
+                self.format_web_refs(e),
+                self.format_accessed(e)
+            ]
 
-        return template.format_data(e)
+            return template.format_data(e)
 
+    class MetatabHtmlBackend(HtmlBackend):
+        def write_prologue(self):
+            pass
+            # super().write_prologue()
 
-class MetatabHtmlBackend(HtmlBackend):
-    def write_prologue(self):
-        pass
-        # super().write_prologue()
+        def write_epilogue(self):
+            pass
+            # super().write_epilogue()
 
-    def write_epilogue(self):
-        pass
-        # super().write_epilogue()
+        def write_entry(self, key, label, text):
+            self.output("<div class='citation'><a name=\"{key}\"><b>[{key}]</b></a> {text} </div>"
+                        .format(key=key, text=text))
+
+    # Name the classes as if they were defined in the module
+    MetatabStyle.__qualname__ = 'MetatabStyle'
+    MetatabHtmlBackend.__qualname__ = 'MetatabHtmlBackend'
+
+    return MetatabStyle, MetatabHtmlBackend
+
+
+def __getattr__(name):
+    """Create MetatabStyle and MetatabHtmlBackend when they are first accessed as module attributes"""
+    if name in ('MetatabStyle', 'MetatabHtmlBackend'):
+        MetatabStyle, MetatabHtmlBackend = _citation_classes()
+        return MetatabStyle if name == 'MetatabStyle' else MetatabHtmlBackend
 
-    def write_entry(self, key, label, text):
-        self.output("<div class='citation'><a name=\"{key}\"><b>[{key}]</b></a> {text} </div>"
-                    .format(key=key, text=text))
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
 
 
 def make_citation_dict(td):
@@ -186,6 +201,8 @@ def make_citation_dict(td):
 
     from datetime import datetime
 
+    from nameparser import HumanName
+
     if isinstance(td, dict):
         d = td
 
@@ -254,6 +271,7 @@ def make_metatab_citation_dict(t):
     :param t:
     :return:
     """
+    from nameparser import HumanName
 
     try:
 
@@ -322,6 +340,11 @@ def _bibliography(doc, terms, converters=[], format='html'):
     :param doc: A MetatabDoc, or a dict of BibTex dicts
     :return:
     """
+    from metatab.doc import MetatabDoc
+    from pybtex import PybtexEngine
+    from yaml import safe_dump
+
+    MetatabStyle, MetatabHtmlBackend = _citation_classes()
 
     output_backend = 'latex' if format == 'latex' else MetatabHtmlBackend
 
@@ -480,6 +503,8 @@ def process_contact(d):
 
 
 def process_contacts_html(d):
+    from markdown import markdown as convert_markdown
+
     pc = process_contact(d)
 
     pc['html'] = convert_markdown(', '.join(pc['parts']))
@@ -663,6 +688,8 @@ def markdown(doc, title=True, template='short_documentation.md'):
 
 
 def html(doc, template='short_documentation.md'):
+    from markdown import markdown as convert_markdown
+
     extensions = [
         'markdown.extensions.extra',
         'markdown.extensions.admonition'
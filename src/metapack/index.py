@@ -11,16 +11,101 @@ from os.path import exists
 from shutil import copy
 
 
+# Index files with these extensions are stored in SQLite, others in JSON
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+
+def trigrams(s):
+    """Return the set of three character substrings of a string"""
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class TrigramIndex(object):
+    """Inverted index from trigrams to the keys that contain them, for finding the keys that contain
+    a substring without scanning all of them. Keys are stored in insertion order, and postings are lists
+    of key ordinals, so search results are in the same order as the keys"""
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self.postings = {}
+
+        for k in keys:
+            self.add(k)
+
+    def add(self, key):
+        ordinal = len(self.keys)
+        self.keys.append(key)
+
+        for t in trigrams(key):
+            self.postings.setdefault(t, []).append(ordinal)
+
+    def search(self, term):
+        """Return the keys that contain term, in insertion order"""
+
+        tris = trigrams(term)
+
+        if not tris:  # Too short to have trigrams
+            return [k for k in self.keys if term in k]
+
+        lists = sorted((self.postings.get(t, []) for t in tris), key=len)
+
+        ordinals = set(lists[0])
+        for l in lists[1:]:
+            if not ordinals:
+                break
+            ordinals.intersection_update(l)
+
+        # Having all of the trigrams doesn't mean they are contiguous, so check the candidates
+        return [self.keys[i] for i in sorted(ordinals) if term in self.keys[i]]
+
+    def to_dict(self):
+        return {'keys': self.keys, 'postings': self.postings}
+
+    @classmethod
+    def from_dict(cls, d):
+        o = cls()
+        o.keys = d['keys']
+        o.postings = d['postings']
+        return o
+
+
+def source_fingerprint(path):
+    """Return the modification time and size of the file a package is loaded from, or for a package
+    directory, its metadata file. Returns None if there is no such file"""
+    from os import stat
+    from os.path import isdir, join
+
+    from metapack.appurl import METATAB_FILES
+
+    if isdir(path):
+        for f in METATAB_FILES:
+            try:
+                st = stat(join(path, f))
+                return [st.st_mtime_ns, st.st_size]
+            except OSError:
+                pass
+        return None
+
+    try:
+        st = stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+
+
 def search_index_file():
     """Return the default local index file, from the download cache"""
     from metapack import Downloader
     from os import environ
 
     return environ.get('METAPACK_SEARCH_INDEX',
-                       Downloader.get_instance().cache.getsyspath('index.json'))
+                       Downloader.get_instance().cache.getsyspath('index.db'))
 
 
 class SearchIndex(object):
+    """Search index, stored in a JSON file. Constructing a SearchIndex with a path that has one of the
+    SQLITE_EXTENSIONS returns a SqliteSearchIndex instead"""
+
     pkg_format_priority = {
         'fs': 6,
         'zip': 5,
@@ -31,10 +116,128 @@ class SearchIndex(object):
         'unk': 0
     }
 
+    def __new__(cls, path=None, *args, **kwargs):
+
+        if cls is SearchIndex and path and str(path).endswith(SQLITE_EXTENSIONS):
+            cls = SqliteSearchIndex
+
+        return super().__new__(cls)
+
     def __init__(self, path):
         self.path = path
 
         self._db = None
+        self._trigrams = None
+        self._manifest = None
+        self._dirty = False  # The index has changes that are not written, so the trigram file is stale
+
+    @property
+    def trigram_path(self):
+        return str(self.path) + '.trigrams'
+
+    def _index_stat(self):
+        from os import stat
+
+        try:
+            st = stat(self.path)
+            return [st.st_size, st.st_mtime_ns]
+        except OSError:
+            return None
+
+    def _load_trigrams(self):
+        """Load the trigram index from the file written alongside the index, or build it if the
+        file is missing or was written for a different version of the index"""
+
+        if self._trigrams is not None:
+            return self._trigrams
+
+        self.open()
+
+        if self._dirty:
+            self._trigrams = TrigramIndex(self._db.keys())
+            return self._trigrams
+
+        try:
+            with open(self.trigram_path) as f:
+                d = json.load(f)
+
+            if d.get('index_stat') == self._index_stat():
+                self._trigrams = TrigramIndex.from_dict(d)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex(self._db.keys())
+
+        return self._trigrams
+
+    def _changed(self):
+        """Discard the trigram index after a change to the index data"""
+        self._trigrams = None
+        self._dirty = True
+
+    def _write_trigrams(self):
+
+        d = self._load_trigrams().to_dict()
+        d['index_stat'] = self._index_stat()
+
+        new_path = self.trigram_path + '.new'
+
+        with open(new_path, 'w') as f:
+            json.dump(d, f)
+
+        rename(new_path, self.trigram_path)
+
+    @property
+    def manifest_path(self):
+        return str(self.path) + '.manifest'
+
+    def manifest(self):
+        """Return the manifest of indexed sources, a dict of source path to a dict of the source's
+        mtime and size, Root.Modified, Root.Version, ETag, for sources in S3, and the keys of its package entries"""
+
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path) as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+
+        return self._manifest
+
+    def set_source(self, path, fingerprint, modified, version, keys, etag=None):
+        """Record the package entries that were created from a source file or directory"""
+        self.manifest()[path] = {
+            'mtime': fingerprint[0] if fingerprint else None,
+            'size': fingerprint[1] if fingerprint else None,
+            'modified': modified,
+            'version': version,
+            'etag': etag,
+            'keys': [k for k in keys if k]
+        }
+
+    def remove_sources(self, paths):
+        """Remove sources from the manifest, and the package entries that only they created"""
+
+        removed = [self.manifest().pop(path, None) for path in paths]
+
+        others = {k for v in self.manifest().values() for k in v['keys']}
+
+        for e in removed:
+            for key in (e['keys'] if e else []):
+                if key not in others:
+                    self.remove_package(key)
+
+    def _write_manifest(self):
+        if self._manifest is None:
+            return
+
+        new_path = self.manifest_path + '.new'
+
+        with open(new_path, 'w') as f:
+            json.dump(self._manifest, f)
+
+        rename(new_path, self.manifest_path)
 
     def open(self):
         if not self._db:
@@ -49,6 +252,8 @@ class SearchIndex(object):
     def clear(self):
 
         self._db = {}
+        self._changed()
+        self._manifest = {}
         self.write()
 
     def write(self):
@@ -57,7 +262,9 @@ class SearchIndex(object):
         new_index_file = index_file + '.new'
         bak_index_file = index_file + '.bak'
 
-        if not self._db:
+        self._write_manifest()
+
+        if self._db is None:  # Never opened, so there are no changes
             return
 
         with open(new_index_file, 'w') as f:
@@ -69,6 +276,10 @@ class SearchIndex(object):
 
         rename(new_index_file, index_file)
 
+        self._write_trigrams()
+
+        self._dirty = False
+
     def _make_package_entry(self, ident, name, nvname, version, format, url):
         """
 
@@ -86,6 +297,8 @@ class SearchIndex(object):
             format = 'unk'
             return
 
+        self._changed()
+
         self._db[ident] = {'t': 'ident', 'ref': nvname}  # these should always be equivalent
 
         self._db[name] = {'t': 'name', 'ref': nvname, 'version': version, 'ident': ident}
@@ -107,6 +320,33 @@ class SearchIndex(object):
             'url': url
         }
 
+        return key
+
+    def remove_package(self, key):
+        """Remove the package entry with a key, which is the package name and format"""
+
+        self.open()
+
+        for nvname, v in list(self._db.items()):
+            if v.get('t') != 'nvname' or key not in v['packages']:
+                continue
+
+            p = v['packages'].pop(key)
+            self._changed()
+
+            if not any(e['name'] == p['name'] for e in v['packages'].values()) and \
+                    self._db.get(p['name'], {}).get('t') == 'name':
+                del self._db[p['name']]
+
+            if not v['packages']:
+                del self._db[nvname]
+
+                for k, e in list(self._db.items()):
+                    if e.get('ref') == nvname:
+                        del self._db[k]
+
+            return
+
     def add_package(self, pkg, format=None):
         from os.path import abspath
 
@@ -133,21 +373,42 @@ class SearchIndex(object):
             else:
                 format = target_ref.target_format
 
-        self._make_package_entry(identifier, name, nv_name, version, format, ref)
+        return self._make_package_entry(identifier, name, nv_name, version, format, ref)
 
     def add_entry(self, ident, name, nvname, version, format, url):
-        self._make_package_entry(ident, name, nvname, version, format, url)
+        return self._make_package_entry(ident, name, nvname, version, format, url)
 
     def update(self, o):
         """Update from another index or index dict"""
 
         self.open()
 
+        self._changed()
+
         try:
             self._db.update(o._db)
         except AttributeError:
             self._db.update(o)
 
+    def _sort_list(self, packages):
+        return list(
+            reversed(sorted(packages, key=lambda x: (x['name'], x['version'], self.pkg_format_priority[x['format']]))))
+
+    def _sort_search(self, packages):
+        return list(reversed(sorted(packages, key=lambda x: (x['version'], self.pkg_format_priority[x['format']]))))
+
+    @staticmethod
+    def _search_formats(format):
+        if format == 'all':
+            format = None
+        elif format == 'issued':  # 'issued' means  'not source'
+            format = ['zip', 'csv', 'xlsx', 'fs', 'web']
+
+        if format and not isinstance(format, (list, tuple)):
+            format = [format]
+
+        return format
+
     def list(self):
 
         packages = []
@@ -159,8 +420,7 @@ class SearchIndex(object):
                 for pkey, e in v.get('packages').items():
                     packages.append(e)
 
-        return list(
-            reversed(sorted(packages, key=lambda x: (x['name'], x['version'], self.pkg_format_priority[x['format']]))))
+        return self._sort_list(packages)
 
     def records(self):
         self.open()
@@ -178,13 +438,7 @@ class SearchIndex(object):
 
         self.open()
 
-        if format == 'all':
-            format = None
-        elif format == 'issued':  # 'issued' means  'not source'
-            format = ['zip', 'csv', 'xlsx', 'fs', 'web']
-
-        if format and not isinstance(format, (list, tuple)):
-            format = [format]
+        format = self._search_formats(format)
 
         record = self._db.get(search_term)  # Case when the term is a name, nvname, or ident
 
@@ -192,7 +446,7 @@ class SearchIndex(object):
             records = [record]
             match_type = 'exact'
         else:
-            records = [record for k, record in self._db.items() if search_term in k]
+            records = [self._db[k] for k in self._load_trigrams().search(search_term)]
             match_type = 'subset'
 
         packages = []
@@ -220,4 +474,301 @@ class SearchIndex(object):
                             packages.append(p)
                             seen.add((p['format'], p['name']))
 
-        return list(reversed(sorted(packages, key=lambda x: (x['version'], self.pkg_format_priority[x['format']]))))
+        return self._sort_search(packages)
+
+
+class SqliteSearchIndex(SearchIndex):
+    """Search index stored in a SQLite database, so adding a package updates one row instead of
+    rewriting the whole index. The database uses write-ahead logging, so searches are not blocked
+    while another process is indexing.
+
+    When the database is first opened, it imports the packages from a JSON index with the same
+    base name, if one exists.
+
+    Substring searches use the trigrams table, which maps trigrams to the package names and unversioned
+    names that contain them. A trigger maintains the number of names for each trigram, so a search only
+    has to intersect the names for the two least common trigrams in the search term."""
+
+    schema = [
+        """CREATE TABLE IF NOT EXISTS packages (
+            key TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            nvname TEXT NOT NULL,
+            version TEXT,
+            format TEXT,
+            ident TEXT,
+            url TEXT)""",
+        "CREATE INDEX IF NOT EXISTS packages_name ON packages (name)",
+        "CREATE INDEX IF NOT EXISTS packages_nvname ON packages (nvname)",
+        "CREATE INDEX IF NOT EXISTS packages_ident ON packages (ident)",
+        "CREATE INDEX IF NOT EXISTS packages_version ON packages (version)",
+        "CREATE INDEX IF NOT EXISTS packages_format ON packages (format)",
+        "CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY) WITHOUT ROWID",
+        """CREATE TABLE IF NOT EXISTS trigrams (
+            trigram TEXT NOT NULL,
+            term TEXT NOT NULL,
+            PRIMARY KEY (trigram, term)) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS trigram_counts (
+            trigram TEXT PRIMARY KEY,
+            n INTEGER NOT NULL) WITHOUT ROWID""",
+        """CREATE TRIGGER IF NOT EXISTS trigrams_insert AFTER INSERT ON trigrams BEGIN
+            INSERT INTO trigram_counts (trigram, n) VALUES (new.trigram, 1)
+            ON CONFLICT(trigram) DO UPDATE SET n = n + 1;
+            END""",
+        """CREATE TABLE IF NOT EXISTS sources (
+            path TEXT PRIMARY KEY,
+            mtime INTEGER,
+            size INTEGER,
+            modified TEXT,
+            version TEXT,
+            etag TEXT,
+            keys TEXT)""",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+    ]
+
+    columns = ('name', 'nvname', 'version', 'format', 'ident', 'url')
+
+    def __init__(self, path):
+        from threading import RLock
+
+        super().__init__(path)
+        self._lock = RLock()
+
+    def open(self):
+        import sqlite3
+
+        with self._lock:
+            if self._db is None:
+                self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute('PRAGMA synchronous=NORMAL')
+
+                for s in self.schema:
+                    self._db.execute(s)
+
+                self._migrate()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def _migrate(self):
+        """Import the packages from a JSON index with the same base name, and build the trigrams
+        for databases created before the trigrams table existed, once"""
+        from os.path import splitext
+
+        def get_meta(key):
+            return self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+
+        def set_meta(key, value):
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+        if not get_meta('migrated'):
+            json_path = splitext(str(self.path))[0] + '.json'
+
+            if exists(json_path):
+                self.update(SearchIndex(json_path))
+
+            set_meta('migrated', json_path)
+
+        # Databases created before ETags were recorded
+        if 'etag' not in [r[1] for r in self._db.execute('PRAGMA table_info(sources)')]:
+            self._db.execute('ALTER TABLE sources ADD COLUMN etag TEXT')
+
+        if not get_meta('trigrams'):
+            for name, nvname in self._db.execute('SELECT name, nvname FROM packages').fetchall():
+                self._index_trigrams(name, nvname)
+
+            set_meta('trigrams', '1')
+
+        self._db.commit()
+
+    def _index_trigrams(self, *terms):
+        """Add the trigrams for names that are not already indexed. Names are never removed, except by
+        clear(), but searches only return names that are in the packages table."""
+        for term in terms:
+            if self._db.execute('INSERT OR IGNORE INTO terms (term) VALUES (?)', (term,)).rowcount:
+                self._db.executemany('INSERT OR IGNORE INTO trigrams (trigram, term) VALUES (?, ?)',
+                                     [(t, term) for t in trigrams(term)])
+
+    def _query(self, sql, args=()):
+        self.open()
+
+        with self._lock:
+            cur = self._db.execute(sql, args)
+            return [dict(zip(self.columns, row)) for row in cur.fetchall()]
+
+    def _upsert(self, p):
+        key = '{}-{}'.format(p['name'], p['format'])
+
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO packages (key, name, nvname, version, format, ident, url)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET
+                   nvname=excluded.nvname, version=excluded.version, ident=excluded.ident, url=excluded.url""",
+                [key] + [p.get(c) for c in self.columns])
+
+            self._index_trigrams(p['name'], p['nvname'])
+
+    def clear(self):
+        self.open()
+
+        with self._lock:
+            self._db.execute('DELETE FROM packages')
+            self._db.execute('DELETE FROM terms')
+            self._db.execute('DELETE FROM trigrams')
+            self._db.execute('DELETE FROM trigram_counts')
+            self._db.execute('DELETE FROM sources')
+            self._db.commit()
+
+    def write(self):
+        """Commit the added packages"""
+        if self._db is not None:
+            with self._lock:
+                self._db.commit()
+
+    def _make_package_entry(self, ident, name, nvname, version, format, url):
+        self.open()
+
+        try:
+            version = 'V' + str(version).zfill(12)
+        except (ValueError, TypeError):
+            # No version, skip it.
+            return
+
+        if format is None:
+            return
+
+        p = {
+            'name': name,
+            'nvname': nvname,
+            'version': version,
+            'format': format,
+            'ident': ident,
+            'url': url
+        }
+
+        self._upsert(p)
+
+        return '{}-{}'.format(name, format)
+
+    def remove_package(self, key):
+        self.open()
+
+        with self._lock:
+            self._db.execute('DELETE FROM packages WHERE key = ?', (key,))
+
+    def manifest(self):
+        self.open()
+
+        with self._lock:
+            rows = self._db.execute('SELECT path, mtime, size, modified, version, etag, keys FROM sources').fetchall()
+
+        return {r[0]: dict(zip(('mtime', 'size', 'modified', 'version', 'etag'), r[1:6]), keys=json.loads(r[6]))
+                for r in rows}
+
+    def set_source(self, path, fingerprint, modified, version, keys, etag=None):
+        self.open()
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO sources (path, mtime, size, modified, version, etag, keys) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, fingerprint[0] if fingerprint else None, fingerprint[1] if fingerprint else None,
+                 modified, version, etag, json.dumps([k for k in keys if k])))
+
+    def remove_sources(self, paths):
+        manifest = self.manifest()
+
+        removed = [manifest.pop(path, None) for path in paths]
+
+        others = {k for v in manifest.values() for k in v['keys']}
+
+        with self._lock:
+            self._db.executemany('DELETE FROM sources WHERE path = ?', [(path,) for path in paths])
+
+            for e in removed:
+                for key in (e['keys'] if e else []):
+                    if key not in others:
+                        self.remove_package(key)
+
+    def update(self, o):
+        """Update from another index or index dict"""
+
+        self.open()
+
+        if isinstance(o, SearchIndex):
+            packages = o.list()
+        else:
+            packages = [p for v in o.values() if v.get('t') == 'nvname' for p in v['packages'].values()]
+
+        for p in packages:
+            self._upsert(p)
+
+    def list(self):
+        return self._sort_list(self._query('SELECT {} FROM packages'.format(', '.join(self.columns))))
+
+    def records(self):
+        for p in self._query('SELECT {} FROM packages'.format(', '.join(self.columns))):
+            yield [p['name'], p['nvname'], p['version'], p['format'], p['url']]
+
+    def search(self, key, format='issued'):
+        from rowgenerators import parse_app_url
+
+        url = parse_app_url(key)
+
+        search_term = url.path
+
+        format = self._search_formats(format)
+
+        select = 'SELECT {} FROM packages WHERE '.format(', '.join(self.columns))
+
+        if format:
+            # The unary plus keeps the planner from using the format index instead of the name indexes
+            fmt_clause = ' AND +format IN ({})'.format(', '.join('?' * len(format)))
+            fmt_args = list(format)
+        else:
+            fmt_clause = ''
+            fmt_args = []
+
+        # Exact matches, on a name, an identifier ( which selects all versions of the package ) or
+        # an unversioned name. The name takes precedence, as it does in the JSON index
+        for sql in ('name = ?',
+                    'nvname IN (SELECT nvname FROM packages WHERE ident = ?)',
+                    'nvname = ?'):
+
+            if self._query('SELECT 1 FROM packages WHERE ' + sql + ' LIMIT 1', [search_term]):
+                return self._sort_search(self._query(select + sql + fmt_clause, [search_term] + fmt_args))
+
+        tris = sorted(trigrams(search_term))
+
+        if tris:
+            with self._lock:
+                counts = self._db.execute(
+                    'SELECT trigram, n FROM trigram_counts WHERE trigram IN ({}) AND n > 0 ORDER BY n'.format(
+                        ', '.join('?' * len(tris))), tris).fetchall()
+
+            if len(counts) < len(tris):  # Some trigram isn't in any name
+                return []
+
+            rarest = [t for t, n in counts[:2]]
+
+            matched = 'SELECT term FROM ({}) WHERE instr(term, ?) > 0'.format(
+                ' INTERSECT '.join(['SELECT term FROM trigrams WHERE trigram = ?'] * len(rarest)))
+        else:  # Too short to have trigrams
+            rarest = []
+            matched = 'SELECT term FROM terms WHERE instr(term, ?) > 0'
+
+        # Join from the matched names, so the packages are found with the name and nvname indexes
+        join = 'SELECT {} FROM matched CROSS JOIN packages ON packages.{} = matched.term WHERE 1' + fmt_clause
+
+        packages = self._query('WITH matched(term) AS ({}) '.format(matched) +
+                               join.format(', '.join(self.columns), 'name') + ' UNION ' +
+                               join.format(', '.join(self.columns), 'nvname'),
+                               rarest + [search_term] + fmt_args + fmt_args)
+
+        return self._sort_search(packages)
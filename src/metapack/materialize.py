@@ -0,0 +1,247 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Cache of typed, fully processed resource data, stored as Arrow IPC ( Feather ) files in the
+download cache so later loads can memory map the file instead of re-parsing and re-processing the source.
+
+The cache is opt-in; enable it with enable_materialization() or by setting the METAPACK_MATERIALIZE
+environmental variable. Entries are keyed by a fingerprint of the source file, the resource schema
+and row selection, and the package's python library, so editing any of them causes the data to be
+regenerated.
+"""
+
+from os.path import join
+
+from metapack.constants import MATERIALIZED_DATA_PREFIX
+
+MATERIALIZED_RESOURCES_DIR = join(MATERIALIZED_DATA_PREFIX, '_resources')
+
+_enabled = None
+
+
+def enable_materialization():
+    global _enabled
+    _enabled = True
+
+
+def disable_materialization():
+    global _enabled
+    _enabled = False
+
+
+def materialization_enabled():
+    from os import environ
+
+    if _enabled is None:
+        return bool(environ.get('METAPACK_MATERIALIZE'))
+
+    return _enabled
+
+
+def _lib_mtime(doc):
+    """Return the latest modification time of the files in the package's python library"""
+    from os import walk, stat
+    from os.path import isdir
+
+    mtime = 0
+
+    try:
+        doc_dir = str(doc.doc_dir)
+    except (AttributeError, TypeError):
+        return mtime
+
+    for lib_dir_name in doc.lib_dir_names:
+        lib_dir = join(doc_dir, lib_dir_name)
+        if not isdir(lib_dir):
+            continue
+
+        for root, dirs, files in walk(lib_dir):
+            for f in files:
+                if f.endswith('.py'):
+                    mtime = max(mtime, stat(join(root, f)).st_mtime_ns)
+
+    return mtime
+
+
+def materialized_key(resource, kind, *extra):
+    """Return a key that identifies the processed data of a resource, or None if the resource
+    data does not come from a local file. The kind distinguishes data produced by different methods,
+    and the extra arguments are any options that change the data.
+
+    The key is the kind, a hash of the source, schema and library, and a hash of the extra arguments."""
+    from hashlib import md5
+    from os import stat
+    import json
+
+    try:
+        resource.resolved_url.resource  # Metapack urls reference other packages, which are cached themselves
+        return None
+    except AttributeError:
+        pass
+
+    try:
+        t = resource.resolved_url.get_resource().get_target()
+        st = stat(str(t.fspath))
+    except (AttributeError, TypeError, OSError):
+        return None
+
+    st_term = resource.schema_term
+
+    schema = [(c.value, c.get_value('altname'), c.get_value('datatype'), c.get_value('valuetype'),
+               c.get_value('transform'), c.get_value('width'))
+              for c in (st_term.children if st_term else []) if c.term_is('Table.Column')]
+
+    parts = [
+        str(t), st.st_size, st.st_mtime_ns,
+        resource.value,
+        resource._get_start_end_header(),
+        schema,
+        _lib_mtime(resource.doc)
+    ]
+
+    def _hash(v):
+        return md5(json.dumps(v, default=str).encode('utf8')).hexdigest()
+
+    return '{}-{}-{}'.format(kind, _hash(parts), _hash(list(extra)))
+
+
+def _cache_dir(resource):
+    from metapack.util import ensure_dir
+
+    d = resource.doc._cache.getsyspath(MATERIALIZED_RESOURCES_DIR)
+    ensure_dir(d)
+
+    return d
+
+
+def _file_prefix(resource):
+    from metatab.util import slugify
+
+    return '{}-{}-'.format(slugify(resource.doc.name), slugify(resource.name))
+
+
+def materialized_path(resource, key):
+    return join(_cache_dir(resource), _file_prefix(resource) + key + '.arrow')
+
+
+def _remove_stale(resource, key):
+    """Remove the cache files for previous versions of the resource's source, schema or library.
+    Entries for other kinds and options of the current version are kept."""
+    import re
+    from os import listdir, remove
+
+    d = _cache_dir(resource)
+    prefix = _file_prefix(resource)
+    source = key.split('-')[1]
+
+    # The remainder of the file name after the prefix; other resources with names that start with
+    # this resource's name don't match
+    entry = re.compile(r'^\w+-([0-9a-f]{32})-[0-9a-f]{32}\.arrow$')
+
+    for f in listdir(d):
+        m = entry.match(f[len(prefix):]) if f.startswith(prefix) else None
+
+        if m and m.group(1) != source:
+            try:
+                remove(join(d, f))
+            except OSError:
+                pass
+
+
+def read_materialized(resource, key):
+    """Return the memory mapped pyarrow Table for the key, or None if it is not cached"""
+    from os.path import exists
+
+    if key is None:
+        return None
+
+    path = materialized_path(resource, key)
+
+    if not exists(path):
+        return None
+
+    import pyarrow as pa
+
+    try:
+        # The table references the mapped memory, so the map must stay open
+        return pa.ipc.open_file(pa.memory_map(path)).read_all()
+    except (pa.ArrowInvalid, OSError):
+        return None
+
+
+class MaterializedWriter(object):
+    """Write a sequence of DataFrames to the cache. The file only replaces a cache entry when
+    close() is called; abort() discards it, and any error converting the data to Arrow abandons it."""
+
+    def __init__(self, resource, key):
+        from os import getpid
+        from threading import get_ident
+
+        self.key = key
+        self.path = materialized_path(resource, key)
+        # Unique, so processes and threads materializing the same key don't share a file
+        self.tmp_path = '{}.{}-{}.tmp'.format(self.path, getpid(), get_ident())
+        self.resource = resource
+        self._writer = None
+        self._failed = False
+
+    def write(self, df):
+        import pyarrow as pa
+
+        if self._failed:
+            return
+
+        try:
+            batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+
+            if self._writer is None:
+                self._writer = pa.ipc.new_file(self.tmp_path, batch.schema)
+
+            self._writer.write_batch(batch)
+        except (pa.ArrowException, TypeError, ValueError):
+            # Probably python objects that Arrow can't store, or a different inferred type
+            # in a later chunk.
+            self.abort()
+
+    def close(self):
+        from os import replace
+
+        if self._failed or self._writer is None:
+            return
+
+        try:
+            self._writer.close()
+            replace(self.tmp_path, self.path)
+        except OSError:
+            self.abort()  # The data isn't cached, which is only a cache miss for the next read
+            return
+
+        _remove_stale(self.resource, self.key)
+
+    def abort(self):
+        from os import remove
+
+        self._failed = True
+
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+
+        try:
+            remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def write_materialized(resource, key, df):
+    """Write a complete dataframe to the cache"""
+
+    if key is None:
+        return
+
+    w = MaterializedWriter(resource, key)
+    w.write(df)
+    w.close()
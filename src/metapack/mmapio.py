@@ -0,0 +1,134 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Memory mapped reading of local files. Reads from a MappedFile are served from the page cache, without
+a private read buffer in each process, so several processes that read the same large file share one
+copy of it in memory.
+"""
+
+import io
+from contextlib import contextmanager
+
+# Extensions from which pandas and petl infer compression; these files are read by path
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.zip', '.xz', '.zst', '.tar')
+
+
+def is_compressed(path):
+    """Return True if the file name has the extension of a compressed file"""
+    return str(path).lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+class MappedFile(io.RawIOBase):
+    """A read only, seekable binary file backed by a memory map of the whole file. The `buffer`
+    property is a zero-copy memoryview of the file contents.
+
+    Views of the buffer must be released before the file is closed."""
+
+    def __init__(self, path):
+        from mmap import ACCESS_READ, mmap
+
+        super().__init__()
+
+        self.name = str(path)
+        self._pos = 0
+
+        with open(self.name, 'rb') as f:
+            try:
+                self._map = mmap(f.fileno(), 0, access=ACCESS_READ)
+            except ValueError:  # Empty files can't be mapped
+                self._map = None
+
+    def __len__(self):
+        return len(self._map) if self._map is not None else 0
+
+    @property
+    def buffer(self):
+        self._checkClosed()
+        return memoryview(self._map if self._map is not None else b'')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._checkClosed()
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        self._checkClosed()
+
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += len(self)
+
+        if pos < 0:
+            raise ValueError('Negative seek position {}'.format(pos))
+
+        self._pos = pos
+
+        return pos
+
+    def read(self, size=-1):
+        self._checkClosed()
+
+        end = len(self) if size is None or size < 0 else min(self._pos + size, len(self))
+
+        if self._pos >= end:
+            return b''
+
+        data = self._map[self._pos:end]
+        self._pos = end
+
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+
+        return len(data)
+
+    def readline(self, size=-1):
+        self._checkClosed()
+
+        if self._map is None or self._pos >= len(self):
+            return b''
+
+        end = self._map.find(b'\n', self._pos)
+        end = len(self) if end < 0 else end + 1
+
+        if size is not None and size >= 0:
+            end = min(end, self._pos + size)
+
+        return self.read(end - self._pos)
+
+    def close(self):
+        if not self.closed and self._map is not None:
+            self._map.close()
+
+        super().close()
+
+
+class MappedSource(object):
+    """A petl source for a local file, read through a memory map"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def open(self, mode='rb'):
+        if not mode.startswith('r'):
+            raise ValueError("Can't open a mapped file in mode '{}'".format(mode))
+
+        with MappedFile(self.path) as f:
+            yield f
+
+
+def iter_mapped_lines(path, encoding=None):
+    """Yield the lines of a text file, with universal newlines, reading it through a memory map"""
+
+    with MappedFile(path) as f:
+        yield from io.TextIOWrapper(f, encoding=encoding)
@@ -25,16 +25,157 @@ class Downloader(_Downloader):
         return super().download(url)
 
 
-def open_package(ref, downloader=None):
+class DocCache(object):
+    """A bounded, least-recently-used cache of opened MetapackDoc objects.
+
+    Documents are keyed by the absolute path of the local copy of the metadata file, the package url and
+    the root of the downloader's cache, and are validated against the modification time and size of the
+    local file. For remote packages, the local file is the copy in the download cache, so a refreshed
+    download will also invalidate the entry. Documents that don't have a local file are never cached.
+
+    Cached documents are shared, and are read-only: a caller that will modify a document must open its
+    own, with open_doc(..., writable=True).
+    """
+
+    def __init__(self, maxsize=128):
+        from collections import OrderedDict
+        from threading import RLock
+
+        self.maxsize = maxsize
+        self._docs = OrderedDict()
+        self._lock = RLock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(u, package_url=None, downloader=None):
+        """Return the cache key and the file fingerprint for the metadata file for a url,
+        or (None, None) if the url does not reference a local file"""
+        from os import stat
+        from os.path import abspath
+
+        try:
+            inner = u.get_resource().inner
+            if inner.proto != 'file':
+                return None, None
+
+            path = abspath(str(inner.fspath))
+            st = stat(path)
+            package_url = str(package_url or u.package_url)
+        except (AttributeError, OSError):
+            return None, None
+
+        # Documents resolve their resources through the downloader's cache, so docs opened with
+        # different caches are different entries
+        try:
+            cache_root = (downloader or u.downloader).cache.getsyspath('/')
+        except Exception:
+            cache_root = None
+
+        return (path, package_url, cache_root), (st.st_mtime_ns, st.st_size)
+
+    def get(self, u, factory, package_url=None, downloader=None):
+        """Return the document for url `u`, calling `factory` to open it if it is not
+        in the cache, or the file has changed since it was cached"""
+
+        key, fingerprint = self._key(u, package_url, downloader)
+
+        if key is None:
+            return factory()
+
+        with self._lock:
+            e = self._docs.get(key)
+            if e is not None and e[0] == fingerprint:
+                self._docs.move_to_end(key)
+                self.hits += 1
+                return e[1]
+
+        doc = factory()
+
+        with self._lock:
+            self.misses += 1
+            self._docs[key] = (fingerprint, doc)
+            self._docs.move_to_end(key)
+
+            while len(self._docs) > self.maxsize:
+                self._docs.popitem(last=False)
+
+        return doc
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+
+    def __len__(self):
+        return len(self._docs)
+
+
+_doc_cache = None
+
+
+def enable_doc_cache(maxsize=128):
+    """Turn on the process-wide document cache, used by open_package() and the doc properties
+    of the Metapack urls. Can also be enabled by setting the METAPACK_DOC_CACHE environmental
+    variable to the maximum number of documents to cache. """
+    global _doc_cache
+
+    if _doc_cache is None:
+        _doc_cache = DocCache(maxsize)
+    else:
+        _doc_cache.maxsize = maxsize
+
+    return _doc_cache
+
+
+def disable_doc_cache():
+    """Turn off the document cache, and discard all cached documents"""
+    global _doc_cache
+
+    if _doc_cache is not None:
+        _doc_cache.clear()
+
+    _doc_cache = None
+
+
+def get_doc_cache():
+    """Return the process-wide document cache, or None if it is not enabled"""
+    from os import environ
+
+    if _doc_cache is None and environ.get('METAPACK_DOC_CACHE'):
+        try:
+            enable_doc_cache(int(environ['METAPACK_DOC_CACHE']))
+        except ValueError:
+            enable_doc_cache()
+
+    return _doc_cache
+
+
+def open_doc(u, downloader=None, package_url=None, writable=False):
+    """Construct a MetapackDoc for a url, using the document cache if it is enabled. Documents
+    from the cache are shared; if `writable` is true, the document is always opened from its file,
+    so the caller can modify it"""
+    from metapack.doc import MetapackDoc
+
+    def factory():
+        return MetapackDoc(u, package_url=package_url, downloader=downloader)
+
+    cache = get_doc_cache()
+
+    if cache is None or writable:
+        return factory()
+
+    return cache.get(u, factory, package_url, downloader)
+
+
+def open_package(ref, downloader=None, writable=False):
     from metapack.doc import MetapackDoc
 
     if downloader is None:
         downloader = Downloader()
 
     if isinstance(ref, MetapackUrl):
-        p = MetapackDoc(ref, downloader=downloader)
-        p.default_resource = None
-        return p
+        return open_doc(ref, downloader=downloader, writable=writable)
 
     else:
 
@@ -47,6 +188,10 @@ def open_package(ref, downloader=None):
 
         u = MetapackUrl(ref, downloader=downloader)
 
+        if not u.resource_name:
+            return open_doc(u, downloader=downloader, writable=writable)
+
+        # The default resource is set on the doc, so don't share it through the cache
         p = MetapackDoc(u, downloader=downloader)
         p.default_resource = u.resource_name
         return p
@@ -88,63 +233,139 @@ def multi_open(name, base_url='http://library.metatab.org/', print_ref=False):
     return None
 
 
-def walk_packages(root):
-    """
-    :param root: List all of the packages under a root directory
-    :type root:
-    :return: The metapack document for the package
-    :rtype:  metapack.doc.MetapackDoc
-    """
+# File extensions of files that may be packages
+PACKAGE_FILE_FORMATS = ('zip', 'xlsx', 'csv', 'txt', 'ipynb')
+
+# Terms that should appear near the start of a Metatab CSV or lines file
+_METATAB_HEAD_TERMS = r'^\s*(Declare|Identifier|Name|Dataset|Title|Origin|Root\.\w+)\s*[,:]'
+
+
+def is_package_candidate(path, formats=PACKAGE_FILE_FORMATS):
+    """Cheaply check if a file could be a package, using the file extension and the first few bytes
+    of the file, so that discovery does not have to try to open every file as a package"""
+    import re
+    from os.path import basename, splitext
+
+    from metapack.appurl import METATAB_FILES
+
+    ext = splitext(path)[1].lower().lstrip('.')
+
+    if ext not in formats:
+        return False
+
+    if basename(path) in METATAB_FILES or ext == 'ipynb':
+        return True
+
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4096)
+    except OSError:
+        return False
+
+    if ext in ('zip', 'xlsx'):
+        return head.startswith(b'PK\x03\x04')
+
+    return re.search(_METATAB_HEAD_TERMS, head.decode('utf8', errors='replace'), re.M | re.I) is not None
+
+
+def package_candidates(root, formats=PACKAGE_FILE_FORMATS):
+    """Yield the paths of the directories and files under root that may be packages, in a deterministic
+    order. A directory with a metadata file is a package directory, so only its _packages directory is
+    searched further """
     from os import walk
     from os.path import islink, join, isdir
 
+    from metapack.appurl import METATAB_FILES
+    from metapack.constants import PACKAGE_PREFIX
+
+    if not isdir(root):
+        yield root
+        return
+
+    for dir_path, dirs, files in walk(root):
+
+        dirs.sort()
+
+        if any(f in files for f in METATAB_FILES):
+            yield dir_path
+
+            # Only recurse if it is a source package and has a _packages dir
+            dirs[:] = [PACKAGE_PREFIX] if PACKAGE_PREFIX in dirs else []
+            continue
+
+        for f in sorted(files):
+            path = join(dir_path, f)
+            if not islink(path) and is_package_candidate(path, formats):
+                yield path
+
+
+def _try_open_package(path):
     from rowgenerators.exceptions import RowGeneratorError
 
-    from metapack.constants import PACKAGE_PREFIX
     from metapack.exc import MetatabFileNotFound
-    from metapack.package import open_package
-    seen = set()
 
-    # Try all files as packages
-    if not isdir(root):
-        try:
-            yield open_package(root)
-        except (RowGeneratorError, MetatabFileNotFound):
-            pass
+    try:
+        return open_package(path)
+    except (RowGeneratorError, MetatabFileNotFound):
+        return None
 
-        return
 
-    for root, dirs, files in walk(root):
+def open_candidates(candidates, workers=None):
+    """Open candidate package paths in a pool of threads, yielding (path, doc) for each candidate
+    that is a package, in the order of the candidates """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from os import cpu_count
+
+    workers = workers or min(32, (cpu_count() or 1) + 4)
+
+    candidates = iter(candidates)
+
+    with ThreadPoolExecutor(workers) as pool:
+        pending = deque()
+
+        def submit():
+            try:
+                path = next(candidates)
+            except StopIteration:
+                return False
+
+            pending.append((path, pool.submit(_try_open_package, path)))
+            return True
+
+        # Keep a bounded number of candidates in flight, so memory doesn't grow with the size of the tree
+        for _ in range(workers * 4):
+            if not submit():
+                break
 
         try:
-            p = open_package(root)
+            while pending:
+                path, f = pending.popleft()
+                p = f.result()
+                submit()
 
-            # This was a package, so only recurse if it is a source package and has a _packages dir
+                if p is not None:
+                    yield path, p
+        finally:
+            for _, f in pending:
+                f.cancel()
 
-            if PACKAGE_PREFIX in dirs:
-                del dirs[:]
-                dirs.append(PACKAGE_PREFIX)
-            else:
-                del dirs[:]
 
-            if str(p.ref) not in seen:
-                yield p
+def walk_packages(root, workers=None, formats=PACKAGE_FILE_FORMATS):
+    """
+    :param root: List all of the packages under a root directory
+    :type root:
+    :param workers: Number of threads that open candidate packages. Defaults to a value based on the CPU count
+    :param formats: Extensions of files to try as packages
+    :return: The metapack document for the package
+    :rtype:  metapack.doc.MetapackDoc
 
-            seen.add(str(p.ref))
-            continue
+    Packages are yielded in the order of the sorted directory walk, regardless of the number of workers
+    """
 
-        except (RowGeneratorError, MetatabFileNotFound):
-            # directory is not a package, carry on
-            pass
+    seen = set()
 
-        for f in files:
-            if not islink(join(root, f)):
-                try:
-
-                    p = open_package(join(root, f))
-                    if str(p.ref) not in seen:
-                        yield p
-                    seen.add(str(p.ref))
-                except (RowGeneratorError, MetatabFileNotFound):
-                    # directory is not a package, carry on
-                    pass
+    for _, p in open_candidates(package_candidates(root, formats), workers):
+        if str(p.ref) not in seen:
+            seen.add(str(p.ref))
+            yield p
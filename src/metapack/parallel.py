@@ -0,0 +1,195 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Split local CSV files into byte ranges that start and end on record boundaries, and process
+the ranges in worker processes.
+
+Record boundaries are found by tracking the parity of quote characters, so newlines inside of
+quoted values do not split a record.
+"""
+
+import csv
+from io import StringIO
+
+# Default number of bytes in each shard
+DEFAULT_SHARD_SIZE = 16 * 1024 * 1024
+
+_BLOCK_SIZE = 1024 * 1024
+
+
+def _count_quotes(m, begin, end, quote=b'"'):
+    """Count quote characters in a range of a memory map, reading in blocks"""
+    n = 0
+    for p in range(begin, end, _BLOCK_SIZE):
+        n += m[p:min(p + _BLOCK_SIZE, end)].count(quote)
+    return n
+
+
+def _next_record_end(m, pos, parity, quote=b'"'):
+    """Return the offset just past the end of the next record that ends at or after pos, and the quote
+    parity at that position. Returns the length of the map if there are no more records"""
+
+    while True:
+        nl = m.find(b'\n', pos)
+
+        if nl == -1:
+            return len(m), parity
+
+        parity = (parity + _count_quotes(m, pos, nl, quote)) % 2
+        pos = nl + 1
+
+        if parity == 0:
+            return pos, parity
+
+
+def data_offset(m, skip_records):
+    """Return the byte offset of the start of the record after skipping skip_records records"""
+    pos = 0
+
+    for _ in range(skip_records):
+        pos, _ = _next_record_end(m, pos, 0)
+
+    return pos
+
+
+def csv_shards(path, skip_records=0, shard_size=DEFAULT_SHARD_SIZE):
+    """Return a list of (begin, end) byte ranges for the records in a CSV file, after skipping
+    `skip_records` records, where each range is approximately shard_size bytes"""
+    from mmap import ACCESS_READ, mmap
+
+    with open(path, 'rb') as f:
+        try:
+            m = mmap(f.fileno(), 0, access=ACCESS_READ)
+        except ValueError:  # Empty file
+            return []
+
+        with m:
+            size = len(m)
+            begin = data_offset(m, skip_records)
+
+            shards = []
+
+            while begin < size:
+                target = min(begin + shard_size, size)
+
+                # Quote parity is zero at the start of a shard, so count from there
+                parity = _count_quotes(m, begin, target) % 2
+                end, _ = _next_record_end(m, target, parity) if target < size else (size, 0)
+
+                shards.append((begin, end))
+                begin = end
+
+            return shards
+
+
+def read_shard(path, begin, end, encoding=None):
+    """Return a csv reader for the records in a byte range of a file"""
+
+    with open(path, 'rb') as f:
+        f.seek(begin)
+        data = f.read(end - begin)
+
+    return csv.reader(StringIO(data.decode(encoding or 'utf-8'), newline=''))
+
+
+def merge_errors(errors, other):
+    """Merge casting errors, which are dicts of column names to collections of errors, from another
+    shard into `errors` """
+
+    for col, errs in (other or {}).items():
+        if col not in errors:
+            errors[col] = errs
+        elif isinstance(errors[col], (set, dict)):
+            errors[col] = errors[col] | errs
+        else:
+            errors[col] = list(errors[col]) + list(errs)
+
+    return errors
+
+
+# The resource that the shards in a worker process belong to, set by _init_worker()
+_worker_resource = None
+
+
+def _init_worker(ref, name):
+    """Open the package once in each worker process, when the pool starts it"""
+    from metapack.package import open_package
+
+    global _worker_resource
+
+    doc = open_package(ref)
+
+    _worker_resource = doc.resource(name) or doc.reference(name)
+
+
+def process_shard(path, begin, end, encoding=None):
+    """Run the resource's row processor over a shard of its source file, in a worker process that was
+    started with _init_worker(). Returns the processed rows and the casting errors"""
+    from os import getpid
+    from os.path import splitext
+
+    from rowgenerators.rowpipe import RowProcessor
+
+    r = _worker_resource
+
+    # Each process needs its own file for the generated row processor code
+    base, ext = splitext(r.code_path)
+    code_path = '{}-{}{}'.format(base, getpid(), ext)
+
+    rp = RowProcessor(read_shard(path, begin, end, encoding),
+                      r.row_processor_table(),
+                      source_headers=r.source_headers,
+                      manager=r,
+                      env=r.env,
+                      code_path=code_path)
+
+    rows = list(rp)
+
+    try:
+        errors = rp.errors if rp.errors else {}
+    except AttributeError:
+        errors = {}
+
+    return rows, errors
+
+
+def iter_shards(ref, name, path, shards, processes=None, encoding=None):
+    """Process shards in a pool of worker processes, yielding (rows, errors) for each shard in order. Only
+    a few shards more than the number of processes are in flight at once, so a slow consumer does not cause
+    all of the results to accumulate in memory.
+
+    The workers are spawned rather than forked, since the caller may have threads, and each opens the
+    package once, when it starts"""
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    from os import cpu_count
+
+    processes = processes or cpu_count() or 1
+
+    with ProcessPoolExecutor(processes, mp_context=get_context('spawn'), initializer=_init_worker,
+                             initargs=(ref, name)) as pool:
+        pending = deque()
+        shards = iter(shards)
+
+        def submit():
+            try:
+                begin, end = next(shards)
+            except StopIteration:
+                return False
+            pending.append(pool.submit(process_shard, path, begin, end, encoding))
+            return True
+
+        for _ in range(processes * 2):
+            if not submit():
+                break
+
+        try:
+            while pending:
+                f = pending.popleft()
+                submit()
+                yield f.result()
+        finally:
+            for f in pending:  # The caller stopped iterating early
+                f.cancel()
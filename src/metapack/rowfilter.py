@@ -0,0 +1,407 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Filter expressions for resources. A filter is a Python expression of comparisons of columns to
+literal values, combined with and, or and not:
+
+    county == '06037' and 2010 <= year < 2020
+    state in ('CA', 'NV') or population.between(1000, 5000)
+    code.isin(['a', 'b']) and name is not None
+
+A RowFilter compiles the expression into a predicate for processed rows, into a predicate for
+raw source rows, which rejects rows before the row processor casts and transforms them, and into
+a boolean mask for dataframes.
+"""
+
+import ast
+import operator
+
+from metapack.exc import FilterError
+
+COMPARE_OPS = {
+    ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=',
+    ast.Is: 'is', ast.IsNot: 'is not', ast.In: 'in', ast.NotIn: 'not in'
+}
+
+MASK_OPS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge
+}
+
+LEAF_OPS = dict(MASK_OPS, **{'in': lambda a, b: a in b, 'not in': lambda a, b: a not in b})
+
+# The ops with the column on the other side, for comparisons written as `literal op column`
+REFLECTED_OPS = {'==': '==', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+# Datatypes for which a raw source value can be cast the way the row processor casts it
+RAW_DATATYPES = ('string', 'text', 'str', 'integer', 'int', 'number', 'float')
+
+
+def parse_filter(expr):
+    """Return a RowFilter for an expression, or the expression itself if it is already a RowFilter"""
+
+    return expr if isinstance(expr, RowFilter) else RowFilter(expr)
+
+
+def _raw_int(v):
+    if isinstance(v, int) and not isinstance(v, bool):
+        return v
+    elif isinstance(v, str) and v == v.strip() and '_' not in v:
+        return int(v)
+
+    raise ValueError(v)
+
+
+def _raw_float(v):
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return float(v)
+    elif isinstance(v, str) and v == v.strip() and '_' not in v:
+        return float(v)
+
+    raise ValueError(v)
+
+
+def _raw_str(v):
+    if isinstance(v, str) and v and v == v.strip():
+        return v
+
+    raise ValueError(v)
+
+
+RAW_CASTS = {
+    'string': _raw_str, 'text': _raw_str, 'str': _raw_str,
+    'integer': _raw_int, 'int': _raw_int,
+    'number': _raw_float, 'float': _raw_float
+}
+
+
+def _is_null(v):
+    return v is None or (isinstance(v, float) and v != v)
+
+
+def _leaf_function(op):
+    """Return a function for a comparison of a value to a literal. Comparisons of nulls, and of values
+    of types that can't be compared, are false, so `not` and `or` apply to the other comparisons
+    as they would if the value were present"""
+
+    if op == 'is':
+        return lambda a, b: _is_null(a)
+    elif op == 'is not':
+        return lambda a, b: not _is_null(a)
+
+    f = LEAF_OPS[op]
+
+    def _leaf(a, b):
+        if _is_null(a):
+            return False
+
+        try:
+            return bool(f(a, b))
+        except TypeError:
+            return False
+
+    return _leaf
+
+
+def _coerce_literal(v, datatype):
+    """Convert string literals to dates for comparisons with date columns"""
+    from datetime import date, datetime
+
+    if not isinstance(v, str):
+        return v
+
+    try:
+        if datatype == 'date':
+            return date.fromisoformat(v)
+        elif datatype == 'datetime':
+            return datetime.fromisoformat(v)
+    except ValueError:
+        raise FilterError("Can't compare '{}' to a {} column".format(v, datatype))
+
+    return v
+
+
+class RowFilter(object):
+    """A parsed filter expression. The expression is parsed into a tree of tuples:
+
+        ('cmp', op, column, value)
+        ('and', [nodes]), ('or', [nodes]), ('not', node)
+
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+
+        try:
+            tree = ast.parse(expr.strip(), mode='eval')
+        except (SyntaxError, AttributeError) as e:
+            raise FilterError("Failed to parse filter '{}': {}".format(expr, e))
+
+        self.node = self._parse(tree.body)
+
+        self.columns = []
+
+        for n in self._comparisons(self.node):
+            if n[2] not in self.columns:
+                self.columns.append(n[2])
+
+    def __str__(self):
+        return self.expr
+
+    def __repr__(self):
+        return "RowFilter({!r})".format(self.expr)
+
+    def _error(self, msg):
+        return FilterError("{} in filter '{}'".format(msg, self.expr))
+
+    def _literal(self, node):
+        try:
+            v = ast.literal_eval(node)
+        except ValueError:
+            raise self._error("Expected a column name or a literal value, got '{}'".format(ast.dump(node)))
+
+        if isinstance(v, (list, tuple, set, frozenset)):
+            try:
+                return frozenset(v)
+            except TypeError:
+                return tuple(v)
+
+        return v
+
+    def _compare(self, op, left, right):
+
+        if isinstance(left, ast.Name) and isinstance(right, ast.Name):
+            raise self._error('Comparisons between columns are not supported')
+        elif isinstance(left, ast.Name):
+            column, value = left.id, self._literal(right)
+        elif isinstance(right, ast.Name) and op in REFLECTED_OPS:
+            column, value, op = right.id, self._literal(left), REFLECTED_OPS[op]
+        else:
+            raise self._error("The left side of '{}' must be a column".format(op))
+
+        if op in ('in', 'not in') and not isinstance(value, (frozenset, tuple)):
+            raise self._error("The right side of '{}' must be a list of values".format(op))
+        elif op in ('is', 'is not') and value is not None:
+            raise self._error("The right side of '{}' must be None".format(op))
+
+        return 'cmp', op, column, value
+
+    @staticmethod
+    def _and(parts):
+        """Combine nodes into a conjunction, merging nested conjunctions"""
+        conjuncts = []
+
+        for n in parts:
+            conjuncts.extend(n[1] if n[0] == 'and' else [n])
+
+        return conjuncts[0] if len(conjuncts) == 1 else ('and', conjuncts)
+
+    def _parse(self, node):
+
+        if isinstance(node, ast.BoolOp):
+            if isinstance(node.op, ast.And):
+                return self._and([self._parse(e) for e in node.values])
+
+            return 'or', [self._parse(e) for e in node.values]
+
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return 'not', self._parse(node.operand)
+
+        elif isinstance(node, ast.Compare):
+            # Chained comparisons, like 2010 <= year < 2020, are a conjunction of comparisons
+            terms = [node.left] + node.comparators
+            parts = [self._compare(COMPARE_OPS[type(op)], terms[i], terms[i + 1])
+                     for i, op in enumerate(node.ops)]
+
+            return self._and(parts)
+
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                and isinstance(node.func.value, ast.Name) and not node.keywords:
+
+            column, method, args = node.func.value.id, node.func.attr, node.args
+
+            if method == 'isin' and len(args) == 1:
+                return self._compare('in', node.func.value, args[0])
+            elif method == 'between' and len(args) == 2:
+                return 'and', [('cmp', '>=', column, self._literal(args[0])),
+                               ('cmp', '<=', column, self._literal(args[1]))]
+
+            raise self._error("Unknown method '{}'".format(method))
+
+        raise self._error("Unsupported expression '{}'".format(ast.dump(node)))
+
+    @classmethod
+    def _comparisons(cls, node):
+        if node[0] == 'cmp':
+            yield node
+        elif node[0] == 'not':
+            yield from cls._comparisons(node[1])
+        else:
+            for n in node[1]:
+                yield from cls._comparisons(n)
+
+    def _source(self, node, ref, values):
+        """Return Python source for a node. `ref` maps a column to the source for its value, and
+        literal values and the functions for the comparisons are added to `values`, so they are
+        bound as names"""
+
+        if node[0] == 'cmp':
+            _, op, column, value = node
+
+            n = len(values)
+            values['v{}'.format(n)] = value
+            values['f{}'.format(n)] = _leaf_function(op)
+
+            return 'f{0}({1}, v{0})'.format(n, ref(column))
+
+        elif node[0] == 'not':
+            return '(not {})'.format(self._source(node[1], ref, values))
+
+        else:
+            return '({})'.format(' {} '.format(node[0]).join(self._source(n, ref, values) for n in node[1]))
+
+    @staticmethod
+    def _compile(source, names):
+        code = 'def _filter(row):\n    return {}\n'.format(source)
+
+        exec(compile(code, '<filter>', 'exec'), names)
+
+        return names['_filter']
+
+    def _coerced(self, node, datatypes):
+        """Return the node with literals converted to the datatypes of the columns"""
+
+        if node[0] == 'cmp':
+            _, op, column, value = node
+            dt = datatypes.get(column)
+
+            if isinstance(value, (frozenset, tuple)):
+                value = type(value)(_coerce_literal(e, dt) for e in value)
+            else:
+                value = _coerce_literal(value, dt)
+
+            return 'cmp', op, column, value
+
+        elif node[0] == 'not':
+            return 'not', self._coerced(node[1], datatypes)
+
+        else:
+            return node[0], [self._coerced(n, datatypes) for n in node[1]]
+
+    def predicate(self, headers, datatypes=None):
+        """Return a function that returns True for processed rows that match the filter. Comparisons
+        of null values to other values are false.
+
+        :param headers: The headers of the rows
+        :param datatypes: Optional dict of column names to schema datatypes, used to compare dates
+        """
+
+        pos = {h: i for i, h in enumerate(headers)}
+
+        values = {}
+        source = self._source(self._coerced(self.node, datatypes or {}), lambda c: 'row[{}]'.format(pos[c]),
+                              values)
+
+        f = self._compile(source, values)
+
+        def _predicate(row):
+            try:
+                return f(row)
+            except (TypeError, IndexError):
+                return False
+
+        return _predicate
+
+    def raw_predicate(self, positions, datatypes):
+        """Return a function that returns False for raw source rows that can't match the filter, or
+        None if no part of the filter can be evaluated on source rows. The function is conservative:
+        if a value can't be cast exactly as the row processor would cast it, the row is kept, to
+        be checked again after it is processed.
+
+        :param positions: Dict of column names to positions in the source rows, for the columns
+            whose source values are only cast, not transformed
+        :param datatypes: Dict of column names to schema datatypes
+        """
+
+        # Only the conjuncts of the filter that use columns in the source can be evaluated
+        conjuncts = self.node[1] if self.node[0] == 'and' else [self.node]
+
+        conjuncts = [n for n in conjuncts
+                     if all(c[2] in positions and datatypes.get(c[2]) in RAW_CASTS for c in self._comparisons(n))]
+
+        if not conjuncts:
+            return None
+
+        values = {}
+        casts = {}
+
+        def ref(column):
+            name = 'c{}'.format(positions[column])
+            casts[name] = RAW_CASTS[datatypes[column]]
+            return '{}(row[{}])'.format(name, positions[column])
+
+        source = self._source(('and', conjuncts), ref, values)
+
+        f = self._compile(source, dict(values, **casts))
+
+        def _raw_predicate(row):
+            try:
+                return f(row)
+            except Exception:
+                return True
+
+        return _raw_predicate
+
+    def mask(self, df, datatypes=None):
+        """Return a boolean Series that is true for the rows of a dataframe that match the filter"""
+        import pandas as pd
+
+        datatypes = datatypes or {}
+
+        def column(c):
+            s = df[c]
+
+            if datatypes.get(c) in ('date', 'datetime') and s.dtype == object:
+                s = pd.to_datetime(s, errors='coerce')
+
+            return s
+
+        def _mask(node):
+            if node[0] == 'cmp':
+                _, op, c, value = node
+                s = column(c)
+
+                if op == 'is':
+                    return s.isna()
+                elif op == 'is not':
+                    return s.notna()
+
+                # Comparisons of nulls are false, as in predicate()
+                try:
+                    if op == 'in':
+                        m = s.isin(list(value))
+                    elif op == 'not in':
+                        m = ~s.isin(list(value))
+                    else:
+                        m = MASK_OPS[op](s, value).fillna(False).astype(bool)
+                except TypeError:
+                    # Values that can't be compared to the literal, in an object column
+                    f = _leaf_function(op)
+                    m = s.map(lambda v: f(v, value)).astype(bool)
+
+                return m & s.notna()
+
+            elif node[0] == 'not':
+                return ~_mask(node[1])
+
+            masks = [_mask(n) for n in node[1]]
+
+            m = masks[0]
+
+            for e in masks[1:]:
+                m = (m & e) if node[0] == 'and' else (m | e)
+
+            return m
+
+        return _mask(self.node)
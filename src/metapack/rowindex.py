@@ -0,0 +1,185 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Indexes of the byte offsets of the records in local CSV files, so rows in the middle of a large
+file can be read without parsing all of the rows before them.
+
+An index records the offset of every Kth data record. Reading row N seeks to the offset of record
+N - N % K and parses at most K - 1 records before it. Indexes are stored in the download cache, keyed
+by the path, size and modification time of the file, so an index is rebuilt when its file changes.
+"""
+
+import struct
+from os.path import join
+
+from metapack.constants import MATERIALIZED_DATA_PREFIX
+
+ROW_INDEX_DIR = join(MATERIALIZED_DATA_PREFIX, '_rowindex')
+
+# Number of records between indexed offsets
+DEFAULT_STRIDE = 1000
+
+_HEADER = struct.Struct('<qq')  # stride, number of records
+
+
+class RowIndex(object):
+    """The offsets of every `stride` th data record of a file, and the number of data records"""
+
+    def __init__(self, stride, n_records, offsets):
+        self.stride = stride
+        self.n_records = n_records
+        self.offsets = offsets
+
+    def __len__(self):
+        return self.n_records
+
+    @classmethod
+    def build(cls, path, skip_records=0, stride=DEFAULT_STRIDE):
+        """Scan a file for the offsets of its records, after skipping `skip_records` header records"""
+        from array import array
+        from mmap import ACCESS_READ, mmap
+
+        from .parallel import _next_record_end, data_offset
+
+        offsets = array('q')
+        n = 0
+
+        with open(path, 'rb') as f:
+            try:
+                m = mmap(f.fileno(), 0, access=ACCESS_READ)
+            except ValueError:  # Empty file
+                return cls(stride, 0, offsets)
+
+            with m:
+                size = len(m)
+                pos = data_offset(m, skip_records)
+
+                while pos < size:
+                    if n % stride == 0:
+                        offsets.append(pos)
+
+                    pos, _ = _next_record_end(m, pos, 0)
+                    n += 1
+
+        return cls(stride, n, offsets)
+
+    @classmethod
+    def load(cls, path):
+        from array import array
+
+        with open(path, 'rb') as f:
+            stride, n_records = _HEADER.unpack(f.read(_HEADER.size))
+            offsets = array('q')
+            offsets.frombytes(f.read())
+
+        return cls(stride, n_records, offsets)
+
+    def save(self, path):
+        from os import getpid, remove, replace
+        from threading import get_ident
+
+        # Unique, so processes and threads indexing the same file don't share a temp file
+        tmp_path = '{}.{}-{}.tmp'.format(path, getpid(), get_ident())
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(self.stride, self.n_records))
+                f.write(self.offsets.tobytes())
+
+            replace(tmp_path, path)
+        except OSError:
+            try:
+                remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def locate(self, i):
+        """Return the offset of the indexed record at or before record i, and the number of records
+        between them"""
+        return self.offsets[i // self.stride], i % self.stride
+
+
+def row_index_path(cache, path, skip_records=0, stride=DEFAULT_STRIDE):
+    """Return the path of the index file for a CSV file, in the download cache"""
+    from hashlib import md5
+    from os import stat
+
+    from metapack.util import ensure_dir
+
+    st = stat(path)
+
+    key = md5('{}:{}:{}:{}:{}'.format(path, st.st_size, st.st_mtime_ns, skip_records, stride)
+              .encode('utf8')).hexdigest()
+
+    d = cache.getsyspath(ROW_INDEX_DIR)
+    ensure_dir(d)
+
+    return join(d, key + '.idx')
+
+
+def get_row_index(cache, path, skip_records=0, stride=DEFAULT_STRIDE):
+    """Return the RowIndex for a file, building and saving it if it is not in the cache"""
+    from os.path import exists
+
+    index_path = row_index_path(cache, path, skip_records, stride)
+
+    if exists(index_path):
+        try:
+            return RowIndex.load(index_path)
+        except (OSError, struct.error):
+            pass
+
+    idx = RowIndex.build(path, skip_records, stride)
+
+    try:
+        idx.save(index_path)
+    except OSError:
+        pass  # Still usable, but it will be rebuilt next time
+
+    return idx
+
+
+def _reader(f, offset, encoding, delimiter):
+    import csv
+    from io import TextIOWrapper
+
+    f.seek(offset)
+
+    return csv.reader(TextIOWrapper(f, encoding=encoding), delimiter=delimiter)
+
+
+def read_rows(path, idx, start, stop, encoding='utf8', delimiter=','):
+    """Yield the records from `start` to `stop` of a file, as lists of strings"""
+    from itertools import islice
+
+    stop = min(stop, idx.n_records)
+
+    if start >= stop:
+        return
+
+    offset, skip = idx.locate(start)
+
+    with open(path, 'rb') as f:
+        yield from islice(_reader(f, offset, encoding, delimiter), skip, skip + stop - start)
+
+
+def read_rows_at(path, idx, positions, encoding='utf8', delimiter=','):
+    """Yield the records at a sorted sequence of positions, parsing each block of the index once"""
+    from itertools import groupby
+
+    for block, group in groupby(positions, key=lambda i: i // idx.stride):
+        with open(path, 'rb') as f:
+            reader = _reader(f, idx.offsets[block], encoding, delimiter)
+
+            n = 0
+
+            for i in group:
+                skip = i % idx.stride
+
+                for row in reader:
+                    n += 1
+                    if n > skip:
+                        yield row
+                        break
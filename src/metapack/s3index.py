@@ -0,0 +1,170 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Index the CSV packages in an S3 bucket. The bucket listing is paged, the metadata files are fetched with
+a pool of threads that share one client, so connections are reused, and the ETags of indexed objects are
+stored in the search index manifest, so later runs only fetch the objects that have changed.
+
+Set the METAPACK_S3_ENDPOINT environmental variable to use an S3 compatible service, such as minio.
+"""
+
+from os import environ
+
+DEFAULT_WORKERS = 16
+
+
+def s3_client(profile=None, endpoint_url=None, workers=DEFAULT_WORKERS):
+    """Return a boto3 S3 client with a connection pool large enough for `workers` threads"""
+    import boto3
+    from botocore.config import Config
+
+    session = boto3.Session(profile_name=profile)
+
+    return session.client('s3', endpoint_url=endpoint_url or environ.get('METAPACK_S3_ENDPOINT'),
+                          config=Config(max_pool_connections=workers))
+
+
+def list_objects(client, bucket, prefix=''):
+    """Yield the object records for all of the objects under a prefix, one page of the listing at a time"""
+
+    paginator = client.get_paginator('list_objects_v2')
+
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+
+def fetch_object(client, bucket, key, etag=None):
+    """Return the ETag and body of an object, or None if the object's ETag still matches `etag` """
+    from botocore.exceptions import ClientError
+
+    kwargs = {'IfNoneMatch': etag} if etag else {}
+
+    try:
+        r = client.get_object(Bucket=bucket, Key=key, **kwargs)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+            return None
+        raise
+
+    return r['ETag'], r['Body'].read()
+
+
+def package_entries(body, key):
+    """Parse the body of a CSV package and return its Root.Modified and Root.Version values and a list of
+    index entries, ( identifier, name, nvname, version, format, url ), one for each distribution"""
+    import re
+    from os.path import basename, join
+    from shutil import rmtree
+    from tempfile import mkdtemp
+
+    from rowgenerators import parse_app_url
+
+    from metapack.doc import MetapackDoc
+
+    d = mkdtemp()
+
+    try:
+        path = join(d, basename(key))
+
+        with open(path, 'wb') as f:
+            f.write(body)
+
+        p = MetapackDoc(path)
+
+        version_m = re.search('-([^-]+)$', p.name or '')
+
+        if not version_m:
+            return None, None, []
+
+        entries = []
+
+        for dist in p.find('Root.Distribution'):
+            u = parse_app_url(dist.value)
+
+            if u.target_format in ('xlsx', 'zip', 'csv'):
+                entries.append((p.identifier, p.name, p.nonver_name, version_m.group(1), u.target_format,
+                                'metapack+' + str(u)))
+
+        return p.get_value('Root.Modified'), p.get_value('Root.Version'), entries
+    finally:
+        rmtree(d, ignore_errors=True)
+
+
+def _fetch_entries(client, bucket, key, etag):
+    from rowgenerators.exceptions import RowGeneratorError
+
+    from metapack.exc import MetatabFileNotFound
+
+    r = fetch_object(client, bucket, key, etag)
+
+    if r is None:
+        return None
+
+    new_etag, body = r
+
+    try:
+        return (new_etag,) + package_entries(body, key)
+    except (RowGeneratorError, MetatabFileNotFound):
+        # Not a package; record it anyway, so it isn't fetched again until it changes
+        return new_etag, None, None, []
+
+
+def index_s3(idx, bucket, prefix='', client=None, workers=DEFAULT_WORKERS, force=False, callback=None):
+    """Add the CSV packages in a bucket to a search index, and remove the entries for packages that are
+    no longer in the bucket. CSV packages are used because they have the distribution information for
+    the other package formats, so the Excel and ZIP packages don't have to be opened.
+
+    Returns the number of objects that were indexed, unchanged and removed"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    client = client or s3_client(workers=workers)
+
+    manifest = idx.manifest()
+
+    def source(key):
+        return 's3://{}/{}'.format(bucket, key)
+
+    listed = {}
+    changed = []
+
+    for o in list_objects(client, bucket, prefix):
+        if not o['Key'].endswith('.csv'):
+            continue
+
+        src = source(o['Key'])
+        listed[src] = o
+
+        etag = manifest.get(src, {}).get('etag')
+
+        if force or etag != o['ETag']:
+            changed.append((o, None if force else etag))
+
+    n_indexed = 0
+
+    with ThreadPoolExecutor(workers) as pool:
+        results = pool.map(lambda e: _fetch_entries(client, bucket, e[0]['Key'], e[1]), changed)
+
+        for (o, _), r in zip(changed, results):
+            if r is None:  # Not modified since the listing
+                continue
+
+            etag, modified, version, entries = r
+
+            if callback:
+                callback(o['Key'], entries)
+
+            keys = [idx.add_entry(*e) for e in entries]
+
+            idx.set_source(source(o['Key']), [int(o['LastModified'].timestamp() * 1e9), o['Size']],
+                           modified, version, keys, etag=etag)
+
+            n_indexed += 1
+
+    root = source(prefix)
+
+    removed = [src for src in manifest if src.startswith(root) and src not in listed]
+
+    idx.remove_sources(removed)
+
+    return n_indexed, len(listed) - len(changed), len(removed)
@@ -0,0 +1,174 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Single pass, fixed memory sampling and summaries of resource values.
+
+reservoir_sample() returns a uniform random sample of an iterable of unknown length. ValueSketch
+summarizes the values of a column, estimating the number of distinct values with a HyperLogLog
+and the most common values with a count-min sketch.
+"""
+
+import random
+from array import array
+from collections import deque
+from itertools import islice
+from math import exp, floor, log
+
+_MASK64 = (1 << 64) - 1
+
+
+def reservoir_sample(items, n, rand=None):
+    """Return a uniform random sample of `n` items from an iterable, in their original order, in one pass.
+    Uses Algorithm L, which computes how many items to skip before the next replacement, so most items
+    are only consumed, not tested."""
+
+    rand = rand or random
+
+    def u():
+        return rand.random() or 1e-300
+
+    it = enumerate(items)
+
+    reservoir = list(islice(it, n))
+
+    if len(reservoir) == n and n > 0:
+        w = exp(log(u()) / n)
+
+        while True:
+            skip = floor(log(u()) / log(1 - w))
+
+            deque(islice(it, skip), maxlen=0)  # Consume the skipped items
+
+            try:
+                reservoir[rand.randrange(n)] = next(it)
+            except StopIteration:
+                break
+
+            w *= exp(log(u()) / n)
+
+    reservoir.sort(key=lambda e: e[0])
+
+    return [e[1] for e in reservoir]
+
+
+def value_hash(v):
+    """Return a 64 bit hash of a value. Non-string values are hashed by their repr, so 1 and '1' are distinct
+    and integers, which hash to themselves, are well distributed"""
+
+    return hash(v if isinstance(v, str) else repr(v)) & _MASK64
+
+
+class HyperLogLog(object):
+    """Estimate the number of distinct values from 2**p registers of the maximum rank of the value hashes"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self._shift = 64 - p
+        self._mask = (1 << self._shift) - 1
+
+    def add(self, h):
+        j = h >> self._shift
+        rank = self._shift - (h & self._mask).bit_length() + 1
+
+        if rank > self.registers[j]:
+            self.registers[j] = rank
+
+    def count(self):
+        return hll_estimate(self.m, sum(2.0 ** -r for r in self.registers), self.registers.count(0))
+
+
+def hll_estimate(m, harmonic, zeros):
+    """Return the HyperLogLog estimate of the number of distinct values, from the number of registers,
+    the sum of 2 ** -register, and the number of registers that are zero"""
+
+    e = 0.7213 / (1 + 1.079 / m) * m * m / harmonic
+
+    if e <= 2.5 * m and zeros:
+        return round(m * log(m / zeros))  # Linear counting for small cardinalities
+
+    return round(e)
+
+
+class CountMinSketch(object):
+    """Estimate the counts of values, as the minimum of `depth` counters, never less than the true count"""
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.tables = [array('q', bytes(8 * width)) for _ in range(depth)]
+
+    def add(self, h, n=1):
+        """Add a value hash to the sketch, and return the new estimate of its count"""
+
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+
+        est = None
+
+        for i, t in enumerate(self.tables):
+            j = (h1 + i * h2) % self.width
+            t[j] += n
+
+            if est is None or t[j] < est:
+                est = t[j]
+
+        return est
+
+    def estimate(self, h):
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+
+        return min(t[(h1 + i * h2) % self.width] for i, t in enumerate(self.tables))
+
+
+class ValueSketch(object):
+    """Approximate summary of a sequence of values, in one pass and fixed memory: the number of values,
+    the number of distinct values and the most common values, with their estimated counts"""
+
+    def __init__(self, k=10, p=14, width=4096, depth=4):
+        self.k = k
+        self.n = 0
+        self.hll = HyperLogLog(p)
+        self.cms = CountMinSketch(width, depth)
+
+        # Candidates for the most common values, and the lowest estimate among them
+        self._capacity = 4 * k
+        self._top = {}
+        self._floor = 0
+
+    def add(self, v):
+        h = value_hash(v)
+
+        self.n += 1
+        self.hll.add(h)
+        est = self.cms.add(h)
+
+        top = self._top
+
+        if v in top or len(top) < self._capacity:
+            top[v] = est
+        elif est > self._floor:
+            low = min(top, key=top.get)
+
+            if est > top[low]:
+                del top[low]
+                top[v] = est
+
+            self._floor = min(top.values())
+
+    def update(self, values):
+        for v in values:
+            self.add(v)
+
+        return self
+
+    @property
+    def distinct(self):
+        """Estimated number of distinct values"""
+        return self.hll.count()
+
+    def most_common(self, k=None):
+        """Return a list of (value, estimated count) for the k most common values"""
+
+        return sorted(self._top.items(), key=lambda e: e[1], reverse=True)[:k or self.k]
@@ -0,0 +1,482 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+An HTTP service that streams the rows of package resources, as CSV, JSON lines or Arrow IPC streams.
+
+    GET /packages
+    GET /packages/{name}
+    GET /packages/{name}/resources/{resource}?format=csv&limit=100&offset=10&columns=a,b&filter=a>10
+
+The filter is a metapack.rowfilter expression.
+
+The format can also be selected with the Accept header; the default is CSV. Rows are generated in a
+pool of threads, in batches, and each batch is written to the client before more than a few batches
+are generated, so slow clients hold back the generator rather than growing the server's memory, and
+slow generators don't block the event loop.
+
+Run the server with:
+
+    python -m metapack.server -p 8080 /path/to/packages
+
+The Arrow format requires pyarrow.
+"""
+
+import asyncio
+import json
+from itertools import islice
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_QUEUE_SIZE = 4
+
+STATUS_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  406: 'Not Acceptable', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class CsvEncoder(object):
+    content_type = 'text/csv; charset=utf-8'
+
+    def __init__(self, headers, datatypes):
+        self.headers = headers
+
+    def _write(self, rows):
+        import csv
+        from io import StringIO
+
+        f = StringIO()
+        csv.writer(f).writerows(rows)
+        return f.getvalue().encode('utf8')
+
+    def begin(self):
+        return self._write([self.headers])
+
+    def encode(self, rows):
+        return self._write(rows)
+
+    def end(self):
+        return b''
+
+
+class JsonLinesEncoder(object):
+    """Encodes each row as a JSON object, with the same encoder that Resource.iterjson() uses"""
+    content_type = 'application/x-ndjson'
+
+    def __init__(self, headers, datatypes):
+        from rowgenerators.rowpipe.json import VTEncoder
+
+        self.headers = headers
+        self.encoder = VTEncoder()
+
+    def begin(self):
+        return b''
+
+    def encode(self, rows):
+        return ''.join(self.encoder.encode(dict(zip(self.headers, row))) + '\n' for row in rows).encode('utf8')
+
+    def end(self):
+        return b''
+
+
+class ArrowEncoder(object):
+    """Encodes rows as record batches in an Arrow IPC stream, with a schema from the resource's datatypes"""
+    content_type = 'application/vnd.apache.arrow.stream'
+
+    type_map = {
+        'integer': 'int64', 'int': 'int64',
+        'number': 'float64', 'float': 'float64',
+        'boolean': 'bool_', 'bool': 'bool_',
+        'date': 'date32',
+    }
+
+    def __init__(self, headers, datatypes):
+        from io import BytesIO
+
+        import pyarrow as pa
+
+        def arrow_type(dt):
+            if dt == 'datetime':
+                return pa.timestamp('us')
+            return getattr(pa, self.type_map.get(dt, 'string'))()
+
+        self.pa = pa
+        self.schema = pa.schema([(h, arrow_type(dt)) for h, dt in zip(headers, datatypes)])
+        self.sink = BytesIO()
+        self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def _flush(self):
+        v = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return v
+
+    def _array(self, values, type_):
+        pa = self.pa
+
+        if type_ == pa.string():
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+
+        try:
+            return pa.array(values, type=type_)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+            # Values that don't match the schema datatype become nulls
+            def convert(v):
+                try:
+                    return pa.scalar(v, type=type_).as_py()
+                except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+                    return None
+
+            return pa.array([convert(v) for v in values], type=type_)
+
+    def begin(self):
+        return self._flush()  # The schema message
+
+    def encode(self, rows):
+        columns = list(zip(*rows))
+        arrays = [self._array(list(c), f.type) for c, f in zip(columns, self.schema)]
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        return self._flush()
+
+    def end(self):
+        self.writer.close()
+        return self._flush()
+
+
+ENCODERS = {
+    'csv': CsvEncoder,
+    'jsonl': JsonLinesEncoder,
+    'arrow': ArrowEncoder,
+}
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/vnd.apache.arrow.stream': 'arrow',
+}
+
+
+def select_format(query, accept):
+    """Return the name of the output format, from the format query parameter or the Accept header"""
+
+    fmt = query.get('format')
+
+    if fmt:
+        fmt = 'jsonl' if fmt in ('json', 'ndjson') else fmt
+
+        if fmt not in ENCODERS:
+            raise HttpError(400, "Unknown format '{}'; use one of: {}".format(fmt, ', '.join(ENCODERS)))
+
+        return fmt
+
+    for media_type in (accept or '').split(','):
+        media_type = media_type.split(';')[0].strip()
+        if media_type in CONTENT_TYPES:
+            return CONTENT_TYPES[media_type]
+
+    return 'csv'
+
+
+def _int_param(query, name, default):
+    try:
+        v = int(query.get(name, default))
+    except ValueError:
+        raise HttpError(400, "The '{}' parameter must be an integer".format(name))
+
+    if v < 0:
+        raise HttpError(400, "The '{}' parameter must not be negative".format(name))
+
+    return v
+
+
+def resource_rows(r, columns=None, offset=0, limit=None, filter=None):
+    """Return the headers of the selected columns and an iterator of rows for a resource,
+    skipping `offset` rows and stopping after `limit` rows. Only the selected columns are
+    cast and transformed, and if there is a filter, only matching rows are returned. Without a
+    filter, the rows of local CSV files are read from the offset with a row index."""
+    from metapack.exc import NoColumnError
+
+    if filter is not None:
+        itr = iter(r.iterfilter(filter, columns))
+    else:
+        itr = iter(r.rows(offset, None if limit is None else offset + limit, columns))
+        offset = 0
+
+    try:
+        headers = next(itr)
+    except NoColumnError as e:
+        raise HttpError(400, str(e))
+
+    rows = islice(itr, offset, None if limit is None else offset + limit)
+
+    return headers, rows
+
+
+class DataServer(object):
+    """Serve the resources of a set of packages. Packages are found by their names, with
+    or without the version."""
+
+    def __init__(self, packages, workers=None, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.packages = {}
+
+        for doc in packages:
+            self.packages[doc.name] = doc
+            self.packages.setdefault(doc.nonver_name, doc)
+
+        self.executor = ThreadPoolExecutor(workers)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+
+    @classmethod
+    def from_paths(cls, paths, **kwargs):
+        """Create a server for all of the packages in a list of package references or directories"""
+        from os.path import isdir
+
+        from metapack.package import open_package, walk_packages
+
+        docs = []
+
+        for path in paths:
+            if isdir(path):
+                docs.extend(walk_packages(path))
+            else:
+                docs.append(open_package(path))
+
+        return cls(docs, **kwargs)
+
+    def package(self, name):
+        try:
+            return self.packages[name]
+        except KeyError:
+            raise HttpError(404, "No package named '{}'".format(name))
+
+    def resource(self, name, resource_name):
+        """Return a copy of a resource term for one request. Iterating a resource sets its errors and
+        post_iter_meta, so requests in different worker threads must not share the term in the package"""
+        from copy import copy
+
+        r = self.package(name).resource(resource_name)
+
+        if r is None:
+            raise HttpError(404, "Package '{}' has no resource named '{}'".format(name, resource_name))
+
+        r = copy(r)
+        r.errors = {}
+        r.post_iter_meta = {}
+
+        return r
+
+    async def _send_head(self, writer, status, content_type, chunked=False, length=None):
+        lines = ['HTTP/1.1 {} {}'.format(status, STATUS_REASONS.get(status, '')),
+                 'Content-Type: {}'.format(content_type),
+                 'Connection: close']
+
+        if chunked:
+            lines.append('Transfer-Encoding: chunked')
+        elif length is not None:
+            lines.append('Content-Length: {}'.format(length))
+
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin1'))
+        await writer.drain()
+
+    async def _send_json(self, writer, status, o):
+        body = json.dumps(o).encode('utf8')
+        await self._send_head(writer, status, 'application/json', length=len(body))
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_chunk(self, writer, data):
+        if data:
+            writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            await writer.drain()  # Wait for the client to take the data
+
+    async def stream_resource(self, writer, r, fmt, columns, offset, limit, filter=None):
+        """Stream a resource. The rows are generated and encoded in a worker thread, and passed to the event
+        loop through a bounded queue, so the worker waits when the client is slower than the generator."""
+        import threading
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.queue_size)
+        stop = threading.Event()
+        ready = loop.create_future()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def produce():
+            try:
+                headers, rows = resource_rows(r, columns, offset, limit, filter)
+
+                dt_map = {c.get('header'): c.get('datatype') for c in r.columns()}
+
+                encoder = ENCODERS[fmt](headers, [dt_map.get(h) for h in headers])
+
+                loop.call_soon_threadsafe(ready.set_result, None)
+
+                put(encoder.begin())
+
+                while not stop.is_set():
+                    batch = list(islice(rows, self.batch_size))
+
+                    if not batch:
+                        break
+
+                    put(encoder.encode(batch))
+
+                put(encoder.end())
+                put(None)
+
+            except Exception as e:
+                if not ready.done():
+                    loop.call_soon_threadsafe(ready.set_exception, e)
+                put(e)
+
+        task = loop.run_in_executor(self.executor, produce)
+
+        try:
+            try:
+                await ready  # Errors in the parameters or opening the resource are reported with a status
+            except HttpError:
+                raise
+            except Exception as e:
+                raise HttpError(500, '{}: {}'.format(type(e).__name__, e))
+
+            await self._send_head(writer, 200, ENCODERS[fmt].content_type, chunked=True)
+
+            while True:
+                data = await queue.get()
+
+                if data is None:
+                    break
+                elif isinstance(data, Exception):
+                    # The status has already been sent, so end the response without the final chunk
+                    writer.close()
+                    return
+
+                await self._send_chunk(writer, data)
+
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+
+        finally:
+            # If the client went away, stop the worker, and unblock it if it is waiting on the queue
+            stop.set()
+
+            while not task.done():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+
+    async def route(self, writer, method, path, query, headers):
+        from urllib.parse import unquote
+
+        from metapack.exc import FilterError
+        from metapack.rowfilter import parse_filter
+
+        if method not in ('GET',):
+            raise HttpError(405, "Method '{}' not allowed".format(method))
+
+        parts = [unquote(p) for p in path.strip('/').split('/')]
+
+        if parts == ['packages']:
+            await self._send_json(writer, 200, sorted({doc.name for doc in self.packages.values()}))
+
+        elif len(parts) == 2 and parts[0] == 'packages':
+            doc = self.package(parts[1])
+            await self._send_json(writer, 200, {
+                'name': doc.name,
+                'resources': [{'name': r.name, 'description': r.description,
+                               'columns': [c['header'] for c in r.columns()]} for r in doc.resources()]
+            })
+
+        elif len(parts) == 4 and parts[0] == 'packages' and parts[2] == 'resources':
+            r = self.resource(parts[1], parts[3])
+
+            fmt = select_format(query, headers.get('accept'))
+            columns = [c for c in query.get('columns', '').split(',') if c] or None
+            offset = _int_param(query, 'offset', 0)
+            limit = _int_param(query, 'limit', -1) if 'limit' in query else None
+
+            try:
+                f = parse_filter(query['filter']) if query.get('filter') else None
+            except FilterError as e:
+                raise HttpError(400, str(e))
+
+            await self.stream_resource(writer, r, fmt, columns, offset, limit, f)
+
+        else:
+            raise HttpError(404, "Not found: '{}'".format(path))
+
+    async def handle(self, reader, writer):
+        from urllib.parse import parse_qsl, urlsplit
+
+        try:
+            request_line = (await reader.readline()).decode('latin1').strip()
+
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin1').strip()
+                if not line:
+                    break
+                k, _, v = line.partition(':')
+                headers[k.strip().lower()] = v.strip()
+
+            try:
+                method, target, _ = request_line.split(' ', 2)
+            except ValueError:
+                raise HttpError(400, 'Malformed request line')
+
+            u = urlsplit(target)
+
+            await self.route(writer, method, u.path, dict(parse_qsl(u.query)), headers)
+
+        except HttpError as e:
+            await self._send_json(writer, e.status, {'error': str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='metapack.server', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-H', '--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('-p', '--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('-j', '--workers', type=int, help='Number of row generation threads')
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Number of rows generated and sent at a time')
+    parser.add_argument('packages', nargs='+', help='Package references, or directories to search for packages')
+
+    args = parser.parse_args(args)
+
+    server = DataServer.from_paths(args.packages, workers=args.workers, batch_size=args.batch_size)
+
+    print('Serving {} packages on http://{}:{}'.format(len({d.name for d in server.packages.values()}),
+                                                       args.host, args.port))
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+# Copyright (c) 2019 Civic Knowledge. This file is licensed under the terms of the
+# MIT License, included in this distribution as LICENSE
+
+"""
+Per-column profiles of resources, computed in one pass over dataframe chunks with vectorized
+operations. Each column's values are cast to the schema datatype with the vectorized casting in
+metapack.casting, and the profile records:
+
+    count        Number of values that are not null or empty
+    nulls        Number of null or empty values
+    min, max     Smallest and largest values
+    mean         Mean, for numeric columns
+    distinct     Estimated number of distinct values, from a HyperLogLog
+    top          The most common values, with their counts
+    conformance  Fraction of values that can be cast to the schema datatype
+
+Profiles of chunks, or of shards of a file processed in other processes, are merged, so the
+profile of a resource is built without holding more than one chunk in memory.
+"""
+
+from metapack.sampling import hll_estimate
+
+# The Table.Column properties that Resource.stats() writes
+STATS_PROPERTIES = ('count', 'nulls', 'min', 'max', 'mean', 'distinct', 'top', 'conformance')
+
+# Number of HyperLogLog registers is 2 ** HLL_PRECISION
+HLL_PRECISION = 12
+
+
+def _scalar(v):
+    """Convert numpy scalars to Python values"""
+    try:
+        return v.item()
+    except (AttributeError, ValueError):
+        return v
+
+
+def _hll_update(registers, h, p=HLL_PRECISION):
+    """Update HyperLogLog registers, a numpy array, with an array of uint64 hashes"""
+    import numpy as np
+
+    shift = 64 - p
+
+    j = (h >> np.uint64(shift)).astype(np.int64)
+    w = h & np.uint64((1 << shift) - 1)
+
+    # The rank is the position of the leftmost 1 bit in the low bits of the hash
+    bit_length = np.zeros(len(w), dtype=np.int64)
+    nz = w > 0
+    bit_length[nz] = np.floor(np.log2(w[nz].astype(np.float64))).astype(np.int64) + 1
+
+    np.maximum.at(registers, j, (shift - bit_length + 1).astype(np.uint8))
+
+
+class ColumnStats(object):
+    """Accumulate the profile of one column from a sequence of Series"""
+
+    def __init__(self, name, datatype=None, k=10):
+        import numpy as np
+
+        self.name = name
+        self.datatype = datatype
+        self.k = k
+
+        self.rows = 0
+        self.nulls = 0
+        self.failed = None  # None if the values can't be checked against the datatype
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+        self.n_numeric = 0
+        self.registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+
+        # Candidates for the most common values. Keeping more than k makes the merged counts of
+        # values that are common in some chunks but not others more accurate
+        self._capacity = 10 * k
+        self._top = {}
+
+    def _cast(self, s):
+        """Return the series cast to the datatype, the mask of blank values, and the mask of values that
+        failed to cast, or None if the datatype can't be cast with vectorized operations"""
+        from .casting import _blank, cast_column
+
+        blank = _blank(s)
+
+        try:
+            typed = cast_column(s, self.datatype, self.name, {})
+        except ValueError:
+            return s, blank, None
+
+        return typed, blank, typed.isna() & ~blank
+
+    def _extend(self, lo, hi):
+        try:
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+        except TypeError:  # Values of different types in different chunks
+            pass
+
+    def _add_counts(self, counts):
+        top = self._top
+
+        for v, n in counts:
+            top[v] = top.get(v, 0) + n
+
+        if len(top) > self._capacity:
+            self._top = dict(sorted(top.items(), key=lambda e: e[1], reverse=True)[:self._capacity])
+
+    def update(self, s):
+        import pandas as pd
+
+        typed, blank, failed = self._cast(s)
+
+        self.rows += len(s)
+        self.nulls += int(blank.sum())
+
+        if failed is not None:
+            self.failed = (self.failed or 0) + int(failed.sum())
+
+        v = typed[typed.notna() & ~blank]
+
+        if not len(v):
+            return self
+
+        try:
+            self._extend(_scalar(v.min()), _scalar(v.max()))
+        except TypeError:
+            pass
+
+        if pd.api.types.is_numeric_dtype(v) and not pd.api.types.is_bool_dtype(v):
+            self.sum += float(v.sum())
+            self.n_numeric += len(v)
+
+        _hll_update(self.registers, pd.util.hash_pandas_object(v, index=False).to_numpy())
+
+        self._add_counts((_scalar(k), int(n)) for k, n in v.value_counts().iloc[:self._capacity].items())
+
+        return self
+
+    def merge(self, other):
+        import numpy as np
+
+        self.rows += other.rows
+        self.nulls += other.nulls
+
+        if other.failed is not None:
+            self.failed = (self.failed or 0) + other.failed
+
+        self.sum += other.sum
+        self.n_numeric += other.n_numeric
+
+        if other.min is not None:
+            self._extend(other.min, other.max)
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+        self._add_counts(other._top.items())
+
+        return self
+
+    @property
+    def count(self):
+        return self.rows - self.nulls
+
+    @property
+    def mean(self):
+        return self.sum / self.n_numeric if self.n_numeric else None
+
+    @property
+    def distinct(self):
+        r = self.registers
+
+        return hll_estimate(len(r), float((2.0 ** -r.astype(float)).sum()), int((r == 0).sum()))
+
+    @property
+    def conformance(self):
+        """Fraction of the values that can be cast to the datatype, or None if the datatype can't be checked"""
+        if not self.count or self.failed is None:
+            return None
+
+        return (self.count - self.failed) / self.count
+
+    def most_common(self, k=None):
+        return sorted(self._top.items(), key=lambda e: e[1], reverse=True)[:k or self.k]
+
+    def properties(self):
+        """Return a dict of the profile, for Table.Column properties. Missing values are None"""
+
+        def fmt(v):
+            return None if v is None else str(round(v, 4) if isinstance(v, float) else v)
+
+        top = '; '.join('{} ({})'.format(v, n) for v, n in self.most_common())
+
+        return {
+            'count': fmt(self.count),
+            'nulls': fmt(self.nulls),
+            'min': fmt(self.min),
+            'max': fmt(self.max),
+            'mean': fmt(self.mean),
+            'distinct': fmt(self.distinct),
+            'top': top or None,
+            'conformance': fmt(self.conformance)
+        }
+
+
+class TableStats(object):
+    """Profiles for all of the columns of a resource"""
+
+    def __init__(self, headers, datatypes=None, k=10):
+        datatypes = datatypes or [None] * len(headers)
+
+        self.columns = [ColumnStats(h, dt, k) for h, dt in zip(headers, datatypes)]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __getitem__(self, name):
+        for c in self.columns:
+            if c.name == name:
+                return c
+
+        raise KeyError(name)
+
+    def update(self, df):
+        """Add a dataframe chunk, with the columns in the same order as the headers"""
+
+        for i, c in enumerate(self.columns[:len(df.columns)]):
+            c.update(df.iloc[:, i])
+
+        return self
+
+    def merge(self, other):
+        for c, o in zip(self.columns, other.columns):
+            c.merge(o)
+
+        return self
+
+    def dataframe(self):
+        import pandas as pd
+
+        return pd.DataFrame([dict(name=c.name, datatype=c.datatype, **c.properties()) for c in self.columns])
+
+
+def shard_stats(path, begin, end, headers, datatypes, k=10, encoding=None, delimiter=',', chunksize=None):
+    """Profile the records in a byte range of a CSV file, in a worker process"""
+    from io import BytesIO
+
+    import pandas as pd
+
+    with open(path, 'rb') as f:
+        f.seek(begin)
+        data = f.read(end - begin)
+
+    ts = TableStats(headers, datatypes, k)
+
+    reader = pd.read_csv(BytesIO(data), header=None, names=headers, usecols=list(range(len(headers))),
+                         dtype=str, encoding=encoding, sep=delimiter, chunksize=chunksize)
+
+    for df in (reader if chunksize else [reader]):
+        ts.update(df)
+
+    return ts
+
+
+def iter_shard_stats(path, shards, headers, datatypes, k=10, processes=None, encoding=None, delimiter=',',
+                     chunksize=None):
+    """Profile the shards of a CSV file in a pool of worker processes, yielding a TableStats for each"""
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    from os import cpu_count
+
+    f = partial(shard_stats, path, headers=headers, datatypes=datatypes, k=k, encoding=encoding,
+                delimiter=delimiter, chunksize=chunksize)
+
+    if not shards:
+        return
+
+    with ProcessPoolExecutor(processes or cpu_count() or 1) as pool:
+        yield from pool.map(f, *zip(*shards))
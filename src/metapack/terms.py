@@ -1,8 +1,6 @@
 from itertools import islice
 from os.path import join
 
-import pandas as pd
-
 from metatab import Term
 from rowgenerators import parse_app_url
 from rowgenerators.exceptions import DownloadError
@@ -10,17 +8,22 @@ from rowgenerators.rowpipe import RowProcessor
 from rowgenerators.rowproxy import RowProxy
 
 from functools import cached_property
+from typing import TYPE_CHECKING
 
 from metapack.appurl import MetapackPackageUrl
 from metapack.doc import EMPTY_SOURCE_HEADER
 from metapack.exc import (
     MetapackError,
+    NoColumnError,
     NoResourceError,
     NoRowProcessor,
     PackageError,
     ResourceError
 )
 
+if TYPE_CHECKING:
+    import pandas
+
 # The labels file has three columns
 #   - columns, the name of the columns the label applies to
 #   - code, the numerica value
@@ -35,6 +38,19 @@ def int_maybe(v):
         return None
 
 
+def project_rows(rows, positions):
+    """Return a generator of lists of the values at `positions` in each row"""
+    from operator import itemgetter
+
+    if len(positions) == 1:
+        p = positions[0]
+        return ([row[p]] for row in rows)
+
+    getter = itemgetter(*positions)
+
+    return (list(getter(row)) for row in rows)
+
+
 def first_not_none(*a):
     try:
         return next(e for e in a if e is not None)
@@ -42,6 +58,18 @@ def first_not_none(*a):
         return None
 
 
+# Number of rows per batch when building dataframes from iterated rows
+DATAFRAME_CHUNKSIZE = 50_000
+
+# Schema datatypes that are read into numeric dataframe columns
+NUMERIC_DATATYPES = ('integer', 'int', 'number', 'float')
+
+# Resource properties that alter the resolved url or how it is read. A change to any of these
+# invalidates the memoized value of Resource.resolved_url
+URL_PROPERTIES = ('targetformat', 'target_format', 'targetfile', 'target_file', 'encoding',
+                  'headers', 'start', 'end', 'startline', 'endline', 'headerlines')
+
+
 class Resource(Term):
     # These property names should return null if they aren't actually set.
     _common_properties = 'url name description schema'.split()
@@ -55,6 +83,10 @@ class Resource(Term):
         # Metadata returned by the iteratator, available after iteration
         self.post_iter_meta = {}
 
+        # Memoized resolved_url, and the fingerprint of the term when it was resolved
+        self._resolved_url_cache = None
+        self._resolved_url_key = None
+
         super().__init__(term, value, term_args, row, col, file_name, file_type, parent, doc, section)
 
     @property
@@ -140,8 +172,37 @@ class Resource(Term):
 
         return u
 
+    def _url_fingerprint(self):
+        """Return a tuple of the values that determine the resolved url: the term value, the
+        url-affecting properties, and the package url of the document"""
+
+        return (self.value,
+                str(self.doc.package_url) if self.doc else None,
+                tuple((c.record_term_lc, c.value) for c in self.children
+                      if c.record_term_lc in URL_PROPERTIES))
+
+    def invalidate_url(self):
+        """Clear the memoized resolved_url, forcing it to be resolved again on the next access. Changes
+        to the term value or the url properties are detected automatically, but changes outside of the
+        term, such as to the search index for `index:` urls, are not."""
+
+        self._resolved_url_cache = None
+        self._resolved_url_key = None
+
     @property
     def resolved_url(self):
+        """The resource url, resolved against the package url and updated with the resource properties. The
+        value is memoized, and re-resolved when the term value or url properties change."""
+
+        key = self._url_fingerprint()
+
+        if self._resolved_url_key != key or self._resolved_url_cache is None:
+            self._resolved_url_cache = self._resolve_url()
+            self._resolved_url_key = key
+
+        return self._resolved_url_cache
+
+    def _resolve_url(self):
 
         ru = self._resolved_url()
 
@@ -246,10 +307,10 @@ class Resource(Term):
         if not self.name:
             raise MetapackError("Resource for url '{}' does not have name".format(self.url))
 
-        t = self.doc.find_first('Root.Table', value=self.get_value('name'))
+        t = self.doc.table(self.get_value('name'))
 
         if not t:
-            t = self.doc.find_first('Root.Table', value=self.get_value('schema'))
+            t = self.doc.table(self.get_value('schema'))
 
         return t
 
@@ -379,9 +440,10 @@ class Resource(Term):
 
         return self.columns()
 
-    def row_processor_table(self, ignore_none=False, width_column='width'):
+    def row_processor_table(self, ignore_none=False, width_column='width', columns=None):
         """Create a row processor from the schema, to convert the text values from the
-        CSV into real types"""
+        CSV into real types. If `columns` is a collection of column names, the table has only
+        those columns, in schema order"""
         from rowgenerators.rowpipe import Table
 
         type_map = {
@@ -401,27 +463,97 @@ class Resource(Term):
 
             t = Table(self.get_value('name'))
 
-            col_n = 0
-
-            for c in self.schema_term.children:
+            for name, c in self._schema_columns(ignore_none):
 
-                if ignore_none and c.name == EMPTY_SOURCE_HEADER:
-                    continue
-
-                if c.term_is('Table.Column'):
-                    t.add_column(self._name_for_col_term(c, col_n),
+                if columns is None or name in columns:
+                    t.add_column(name,
                                  datatype=map_type(c.get_value('datatype')),
                                  valuetype=map_type(c.get_value('valuetype')),
                                  transform=c.get_value('transform'),
                                  width=c.get_value(width_column)
                                  )
-                    col_n += 1
 
             return t
 
         else:
             return None
 
+    def _schema_columns(self, ignore_none=False):
+        """Return (name, term) for each of the Table.Column terms of the schema, with the names
+        used in the row processor table"""
+
+        columns = []
+
+        for c in self.schema_term.children:
+
+            if ignore_none and c.name == EMPTY_SOURCE_HEADER:
+                continue
+
+            if c.term_is('Table.Column'):
+                columns.append((self._name_for_col_term(c, len(columns)), c))
+
+        return columns
+
+    def _processed_columns(self, columns):
+        """Return the names of the schema columns that the row processor must produce to output `columns`:
+        the columns, the columns named in their transforms, and the first column, which the row processor
+        fills with the row number when it isn't in the source. Returns None if a transform may read other
+        columns through the row, so all of the columns must be processed."""
+        schema_columns = self._schema_columns()
+        terms = dict(schema_columns)
+
+        if not schema_columns:
+            return None
+
+        env = self.env
+
+        needed = set()
+        stack = [schema_columns[0][0]] + [c for c in columns if c in terms]
+
+        while stack:
+            name = stack.pop()
+
+            if name in needed:
+                continue
+
+            needed.add(name)
+
+            for token in self._code_tokens(terms[name]):
+                if self._token_reads(token, ('row',), env):
+                    return None
+                elif token in terms:
+                    stack.append(token)
+
+        return needed
+
+    @staticmethod
+    def _code_tokens(c):
+        """Return the names used in the transform and valuetype of a column term"""
+        import re
+
+        code = ' '.join(v for v in (c.get_value('transform'), c.get_value('valuetype')) if v)
+
+        return re.findall(r'[A-Za-z_]\w*', code)
+
+    @staticmethod
+    def _token_reads(token, params, env):
+        """Return True if a token in a transform is one of the row processor arguments in `params`,
+        or is a function from the environment that takes one of them"""
+        import inspect
+
+        if token in params:
+            return True
+
+        f = env.get(token)
+
+        if not callable(f):
+            return False
+
+        try:
+            return bool(set(params) & set(inspect.signature(f.__init__ if inspect.isclass(f) else f).parameters))
+        except (TypeError, ValueError):
+            return True
+
     @property
     def row_generator(self):
         return self._row_generator()
@@ -609,21 +741,506 @@ class Resource(Term):
         except AttributeError:
             self.errors = {}
 
-    @property
-    def iterdict(self):
-        """Iterate over the resource in dict records"""
-        from collections import OrderedDict
+    def itercolumns(self, columns):
+        """Like iterating the resource, but yield only the values for `columns`, a list of column names,
+        in that order. With a schema, the row processor casts and transforms only the requested columns and
+        the columns their transforms use, rather than all of the columns.
 
-        headers = None
+        :param columns: List of column names
+        """
+        from rowgenerators.source import SelectiveRowGenerator
 
-        for row in self:
+        columns = list(columns or [])
 
-            if headers is None:
-                headers = row
-                continue
+        if not columns:
+            yield from self
+            return
+
+        upstream = self._upstream_resource()
+
+        if upstream is not None:
+            yield from upstream.itercolumns(columns)
+            return
+
+        header_lines, start, end = self._get_start_end_header()
+
+        rptable = None
+
+        if self.schema_term:
+            rptable = self.row_processor_table(columns=self._processed_columns(columns))
+
+        base_row_gen = self.row_generator
+
+        if rptable:
+            headers = rptable.headers
+            self._check_columns(columns, headers)
+
+            rg = iter(RowProcessor(islice(base_row_gen, start, end),
+                                   rptable,
+                                   source_headers=self.source_headers,
+                                   manager=self,
+                                   env=self.env,
+                                   code_path=self._projection_code_path(headers)))
+        else:
+            rg = iter(SelectiveRowGenerator(base_row_gen, header_lines=header_lines, start=start, end=end))
+            headers = next(rg)
+            self._check_columns(columns, headers)
+
+        yield list(columns)
+        yield from project_rows(rg, [headers.index(c) for c in columns])
+
+        self.post_iter_meta = base_row_gen.meta
+
+        try:
+            self.errors = rg.errors if rg.errors else {}
+        except AttributeError:
+            self.errors = {}
+
+    def iterfilter(self, expr, columns=None):
+        """Like iterating the resource, but yield only the rows that match a filter expression, such as
+        "county == '06037' and 2010 <= year < 2020". See metapack.rowfilter for the expression syntax.
+
+        With a schema, the parts of the filter on columns that are only cast are first evaluated on the
+        source values, so most rejected rows never go through the row processor. The rest of the filter
+        is evaluated on the processed rows.
+
+        :param expr: Filter expression, or a RowFilter
+        :param columns: List of column names to yield, or None for all columns
+        """
+        from rowgenerators.source import SelectiveRowGenerator
+
+        from .rowfilter import parse_filter
+
+        f = parse_filter(expr)
+        columns = list(columns) if columns else None
+
+        upstream = self._upstream_resource()
+
+        if upstream is not None:
+            yield from upstream.iterfilter(f, columns)
+            return
+
+        header_lines, start, end = self._get_start_end_header()
+
+        rptable = None
+
+        if self.schema_term:
+            read_columns = list(dict.fromkeys(columns + f.columns)) if columns else None
+
+            rptable = self.row_processor_table(
+                columns=self._processed_columns(read_columns) if read_columns else None)
+
+        base_row_gen = self.row_generator
+
+        if rptable:
+            headers = rptable.headers
+            self._check_columns((columns or []) + f.columns, headers)
+
+            source_rows = islice(base_row_gen, start, end)
+
+            raw_predicate = self._raw_predicate(f)
+
+            if raw_predicate:
+                source_rows = filter(raw_predicate, source_rows)
+
+            rg = iter(RowProcessor(source_rows,
+                                   rptable,
+                                   source_headers=self.source_headers,
+                                   manager=self,
+                                   env=self.env,
+                                   code_path=self._projection_code_path(headers)))
+        else:
+            rg = iter(SelectiveRowGenerator(base_row_gen, header_lines=header_lines, start=start, end=end))
+            headers = next(rg)
+            self._check_columns((columns or []) + f.columns, headers)
+
+        predicate = f.predicate(headers, {c['header']: c.get('datatype') for c in self.columns()})
+
+        rows = (row for row in rg if predicate(row))
+
+        if columns:
+            yield columns
+            yield from project_rows(rows, [headers.index(c) for c in columns])
+        else:
+            yield headers
+            yield from rows
+
+        self.post_iter_meta = base_row_gen.meta
+
+        try:
+            self.errors = rg.errors if rg.errors else {}
+        except AttributeError:
+            self.errors = {}
+
+    def _rows_independent(self):
+        """Return True if the row processor produces the same values for a row regardless of the rows
+        before it, so rows can be skipped before the row processor. That isn't the case if the row
+        processor numbers the rows or if a transform keeps state between rows. """
+
+        schema_columns = self._schema_columns()
+        env = self.env
+
+        if not schema_columns or schema_columns[0][0] not in self.source_headers:
+            return False  # The row processor fills the first column with the row number
+
+        return not any(self._token_reads(token, ('row_n', 'scratch', 'accumulator'), env)
+                       for _, c in schema_columns for token in self._code_tokens(c))
+
+    def _raw_predicate(self, f):
+        """Return a predicate for source rows that rejects rows that can't match the filter `f`, or None
+        if the filter can't be evaluated on the source rows. """
+        from .rowfilter import RAW_DATATYPES
+
+        if not self._rows_independent():
+            return None
+
+        schema_columns = self._schema_columns()
+        source_headers = self.source_headers
+
+        positions = {}
+        datatypes = {}
+
+        for name, c in schema_columns:
+            if name in source_headers and not c.get_value('transform') and not c.get_value('valuetype') \
+                    and c.get_value('datatype') in RAW_DATATYPES:
+                positions[name] = source_headers.index(name)
+                datatypes[name] = c.get_value('datatype')
+
+        return f.raw_predicate(positions, datatypes)
+
+    def rows(self, start=0, stop=None, columns=None):
+        """Yield the headers, then the rows from `start` to `stop`, counting from 0 for the first row after
+        the headers. For local CSV files, the rows are read by seeking with a row offset index, so reading
+        rows from the end of a large file doesn't parse the rows before them. The index is built on first
+        use and kept in the download cache. Other resources are iterated from the start.
+
+        :param start: Number of the first row
+        :param stop: Number of the row after the last row, or None for the end of the resource
+        :param columns: List of column names to yield, or None for all columns
+        """
+        from .rowindex import read_rows
+
+        if start < 0 or (stop is not None and stop < 0):
+            raise ResourceError('Row numbers must not be negative')
+
+        upstream = self._upstream_resource()
+
+        if upstream is not None:
+            yield from upstream.rows(start, stop, columns)
+            return
+
+        src = self._indexed_source()
+
+        if src is None:
+            itr = iter(self.itercolumns(columns) if columns else self)
+            yield next(itr)
+            yield from islice(itr, start, stop)
+            return
+
+        path, idx, n_records, encoding, delimiter = src
+
+        stop = n_records if stop is None else min(stop, n_records)
+
+        yield from self._process_indexed_rows(read_rows(path, idx, start, stop, encoding, delimiter), columns)
+
+    def sample(self, n, seed=None, columns=None):
+        """Yield the headers, then a random sample of `n` rows, in the order of the resource. For local
+        CSV files, only the sampled rows are read, by seeking with a row offset index. Other resources
+        are sampled in one pass with a reservoir sample, so only the sample is held in memory.
+
+        :param n: Number of rows in the sample. If the resource has fewer rows, all of them are returned
+        :param seed: Seed for the random number generator, for repeatable samples
+        :param columns: List of column names to yield, or None for all columns
+        """
+        import random
+
+        from .rowindex import read_rows_at
+        from .sampling import reservoir_sample
+
+        rand = random.Random(seed)
+
+        upstream = self._upstream_resource()
+
+        if upstream is not None:
+            yield from upstream.sample(n, seed, columns)
+            return
+
+        src = self._indexed_source()
+
+        if src is None:
+            itr = iter(self.itercolumns(columns) if columns else self)
+            yield next(itr)
+            yield from reservoir_sample(itr, n, rand)
+            return
+
+        path, idx, n_records, encoding, delimiter = src
+
+        positions = sorted(rand.sample(range(n_records), min(n, n_records)))
+
+        yield from self._process_indexed_rows(read_rows_at(path, idx, positions, encoding, delimiter), columns)
+
+    def sketch(self, column, k=10):
+        """Summarize the values of a column in one pass and fixed memory, returning a ValueSketch with
+        the number of values, the estimated number of distinct values, and the estimated counts of the
+        `k` most common values. Only the column is cast and transformed.
+
+        :param column: Name of the column
+        :param k: Number of most common values to track
+        """
+        from .sampling import ValueSketch
+
+        itr = iter(self.itercolumns([column]))
+        next(itr)
+
+        return ValueSketch(k).update(row[0] for row in itr)
+
+    def stats(self, chunksize=DATAFRAME_CHUNKSIZE, processes=None, shard_size=None, k=5, write=False):
+        """Profile the columns of the resource in one pass over chunks of the data, returning a
+        metapack.stats.TableStats with the count, null count, min, max, mean, estimated distinct count, most
+        common values and datatype conformance of each column.
+
+        Local CSV files with schemas that have no transforms are read as strings, so conformance measures the
+        source values. With more than one process, these files are split into shards on record boundaries
+        and the shards are profiled in worker processes. Other resources are profiled from the processed rows.
+
+        :param chunksize: Number of rows in each chunk
+        :param processes: Number of worker processes for sharded CSV files
+        :param shard_size: Approximate size of each shard, in bytes
+        :param k: Number of most common values to report for each column
+        :param write: If True, set the profile as properties of the Table.Column terms of the schema
+        """
+        from .parallel import DEFAULT_SHARD_SIZE, csv_shards
+        from .stats import TableStats, iter_shard_stats
+
+        if write and not self.schema_term:
+            raise ResourceError("Can't write statistics for resource '{}', which has no schema".format(self.name))
+
+        headers = self.headers
+        datatypes = [c.get('datatype') for c in self.columns()] or None
+
+        ts = TableStats(headers, datatypes, k)
+
+        path = self._plain_csv_path() if processes and processes > 1 else None
+
+        if path:
+            _, start, _ = self._get_start_end_header()
+
+            for shard_ts in iter_shard_stats(path, csv_shards(path, start, shard_size or DEFAULT_SHARD_SIZE),
+                                             headers, datatypes, k, processes, self.resolved_url.encoding,
+                                             chunksize=chunksize):
+                ts.merge(shard_ts)
+        else:
+            for df in self.iterchunks(chunksize, dtype=str, parse_dates=False):
+                ts.update(df)
+
+        if write:
+            for (_, c), cs in zip(self._schema_columns(), ts):
+                for prop, v in cs.properties().items():
+                    c[prop] = v  # None removes the property
+
+        return ts
+
+    def _plain_csv_path(self):
+        """Return the path of the source file of a local CSV resource that can be read without the row
+        processor: the schema has no transforms and the data runs from the header to the end of the file"""
+
+        try:
+            self.resolved_url.resource  # Metapack urls reference other packages
+            return None
+        except AttributeError:
+            pass
+
+        try:
+            t = self.resolved_url.get_resource().get_target()
+            if t.target_format != 'csv' or not t.fspath.exists():
+                return None
+        except (AttributeError, DownloadError):
+            return None
+
+        header_lines, start, end = self._get_start_end_header()
+
+        if len(header_lines) != 1 or header_lines[0] >= start or end is not None or not self.schema_term:
+            return None
+
+        if any(c.value == EMPTY_SOURCE_HEADER or c.get_value('transform') or c.get_value('valuetype')
+               for _, c in self._schema_columns()):
+            return None
+
+        return str(t.fspath)
+
+    def _indexed_source(self):
+        """Return (path, index, number of rows, encoding, delimiter) for resources that can be read by seeking
+        to rows in a local CSV file, or None"""
+        import codecs
+
+        from rowgenerators.generator.csv import CsvSource
+
+        from .rowindex import get_row_index
+
+        try:
+            t = self.resolved_url.get_resource().get_target()
+            if not t.fspath.exists():
+                return None
+        except (AttributeError, DownloadError):
+            return None
+
+        g = self.row_generator
+
+        # The CSV generator and its subclasses for other delimiters
+        if not isinstance(g, CsvSource) or type(g).__iter__ is not CsvSource.__iter__:
+            return None
+
+        encoding = self.resolved_url.encoding or 'utf8'
+
+        try:
+            # Records are found by scanning for bytes, so quotes and newlines must be single bytes
+            if '"\n'.encode(codecs.lookup(encoding).name) != b'"\n':
+                return None
+        except LookupError:
+            return None
+
+        if self.schema_term and self.row_processor_table() and not self._rows_independent():
+            return None
+
+        header_lines, start, end = self._get_start_end_header()
 
+        path = str(t.fspath)
+
+        idx = get_row_index(self.doc._cache, path, start)
+
+        n_records = len(idx) if end is None else max(0, min(len(idx), end - start))
+
+        return path, idx, n_records, encoding, g.delimiter
+
+    def _process_indexed_rows(self, source_rows, columns=None):
+        """Yield the headers and the rows from the source rows of an indexed resource, through the
+        row processor if the resource has a schema"""
+
+        rptable = None
+
+        if self.schema_term:
+            rptable = self.row_processor_table(columns=self._processed_columns(columns) if columns else None)
+
+        if rptable:
+            headers = rptable.headers
+            self._check_columns(columns or [], headers)
+
+            rg = RowProcessor(source_rows,
+                              rptable,
+                              source_headers=self.source_headers,
+                              manager=self,
+                              env=self.env,
+                              code_path=self._projection_code_path(headers))
+        else:
+            headers = self._get_header()
+            self._check_columns(columns or [], headers)
+            rg = source_rows
+
+        if columns:
+            yield list(columns)
+            yield from project_rows(rg, [headers.index(c) for c in columns])
+        else:
+            yield headers
+            yield from rg
+
+        try:
+            self.errors = rg.errors if rg.errors else {}
+        except AttributeError:
+            self.errors = {}
+
+    def _upstream_resource(self):
+        """Return the resource of the upstream package for metapack URLs, or None for other URLs"""
+        try:
+            upstream = self.resolved_url.resource
+        except AttributeError:
+            return None
+
+        if upstream is None:
+            raise NoResourceError("Reference '{}' doesn't specify a valid resource in the URL '{}'"
+                                  .format(self.name, self.url))
+
+        return upstream
+
+    def _check_columns(self, columns, headers):
+        missing = [c for c in columns if c not in headers]
+
+        if missing:
+            raise NoColumnError("Resource '{}' has no columns named: {}".format(self.name, ', '.join(missing)))
+
+    def _projection_code_path(self, headers):
+        """The path for the row processor code of a table with only some of the columns, so it doesn't
+        overwrite the code for the full table"""
+        import hashlib
+
+        if headers == self.headers:
+            return self.code_path
+
+        return self.code_path[:-3] + '-' + hashlib.md5(','.join(headers).encode('utf8')).hexdigest()[:8] + '.py'
+
+    def iterdicts(self, columns=None):
+        """Iterate over the resource in dict records, optionally with only some of the columns
+
+        :param columns: List of column names, or None for all columns
+        """
+        from collections import OrderedDict
+
+        itr = iter(self.itercolumns(columns) if columns else self)
+
+        headers = next(itr)
+
+        for row in itr:
             yield OrderedDict(zip(headers, row))
 
+    def iterparallel(self, processes=None, shard_size=None):
+        """Like iterating the resource, but for local CSV files with a schema, run the row processor
+        in multiple processes. The file is split into shards on record boundaries and the processed rows
+        are yielded in the original order. The casting errors from all of the shards are merged into
+        `errors` after the iteration.
+
+        Resources that are not local CSV files, have no schema, have an end line, or have transforms that
+        depend on the row number or on values carried between rows are iterated normally.
+
+        :param processes: Number of worker processes. Defaults to the number of CPUs
+        :param shard_size: Approximate size of each shard, in bytes
+        """
+        from .parallel import DEFAULT_SHARD_SIZE, csv_shards, iter_shards, merge_errors
+        from metapack.appurl import MetapackDocumentUrl
+
+        path = None
+
+        try:
+            self.resolved_url.resource  # Metapack urls reference other packages
+        except AttributeError:
+            t = self.resolved_url.get_resource().get_target()
+            if t.target_format == 'csv' and isinstance(self.doc.ref, MetapackDocumentUrl):
+                path = str(t.fspath)
+
+        header_lines, start, end = self._get_start_end_header()
+
+        if path is None or end is not None or not self.row_processor_table() or not self._rows_independent():
+            yield from self
+            return
+
+        shards = csv_shards(path, start, shard_size or DEFAULT_SHARD_SIZE)
+
+        errors = {}
+
+        yield self.headers
+
+        for rows, shard_errors in iter_shards(str(self.doc.ref), self.name, path, shards, processes,
+                                              self.resolved_url.encoding):
+            merge_errors(errors, shard_errors)
+            yield from rows
+
+        self.errors = errors
+        self.post_iter_meta = {}
+
+    @property
+    def iterdict(self):
+        """Iterate over the resource in dict records"""
+
+        yield from self.iterdicts()
+
     @property
     def iterrows(self):
         """Iterate over the resource as row proxy objects, which allow acessing colums as attributes"""
@@ -721,7 +1338,8 @@ class Resource(Term):
 
 
 
-    def dataframe(self, dtype=True, parse_dates=True, convert_categorical=False, *args, **kwargs) -> pd.DataFrame:
+    def dataframe(self, dtype=True, parse_dates=True, convert_categorical=False, *args, columns=None, filter=None,
+                  **kwargs) -> 'pandas.DataFrame':
         """Return a pandas dataframe from the resource
         @param dtype:
         @type dtype:
@@ -729,6 +1347,10 @@ class Resource(Term):
         @type parse_dates:
         @param convert_categorical:
         @type convert_categorical: Bool or Dict of Dicts
+        @param columns: Names of the columns to load. Only these columns are read, cast and transformed
+        @type columns: List of str
+        @param filter: Filter expression; only the rows that match it are returned. See metapack.rowfilter
+        @type filter: str or RowFilter
         @param args:
         @type args:
         @param kwargs:
@@ -736,14 +1358,51 @@ class Resource(Term):
         @return:
         @rtype:
         """
+        from .materialize import materialization_enabled, materialized_key, read_materialized, write_materialized
+        from .rowfilter import parse_filter
+
+        f = parse_filter(filter) if filter is not None else None
+        read_columns = self._read_columns(columns, f)
+
+        key = None
+
+        if materialization_enabled() and not args and not kwargs \
+                and isinstance(dtype, bool) and isinstance(parse_dates, bool):
+
+            key = materialized_key(self, 'dataframe', dtype, parse_dates)
+            t = read_materialized(self, key)
+
+            if t is not None:
+                if read_columns:
+                    self._check_columns(read_columns, t.column_names)
+                    t = t.select(read_columns)
+
+                df = self._filter_frame(t.to_pandas(), f, columns)
+                return self._convert_categorical(df) if convert_categorical else df
+
+            if columns or f:
+                key = None  # Only complete dataframes are materialized
+
+        df = self._dataframe(dtype, parse_dates, *args, columns=read_columns, **kwargs)
+
+        if f is not None:
+            df = self._filter_frame(df, f, columns).reset_index(drop=True)
 
+        if key is not None:
+            write_materialized(self, key, df)
+
+        return self._convert_categorical(df) if convert_categorical else df
+
+    def _dataframe(self, dtype=True, parse_dates=True, *args, columns=None, **kwargs):
+        """Build the dataframe for dataframe(), without converting categoricals """
         import pandas as pd
         import warnings
         from rowgenerators.exceptions import RowGeneratorConfigError, RowGeneratorError
 
         rg = self.row_generator
 
-        mod_kwargs = self._update_pandas_kwargs(dtype, parse_dates, kwargs)
+        # Generators that read with pandas only parse the selected columns
+        mod_kwargs = self._update_pandas_kwargs(dtype, parse_dates, dict(kwargs, usecols=columns) if columns else kwargs)
 
         # Unecessary?
         self.resolved_url.get_resource().get_target()
@@ -754,9 +1413,13 @@ class Resource(Term):
             # url arguments.
             while True:
                 try:
-
                     df = rg.dataframe(*args, **mod_kwargs)
-                    return self._convert_categorical(df) if convert_categorical else df
+
+                    if columns:
+                        self._check_columns(columns, list(df.columns))
+                        return df[columns]
+
+                    return df
                 except AttributeError:
                     break
                 except RowGeneratorConfigError as e:
@@ -776,16 +1439,348 @@ class Resource(Term):
                     else:
                         break
 
+        if dtype is True and not args and not kwargs:
+            df = self._vectorized_dataframe(columns=columns)
+            if df is not None:
+                return df
+
         # Just normal data, so use the iterator in this object.
 
-        headers = next(islice(self, 0, 1))  # Why not using the schema?
-        data = islice(self, 1, None)
+        itr = iter(self.itercolumns(columns) if columns else self)
+        headers = next(itr)  # Why not using the schema?
 
-        df = pd.DataFrame(list(data), columns=headers, *args, **kwargs)
+        if args or kwargs:
+            df = pd.DataFrame(list(itr), columns=headers, *args, **kwargs)
+        else:
+            frames = list(self._iter_frames(itr, headers, dtype=dtype is True))
+
+            if frames:
+                df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            else:
+                df = pd.DataFrame(columns=headers)
 
         self.errors = rg.errors if hasattr(rg, 'errors') and rg.errors else {}
 
-        return self._convert_categorical(df) if convert_categorical else df
+        return df
+
+    def iterchunks(self, chunksize=DATAFRAME_CHUNKSIZE, format='pandas', dtype=True, parse_dates=True, columns=None,
+                   filter=None):
+        """Iterate over the resource in batches of at most `chunksize` rows, so resources that are larger than
+        memory can be processed with vectorized code.
+
+        Local CSV resources with schemas that have no transforms are read directly with pandas.read_csv(), using
+        the same type configuration as read_csv(). Other resources are iterated through the row processor.
+
+        :param chunksize: Maximum number of rows in each batch
+        :param format: 'pandas' for DataFrames, 'arrow' for pyarrow RecordBatches, or 'numpy' for numpy record arrays
+        :param dtype: If True, set column types from the schema
+        :param parse_dates: If True, parse date and time columns
+        :param columns: Names of the columns to load, or None for all columns
+        :param filter: Filter expression; only the rows that match it are returned. Batches read with pandas
+            are filtered with vectorized operations, so they may have fewer than `chunksize` rows
+        :return: Generator of batches
+        """
+        from .rowfilter import parse_filter
+
+        if format not in ('pandas', 'arrow', 'numpy'):
+            raise MetapackError("Unknown chunk format '{}'; expected 'pandas', 'arrow' or 'numpy'".format(format))
+
+        if format == 'arrow':
+            import pyarrow as pa
+
+        f = parse_filter(filter) if filter is not None else None
+
+        for df in self._iter_materialized_chunks(chunksize, dtype, parse_dates, columns, f):
+            if format == 'arrow':
+                yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+            elif format == 'numpy':
+                yield df.to_records(index=False)
+            else:
+                yield df
+
+    def _iter_materialized_chunks(self, chunksize, dtype=True, parse_dates=True, columns=None, f=None):
+        """Iterate dataframe chunks, using the materialization cache if it is enabled"""
+        from .materialize import MaterializedWriter, materialization_enabled, materialized_key, read_materialized
+
+        if not materialization_enabled() or not isinstance(dtype, bool) or not isinstance(parse_dates, bool):
+            yield from self._iter_dataframe_chunks(chunksize, dtype, parse_dates, columns, f)
+            return
+
+        key = materialized_key(self, 'chunks', dtype, parse_dates)
+
+        t = read_materialized(self, key)
+
+        if t is not None:
+            read_columns = self._read_columns(columns, f)
+
+            if read_columns:
+                self._check_columns(read_columns, t.column_names)
+                t = t.select(read_columns)
+
+            for batch in t.to_batches(max_chunksize=chunksize):
+                df = self._filter_frame(batch.to_pandas(), f, columns)
+
+                if len(df) or f is None:
+                    yield df
+            return
+
+        if key is None or columns or f:  # Only complete resources are materialized
+            yield from self._iter_dataframe_chunks(chunksize, dtype, parse_dates, columns, f)
+            return
+
+        w = MaterializedWriter(self, key)
+
+        try:
+            for df in self._iter_dataframe_chunks(chunksize, dtype, parse_dates):
+                w.write(df)
+                yield df
+        except BaseException:
+            # Includes GeneratorExit, when the caller doesn't finish the iteration
+            w.abort()
+            raise
+
+        w.close()
+
+    def _iter_dataframe_chunks(self, chunksize, dtype=True, parse_dates=True, columns=None, f=None):
+        from .casting import cast_column
+
+        reader = self._csv_chunk_reader(chunksize, dtype, parse_dates, self._read_columns(columns, f))
+
+        n_yielded = 0
+
+        if reader is not None:
+            # Numeric columns are read as strings and cast in each chunk, so values that fail to cast
+            # become nulls, as they do in the row processor, rather than stopping the read partway through
+            numeric = {c['header']: c['datatype'] for c in self.columns()
+                       if c.get('datatype') in NUMERIC_DATATYPES} if dtype is True else {}
+            errors = {}
+
+            try:
+                for df in reader:
+                    for h, dt in numeric.items():
+                        if h in df.columns:
+                            df[h] = cast_column(df[h], dt, h, errors)
+
+                    df = self._filter_frame(df, f, columns)  # usecols doesn't preserve the order of the columns
+
+                    if len(df) or f is None:
+                        n_yielded += len(df)
+                        yield df
+
+                self.errors = errors
+                return
+            except (ValueError, TypeError):
+                # Failed to parse the file with pandas, so continue with the row processor, after
+                # the rows that have already been yielded
+                pass
+
+        if f is not None:
+            itr = iter(self.iterfilter(f, columns))
+        else:
+            itr = iter(self.itercolumns(columns) if columns else self)
+
+        headers = next(itr)
+
+        yield from self._iter_frames(islice(itr, n_yielded, None), headers, chunksize, dtype=dtype is True)
+
+    @staticmethod
+    def _read_columns(columns, f):
+        """The columns to read to select `columns` and evaluate the filter `f` """
+
+        if columns and f is not None:
+            return list(dict.fromkeys(list(columns) + f.columns))
+
+        return columns
+
+    def _filter_frame(self, df, f, columns=None):
+        """Select the rows of a dataframe that match the filter `f`, and then the columns"""
+
+        if f is not None:
+            df = df[f.mask(df, {c['header']: c.get('datatype') for c in self.columns()})]
+
+        return df[columns] if columns else df
+
+    def _csv_chunk_reader(self, chunksize, dtype=True, parse_dates=True, columns=None):
+        """Return a pandas.read_csv() chunk reader for local CSV resources where reading the file directly produces
+        the same data as iterating the resource, or None"""
+        import pandas as pd
+
+        try:
+            self.resolved_url.resource  # Metapack urls reference other packages
+            return None
+        except AttributeError:
+            pass
+
+        try:
+            t = self.resolved_url.get_resource().get_target()
+            if t.target_format != 'csv' or not t.fspath.exists():
+                return None
+        except (AttributeError, DownloadError):
+            return None
+
+        header_lines, start, end = self._get_start_end_header()
+
+        if len(header_lines) != 1 or header_lines[0] >= start:
+            return None
+
+        kwargs = self._update_pandas_kwargs(dtype, parse_dates, {'usecols': columns} if columns else {})
+
+        numeric = [c['header'] for c in self.columns() if c.get('datatype') in NUMERIC_DATATYPES]
+
+        st = self.schema_term
+
+        if st:
+            cols = [c for c in st.children if c.term_is('Table.Column')]
+
+            if any(c.value == EMPTY_SOURCE_HEADER or c.get_value('transform') or c.get_value('valuetype')
+                   for c in cols):
+                return None
+
+            # Use the schema headers in place of the ones in the file
+            headers = self.headers
+            kwargs['names'] = headers
+
+            if columns:
+                self._check_columns(columns, headers)
+                kwargs['usecols'] = [headers.index(c) for c in columns]
+            else:
+                kwargs['usecols'] = list(range(len(cols)))
+
+        if dtype is True:
+            # Numeric columns are cast after reading; see _iter_dataframe_chunks()
+            kwargs['dtype'] = {h: str if h in numeric else dt for h, dt in kwargs.get('dtype', {}).items()}
+
+        kwargs['skiprows'] = [i for i in range(start) if i != header_lines[0]]
+        kwargs['header'] = 0
+        kwargs['nrows'] = end - start if end else None
+        kwargs['chunksize'] = chunksize
+
+        if self.resolved_url.encoding:
+            kwargs['encoding'] = self.resolved_url.encoding
+
+        try:
+            return pd.read_csv(t.fspath, **kwargs)
+        except (ValueError, TypeError):
+            return None
+
+    def _iter_frames(self, rows, headers, chunksize=DATAFRAME_CHUNKSIZE, dtype=True):
+        """Consume an iterator of data rows in batches of `chunksize` rows, yielding a DataFrame for
+        each batch. Only one batch of rows is held as Python objects at a time. If dtype is True, columns
+        are converted to the datatypes in the schema """
+        import pandas as pd
+        from itertools import zip_longest
+
+        dtypes = self._column_dtypes(headers) if dtype else [None] * len(headers)
+
+        while True:
+            batch = list(islice(rows, chunksize))
+
+            if not batch:
+                break
+
+            columns = list(zip_longest(*batch))
+
+            if len(columns) > len(headers):
+                raise ResourceError("Resource '{}' has rows with {} values, but only {} headers"
+                                    .format(self.name, len(columns), len(headers)))
+
+            del batch
+
+            data = {}
+            for i, (col, dt) in enumerate(zip_longest(columns, dtypes)):
+                try:
+                    data[i] = pd.Series(col, dtype=dt)
+                except (TypeError, ValueError):
+                    data[i] = pd.Series(col)  # Casting errors in the values; let pandas infer the type
+
+            del columns
+
+            df = pd.DataFrame(data, copy=False)
+            df.columns = headers
+
+            yield df
+
+    def _plain_datatypes(self):
+        """If all of the schema columns have plain datatypes, with no transforms or value types, return
+        the list of datatypes. Otherwise, return None """
+        from .casting import PLAIN_DATATYPES
+
+        if not self.row_processor_table():
+            return None
+
+        datatypes = []
+
+        for c in self.schema_term.children:
+            if not c.term_is('Table.Column'):
+                continue
+
+            if c.value == EMPTY_SOURCE_HEADER or c.get_value('transform') or c.get_value('valuetype') \
+                    or c.get_value('datatype') not in PLAIN_DATATYPES:
+                return None
+
+            datatypes.append(c.get_value('datatype'))
+
+        return datatypes
+
+    def _vectorized_dataframe(self, chunksize=DATAFRAME_CHUNKSIZE, columns=None):
+        """Build a dataframe from the raw source rows, and cast entire columns to the schema datatypes,
+        skipping the row processor. Returns None if the schema requires the row processor. If `columns`
+        is given, only those columns are kept from the source rows and cast """
+        import pandas as pd
+        from .casting import cast_frame
+
+        try:
+            self.resolved_url.resource  # Metapack urls iterate the upstream resource
+            return None
+        except AttributeError:
+            pass
+
+        datatypes = self._plain_datatypes()
+
+        if datatypes is None:
+            return None
+
+        headers = self.headers
+        _, start, end = self._get_start_end_header()
+
+        base_row_gen = self.row_generator
+
+        if columns:
+            self._check_columns(columns, headers)
+            pos = [headers.index(c) for c in columns]
+            datatypes = [datatypes[p] for p in pos]
+            headers = list(columns)
+
+            # Rows may be shorter than the schema; the missing values are nulls
+            rows = ([row[p] if p < len(row) else None for p in pos] for row in islice(base_row_gen, start, end))
+        else:
+            # Rows may be longer than the schema; the row processor ignores the extra values
+            rows = (row[:len(headers)] for row in islice(base_row_gen, start, end))
+
+        errors = {}
+        frames = [cast_frame(df, datatypes, errors)
+                  for df in self._iter_frames(rows, headers, chunksize, dtype=False)]
+
+        self.post_iter_meta = base_row_gen.meta
+        self.errors = errors
+
+        if not frames:
+            return pd.DataFrame(columns=headers)
+
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def _column_dtypes(self, headers):
+        """Return a list of pandas dtypes for the headers, from the schema datatypes, with None
+        for columns where pandas should infer the type """
+
+        type_map = {
+            'number': 'float64',
+            'integer': 'Int64',
+        }
+
+        dt = {c['header']: type_map.get(c.get('datatype')) for c in self.columns()}
+
+        return [dt.get(h) for h in headers]
 
     @property
     def isgeo(self):
@@ -895,13 +1890,19 @@ class Resource(Term):
 
         }
 
+        # If only some columns are read, only configure those columns
+        usecols = kwargs.get('usecols')
+        names = [c for c in usecols if isinstance(c, str)] if isinstance(usecols, (list, tuple)) else []
+
+        columns = [c for c in self.columns() if not names or c['header'] in names]
+
         if dtype is True:
-            kwargs['dtype'] = {c['header']: type_map.get(c['datatype'], c['datatype']) for c in self.columns()}
+            kwargs['dtype'] = {c['header']: type_map.get(c['datatype'], c['datatype']) for c in columns}
         elif dtype:
             kwargs['dtype'] = dtype
 
         if parse_dates is True:
-            date_cols = [c['header'] for c in self.columns() if c['datatype'] in ('date', 'datetime', 'time')]
+            date_cols = [c['header'] for c in columns if c['datatype'] in ('date', 'datetime', 'time')]
             kwargs['parse_dates'] = date_cols or True
         elif parse_dates:
             kwargs['parse_dates'] = parse_dates
@@ -919,13 +1920,25 @@ class Resource(Term):
         import pandas
         from .exc import InternalError
 
+        from .mmapio import MappedFile, is_compressed
+
         t = self.resolved_url.get_resource().get_target()
 
         kwargs = self._update_pandas_kwargs(dtype, parse_dates, kwargs)
 
+        def _read_csv():
+            # Parse from a memory map, unless the reader outlives this call, or pandas has to infer
+            # the compression from the file name
+            if kwargs.get('chunksize') or kwargs.get('iterator') or is_compressed(t.fspath) \
+                    or kwargs.get('compression', 'infer') not in ('infer', None):
+                return pandas.read_csv(t.fspath, *args, **kwargs)
+
+            with MappedFile(t.fspath) as f:
+                return pandas.read_csv(f, *args, **kwargs)
+
         last_exception = None
         try:
-            return pandas.read_csv(t.fspath, *args, **kwargs)
+            return _read_csv()
         except Exception as e:
             last_exception = e
 
@@ -937,7 +1950,7 @@ class Resource(Term):
             # without parsing dates.
             del kwargs['parse_dates']
             try:
-                return pandas.read_csv(t.fspath, *args, **kwargs)
+                return _read_csv()
             except Exception as e:
                 last_exception = e
 
@@ -953,23 +1966,45 @@ class Resource(Term):
 
         return pandas.read_fwf(t.fspath, *args, **kwargs)
 
+    def open_binary(self):
+        """Load the target and return a read only, memory mapped binary file of it, a
+        metapack.mmapio.MappedFile. The `buffer` property of the file is a zero-copy memoryview of the
+        contents; release views of it before closing the file.
+        """
+        from .mmapio import MappedFile
+
+        t = self.resolved_url.get_resource().get_target()
+
+        return MappedFile(t.fspath)
+
+    def iterlines(self, encoding=None):
+        """Load the target and yield its lines, reading it through a memory map"""
+        from .mmapio import iter_mapped_lines
+
+        t = self.resolved_url.get_resource().get_target()
+
+        yield from iter_mapped_lines(t.fspath, encoding)
+
     def readlines(self):
         """Load the target, open it, and return the result from readlines()"""
 
-        t = self.resolved_url.get_resource().get_target()
-        with open(t.fspath) as f:
-            return f.readlines()
+        return list(self.iterlines())
 
     def petl(self, *args, **kwargs):
         """Return a PETL source object"""
         import petl
 
+        from .mmapio import MappedSource, is_compressed
+
         t = self.resolved_url.get_resource().get_target()
 
+        # petl decompresses files by their extension
+        source = str(t.fspath) if is_compressed(t.fspath) else MappedSource(t.fspath)
+
         if t.target_format == 'txt':
-            return petl.fromtext(str(t.fspath), *args, **kwargs)
+            return petl.fromtext(source, *args, **kwargs)
         elif t.target_format == 'csv':
-            return petl.fromcsv(str(t.fspath), *args, **kwargs)
+            return petl.fromcsv(source, *args, **kwargs)
         else:
             raise Exception("Can't handle")
 
@@ -388,3 +388,39 @@ def iso8601_duration_as_seconds(d):
                 this = number
             seconds = seconds + this
     return seconds
+
+
+def entry_points(group):
+    """Return the entry points in a group. This uses importlib.metadata, which only reads the
+    entry point files, rather than pkg_resources, which scans every installed distribution on import"""
+    try:
+        from importlib.metadata import entry_points as _entry_points
+    except ImportError:  # Python < 3.8
+        from importlib_metadata import entry_points as _entry_points
+
+    eps = _entry_points()
+
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=group))
+    else:
+        return list(eps.get(group, []))
+
+
+def entry_point_dist(ep):
+    """Return the name and version of the distribution that provides an entry point"""
+    d = getattr(ep, 'dist', None)
+
+    return '{} {}'.format(d.metadata['Name'], d.version) if d else ''
+
+
+def package_version(name):
+    """Return the version of an installed distribution, or None if it is not installed"""
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # Python < 3.8
+        from importlib_metadata import PackageNotFoundError, version
+
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
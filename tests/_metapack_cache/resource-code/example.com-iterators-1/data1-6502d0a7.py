@@ -0,0 +1,53 @@
+
+# .../rowgenerators/rowpipe/codegen.py:43
+import sys
+from rowgenerators.valuetype import resolve_value_type
+from rowgenerators.rowpipe.exceptions import CasterExceptionError
+
+IntMeasure = resolve_value_type('int') # .../rowgenerators/rowpipe/codegen.py:348
+StrDimension = resolve_value_type('str') # .../rowgenerators/rowpipe/codegen.py:348
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_row_num_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_row_num_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_value_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = StrDimension(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_value_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:258
+def row_data1_0(row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    return [
+        data1_row_num_0(row[0], 0, 0, 'row_num', 'row_num', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column row_num
+        data1_value_0(row[1], 1, 1, 'value', 'value', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column value
+    ]
+
+
+# .../rowgenerators/rowpipe/codegen.py:272
+def row_data1_1(row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    return [
+        cast_int(row[0], 'row_num', errors),
+        cast_str(row[1], 'value', errors),
+    ]
+
+row_processors = [row_data1_0,row_data1_1]
\ No newline at end of file
@@ -0,0 +1,128 @@
+
+# .../rowgenerators/rowpipe/codegen.py:43
+import sys
+from rowgenerators.valuetype import resolve_value_type
+from rowgenerators.rowpipe.exceptions import CasterExceptionError
+
+IntMeasure = resolve_value_type('int') # .../rowgenerators/rowpipe/codegen.py:348
+StrDimension = resolve_value_type('str') # .../rowgenerators/rowpipe/codegen.py:348
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_row_num_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_row_num_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_value_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = StrDimension(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_value_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_column1_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_column1_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_column2_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_column2_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_column3_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_column3_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_column4_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_column4_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:248
+def data1_column5_0(v, i_s, i_d, header_s, header_d, row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    try:
+        v = IntMeasure(v) # .../rowgenerators/rowpipe/codegen.py:346
+
+    except Exception as exc:
+
+        raise CasterExceptionError("data1_column5_0",header_d, v, exc, sys.exc_info())
+
+    return v
+
+
+# .../rowgenerators/rowpipe/codegen.py:258
+def row_data1_0(row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    return [
+        data1_row_num_0(row[0], 0, 0, 'row_num', 'row_num', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column row_num
+        data1_value_0(row[1], 1, 1, 'value', 'value', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column value
+        data1_column1_0(row[2], 2, 2, 'column1', 'column1', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column column1
+        data1_column2_0(row[3], 3, 3, 'column2', 'column2', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column column2
+        data1_column3_0(row[4], 4, 4, 'column3', 'column3', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column column3
+        data1_column4_0(row[5], 5, 5, 'column4', 'column4', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column column4
+        data1_column5_0(row[6], 6, 6, 'column5', 'column5', row, row_n, errors, scratch, accumulator, pipe, manager, source), # column column5
+    ]
+
+
+# .../rowgenerators/rowpipe/codegen.py:272
+def row_data1_1(row, row_n, errors, scratch, accumulator, pipe, manager, source):
+
+    return [
+        cast_int(row[0], 'row_num', errors),
+        cast_str(row[1], 'value', errors),
+        cast_int(row[2], 'column1', errors),
+        cast_int(row[3], 'column2', errors),
+        cast_int(row[4], 'column3', errors),
+        cast_int(row[5], 'column4', errors),
+        cast_int(row[6], 'column5', errors),
+    ]
+
+row_processors = [row_data1_0,row_data1_1]
\ No newline at end of file
@@ -1,3 +1,4 @@
+import importlib.util
 import unittest
 
 from support import open_package, test_data
@@ -15,6 +16,30 @@ def ds_hash(r):
 
     return m.hexdigest()
 
+
+def write_package(d, file_name, data, columns, url=None):
+    """Write a package in directory d with a resource, 'data', for a data file, with a schema of
+    (name, datatype) columns, and return the path to the metadata file"""
+    from os import makedirs
+    from os.path import join
+
+    makedirs(join(d, 'data'))
+
+    with open(join(d, 'data', file_name), 'wb') as f:
+        f.write(data)
+
+    lines = ['Declare,metatab-latest', 'Name,example.com-test-1', 'Dataset,test', 'Origin,example.com',
+             'Version,1', '',
+             'Section,Resources,Name,Schema', 'Datafile,{},data,data_schema'.format(url or 'data/' + file_name), '',
+             'Section,Schema,DataType', 'Table,data_schema']
+    lines += ['Table.Column,{},{}'.format(name, datatype) for name, datatype in columns]
+
+    with open(join(d, 'metadata.csv'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return join(d, 'metadata.csv')
+
+
 class TestPackages(unittest.TestCase):
     """"""
 
@@ -22,6 +47,16 @@ class TestPackages(unittest.TestCase):
         import warnings
         warnings.simplefilter('ignore')
 
+    def temp_dir(self):
+        """Return a new temporary directory, which is removed after the test"""
+        from shutil import rmtree
+        from tempfile import mkdtemp
+
+        d = mkdtemp()
+        self.addCleanup(rmtree, d, ignore_errors=True)
+
+        return d
+
     def test_iterators(self):
         from itertools import chain
         pkg = open_package('example.com-iterators')
@@ -44,6 +79,707 @@ class TestPackages(unittest.TestCase):
                 print(r.name, hash)
 
 
+    def test_resolved_url_cache(self):
+        pkg = open_package('example.com-iterators')
+
+        r = pkg.resource('data1')
+
+        u1 = r.resolved_url
+        self.assertIs(u1, r.resolved_url)
+
+        r.value = 'data/data.csv#start=2'
+        self.assertIsNot(u1, r.resolved_url)
+        self.assertEqual('2', str(r.resolved_url.start))
+
+        u2 = r.resolved_url
+        r.invalidate_url()
+        self.assertIsNot(u2, r.resolved_url)
+
+    def test_doc_cache(self):
+        from metapack import Downloader
+        from metapack import open_package as op
+        from metapack.package import disable_doc_cache, enable_doc_cache
+        from support import cache_fs
+
+        cache = enable_doc_cache(2)
+
+        try:
+            p1 = open_package('example.com-iterators')
+            p2 = open_package('example.com-iterators')
+
+            self.assertIs(p1, p2)
+            self.assertEqual(1, len(cache))
+            self.assertEqual(1, cache.hits)
+
+            # Writable docs are never shared
+            self.assertIsNot(p1, op(test_data('packages', 'example.com-iterators'), writable=True))
+
+            # Docs opened with a different download cache are different entries
+            with cache_fs() as fs:
+                p3 = open_package('example.com-iterators', Downloader(fs))
+                self.assertIsNot(p1, p3)
+                self.assertEqual(2, len(cache))
+        finally:
+            disable_doc_cache()
+
+        self.assertIsNot(p1, open_package('example.com-iterators'))
+
+    def test_doc_cache_fragment(self):
+        from metapack import open_package as op
+        from metapack.package import disable_doc_cache, enable_doc_cache
+
+        ref = test_data('packages', 'example.com-iterators', 'metadata.csv')
+
+        enable_doc_cache()
+
+        try:
+            p1 = op(ref + '#data2')
+            p2 = op(ref)
+
+            self.assertIsNot(p1, p2)
+            self.assertEqual('data2', p1.default_resource)
+            self.assertIsNone(p2.default_resource)
+        finally:
+            disable_doc_cache()
+
+    def test_term_indexes(self):
+        pkg = open_package('example.com-iterators')
+
+        self.assertEqual('data2', pkg.resource('data2').name)
+        self.assertEqual('data_ref_3', pkg.reference('data_ref_3').name)
+        self.assertIsNone(pkg.resource('data_ref_3'))
+        self.assertEqual('data_schema_2', pkg.resource('data2').schema_term.value)
+
+        t = pkg['Resources'].new_term('Root.Datafile', 'data/data.csv', name='data5')
+        self.assertIs(t, pkg.resource('data5'))
+
+        pkg.remove_term(t)
+        self.assertIsNone(pkg.resource('data5'))
+
+        # Renamed terms are found by their new names
+        r = pkg.resource('data1')
+        r.name = 'renamed'
+        self.assertIs(r, pkg.resource('renamed'))
+        self.assertIsNone(pkg.resource('data1'))
+
+        t = pkg.table('data_schema_1')
+        t.value = 'renamed_schema'
+        self.assertIs(t, pkg.table('renamed_schema'))
+
+    def test_dataframe_chunks(self):
+        import pandas as pd
+
+        pkg = open_package('example.com-iterators')
+
+        r = pkg.resource('data1')
+
+        rows = list(r)
+        frames = list(r._iter_frames(iter(rows[1:]), rows[0], chunksize=3))
+
+        self.assertGreater(len(frames), 1)
+
+        df = pd.concat(frames, ignore_index=True)
+        self.assertEqual(len(rows) - 1, len(df))
+        self.assertEqual(rows[0], list(df.columns))
+        self.assertEqual('Int64', str(df['row_num'].dtype))
+        self.assertEqual(rows[1], list(df.iloc[0]))
+
+    def test_iterchunks(self):
+        pkg = open_package('example.com-iterators')
+
+        for name in ('data0', 'data1', 'data2'):
+            r = pkg.resource(name)
+
+            rows = list(r)
+            chunks = list(r.iterchunks(4))
+
+            self.assertEqual([4, 4, 2], [len(c) for c in chunks], name)
+            self.assertEqual(rows[0], list(chunks[0].columns), name)
+
+        r = pkg.resource('data1')
+        self.assertEqual(10, sum(len(c) for c in r.iterchunks(3, format='numpy')))
+
+    def test_materialized_cache(self):
+        from os.path import exists
+        from metapack.materialize import (
+            disable_materialization,
+            enable_materialization,
+            materialized_key,
+            materialized_path
+        )
+
+        pkg = open_package('example.com-iterators')
+        r = pkg.resource('data2')
+
+        enable_materialization()
+
+        try:
+            df1 = r.dataframe()
+
+            key = materialized_key(r, 'dataframe', True, True)
+            self.assertTrue(exists(materialized_path(r, key)))
+
+            df2 = r.dataframe()
+            self.assertTrue(df1.equals(df2))
+
+            # Other options of the same source don't evict each other
+            r.dataframe(dtype=False)
+            self.assertTrue(exists(materialized_path(r, key)))
+            self.assertTrue(exists(materialized_path(r, materialized_key(r, 'dataframe', False, True))))
+
+            self.assertEqual(10, sum(len(c) for c in r.iterchunks(3)))
+            self.assertEqual(10, sum(len(c) for c in r.iterchunks(3)))
+        finally:
+            disable_materialization()
+
+    def test_dataframes(self):
+        pkg = open_package('example.com-iterators')
+
+        names = ['data0', 'data1', 'data2', 'data_ref_3']
+
+        dfs = pkg.dataframes(names, workers=3, memory_budget=100)
+
+        self.assertEqual(names, list(dfs.keys()))
+
+        for name in names:
+            r = pkg.resource(name) or pkg.reference(name)
+            self.assertTrue(r.dataframe().equals(dfs[name]), name)
+
+    def test_iterparallel(self):
+        from metapack.parallel import csv_shards
+
+        pkg = open_package('example.com-iterators')
+
+        for name in ('data1', 'data2'):
+            r = pkg.resource(name)
+            path = str(r.resolved_url.get_resource().get_target().fspath)
+
+            self.assertEqual([(44, 114), (114, 185)], csv_shards(path, 1, 60))
+            self.assertEqual(list(r), list(r.iterparallel(processes=2, shard_size=60)))
+
+        r = pkg.resource('data0')  # No schema, so iterated normally
+        self.assertEqual(list(r), list(r.iterparallel(processes=2)))
+
+    def test_vectorized_casting(self):
+        import pandas as pd
+        from metapack.casting import cast_column
+
+        pkg = open_package('example.com-iterators')
+
+        self.assertIsNone(pkg.resource('data2')._plain_datatypes())
+
+        r = pkg.resource('data1')
+        rows = list(r)
+
+        df = r._vectorized_dataframe(chunksize=4)
+        self.assertEqual(rows[0], list(df.columns))
+        self.assertEqual([list(row) for row in rows[1:]], df.astype(object).values.tolist())
+        self.assertEqual({}, r.errors)
+
+        errors = {}
+        s = cast_column(pd.Series(['1', '', 'x', '2.5', '3.0']), 'integer', 'c', errors)
+        self.assertEqual([1, None, None, None, 3], [None if pd.isna(v) else v for v in s])
+        self.assertEqual(2, len(errors['c']))
+
+        # Integers that floats can't hold are exact, even with blanks in the column
+        s = cast_column(pd.Series(['12345678901234567', '']), 'integer', 'c', {})
+        self.assertEqual([12345678901234567, None], [None if pd.isna(v) else v for v in s])
+
+    def test_vectorized_casting_like_rows(self):
+        from datetime import date
+        from metapack import open_package as op
+
+        data = b'a,d\n1,2020-01-02\n12345678901234567890,01/03/2020\n'
+        ref = write_package(self.temp_dir(), 'data.csv', data, [('a', 'integer'), ('d', 'date')],
+                            url='data/data.csv#start=1')
+        r = op(ref).resource('data')
+
+        self.assertEqual(['integer', 'date'], r._plain_datatypes())
+
+        df = r.dataframe()
+
+        # Integers outside of the int64 range are kept, and dates are parsed one by one
+        self.assertEqual([1, 12345678901234567890], list(df['a']))
+        self.assertEqual([date(2020, 1, 2), date(2020, 1, 3)], list(df['d']))
+        self.assertEqual({}, r.errors)
+
+    def test_chunks_cast_errors(self):
+        import pandas as pd
+        from metapack import open_package as op
+
+        data = b'a,b\n1,x\n2,y\n3,z\nx,w\n5,v\n'
+        r = op(write_package(self.temp_dir(), 'data.csv', data, [('a', 'integer'), ('b', 'string')])).resource('data')
+
+        chunks = list(r.iterchunks(2))
+        self.assertEqual(3, len(chunks))
+
+        values = [v for df in chunks for v in df['a']]
+        self.assertEqual([1, 2, 3, None, 5], [None if pd.isna(v) else v for v in values])
+        self.assertIn('a', r.errors)
+
+    def test_sqlite_search_index(self):
+        from os.path import join
+        from metapack.index import SearchIndex, SqliteSearchIndex
+
+        d = self.temp_dir()
+
+        json_idx = SearchIndex(join(d, 'index.json'))
+
+        for i in range(5):
+            name = 'example.com-dataset_{}'.format(i)
+            for version in (1, 2):
+                for fmt in ('zip', 'csv', 'source'):
+                    json_idx.add_entry('ident-{}'.format(i), '{}-{}'.format(name, version), name, version,
+                                       fmt, 'metapack+file:/{}-{}.{}'.format(name, version, fmt))
+        json_idx.write()
+
+        # The trigram index is written alongside the JSON index, and finds the same keys as a scan
+        from os.path import exists
+        self.assertTrue(exists(json_idx.trigram_path))
+        json_idx = SearchIndex(join(d, 'index.json'))
+        trigrams = json_idx._load_trigrams()
+        for term in ('dataset_1', 'ident', 'e.com-d', 'ds', 'nothing'):
+            self.assertEqual([k for k in json_idx._db if term in k], trigrams.search(term))
+
+        # Opening the database imports the JSON index
+        idx = SearchIndex(join(d, 'index.db'))
+        self.assertIsInstance(idx, SqliteSearchIndex)
+        self.assertEqual(sorted(map(str, json_idx.list())), sorted(map(str, idx.list())))
+
+        for term in ('example.com-dataset_1-2', 'example.com-dataset_1', 'ident-3', 'dataset_1', 'nothing'):
+            for fmt in ('issued', 'all', 'csv'):
+                a = json_idx.search(term, fmt)
+                b = idx.search(term, fmt)
+                self.assertEqual([(p['version'], p['format']) for p in a],
+                                 [(p['version'], p['format']) for p in b])
+                self.assertEqual(sorted(map(str, a)), sorted(map(str, b)))
+
+        # Re-adding a package updates it in place
+        idx.add_entry('ident-1', 'example.com-dataset_1-2', 'example.com-dataset_1', 2, 'zip', 'metapack+file:/new')
+        idx.write()
+        idx.close()
+
+        idx = SearchIndex(join(d, 'index.db'))
+        self.assertEqual(len(json_idx.list()), len(idx.list()))
+        self.assertEqual('metapack+file:/new', idx.search('example.com-dataset_1-2', 'zip')[0]['url'])
+
+    def test_search_index_unwritten_changes(self):
+        from os.path import join
+        from metapack.index import SearchIndex
+
+        d = self.temp_dir()
+
+        idx = SearchIndex(join(d, 'index.json'))
+        idx.add_entry('ident-1', 'example.com-foo-1', 'example.com-foo', 1, 'zip', 'metapack+file:/foo.zip')
+        idx.write()
+
+        # Searches see changes that are not written, rather than the trigram file of the written index
+        idx = SearchIndex(join(d, 'index.json'))
+        self.assertEqual(['example.com-foo-1'], [p['name'] for p in idx.search('foo', 'all')])
+
+        idx.add_entry('ident-2', 'example.com-bazfoo-1', 'example.com-bazfoo', 1, 'zip',
+                      'metapack+file:/bazfoo.zip')
+        self.assertEqual({'example.com-foo-1', 'example.com-bazfoo-1'},
+                         {p['name'] for p in idx.search('foo', 'all')})
+
+        idx.remove_package('example.com-foo-1-zip')
+        self.assertEqual(['example.com-bazfoo-1'], [p['name'] for p in idx.search('foo', 'all')])
+
+    def test_search_index_manifest(self):
+        from os.path import join
+        from metapack.index import SearchIndex, source_fingerprint
+
+        pkg_dir = test_data('packages', 'example.com-iterators')
+        fp = source_fingerprint(pkg_dir)
+        self.assertEqual(source_fingerprint(join(pkg_dir, 'metadata.csv')), fp)
+
+        for file_name in ('index.json', 'index.db'):
+            d = self.temp_dir()  # Separate directories, so the database doesn't import the JSON index
+            idx = SearchIndex(join(d, file_name))
+
+            for i in range(3):
+                key = idx.add_entry('ident-{}'.format(i), 'example.com-p{}-1'.format(i), 'example.com-p{}'.format(i),
+                                    1, 'zip', 'metapack+file:/p{}.zip'.format(i))
+                self.assertEqual('example.com-p{}-1-zip'.format(i), key)
+                idx.set_source('/p{}.zip'.format(i), fp, None, '1', [key])
+
+            # A second source for the same package keeps the entry when the first is removed
+            idx.set_source('/copy/p2.zip', fp, None, '1', ['example.com-p2-1-zip'])
+
+            idx.write()
+
+            idx = SearchIndex(join(d, file_name))
+            self.assertEqual(fp, [idx.manifest()['/p1.zip']['mtime'], idx.manifest()['/p1.zip']['size']])
+
+            idx.remove_sources(['/p1.zip', '/p2.zip'])
+            idx.write()
+
+            idx = SearchIndex(join(d, file_name))
+            self.assertEqual(['/copy/p2.zip', '/p0.zip'], sorted(idx.manifest()))
+            self.assertEqual(['example.com-p2-1', 'example.com-p0-1'], [p['name'] for p in idx.list()])
+            self.assertEqual([], idx.search('example.com-p1', 'all'))
+
+            # Pruning the last packages leaves an empty index
+            idx.remove_sources(['/copy/p2.zip', '/p0.zip'])
+            idx.write()
+
+            idx = SearchIndex(join(d, file_name))
+            self.assertEqual({}, idx.manifest())
+            self.assertEqual([], idx.list())
+
+    @unittest.skipUnless(importlib.util.find_spec('moto'), 'Requires moto')
+    def test_index_s3(self):
+        import os
+        from os.path import join
+
+        import boto3
+
+        from metapack.index import SearchIndex
+        from metapack.s3index import index_s3
+
+        try:
+            from moto import mock_aws
+        except ImportError:  # Before moto 5
+            from moto import mock_s3 as mock_aws
+
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+        metadata = '\n'.join([
+            'Declare,metatab-latest',
+            'Identifier,ident-1',
+            'Name,example.com-pkg-1',
+            'Origin,example.com',
+            'Dataset,pkg',
+            'Version,1',
+            'Distribution,http://example.com/packages/example.com-pkg-1.zip',
+            'Distribution,http://example.com/packages/example.com-pkg-1.csv'
+        ])
+
+        with mock_aws():
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='packages')
+            client.put_object(Bucket='packages', Key='p/example.com-pkg-1.csv', Body=metadata.encode('utf8'))
+            client.put_object(Bucket='packages', Key='p/example.com-pkg-1.zip', Body=b'PK')
+
+            idx = SearchIndex(join(self.temp_dir(), 'index.json'))
+
+            self.assertEqual((1, 0, 0), index_s3(idx, 'packages', 'p/', client=client, workers=2))
+            self.assertEqual(['csv', 'zip'], sorted(p['format'] for p in idx.search('example.com-pkg')))
+
+            # Unchanged objects are not fetched again
+            self.assertEqual((0, 1, 0), index_s3(idx, 'packages', 'p/', client=client, workers=2))
+
+            client.delete_object(Bucket='packages', Key='p/example.com-pkg-1.csv')
+
+            self.assertEqual((0, 0, 1), index_s3(idx, 'packages', 'p/', client=client, workers=2))
+            self.assertEqual([], idx.search('example.com-pkg'))
+
+    def test_walk_packages(self):
+        from metapack.package import is_package_candidate, package_candidates, walk_packages
+
+        root = test_data('packages')
+
+        self.assertFalse(is_package_candidate(test_data('packages', 'example.com-iterators', 'data', 'data.csv')))
+        self.assertTrue(is_package_candidate(test_data('line', 'line-oriented-doc.txt')))
+
+        # The package directory is a candidate, and its data files are not searched
+        self.assertEqual([test_data('packages', 'example.com-iterators')], list(package_candidates(root)))
+
+        serial = [str(p.ref) for p in walk_packages(root, workers=1)]
+        self.assertEqual(serial, [str(p.ref) for p in walk_packages(root, workers=4)])
+        self.assertEqual(1, len(serial))
+
+    def test_lazy_imports(self):
+        import subprocess
+        import sys
+
+        # Only checks pandas; rowgenerators, which metapack imports, imports pkg_resources itself
+        code = "import sys, metapack, metapack.html; print('pandas' in sys.modules, 'pybtex' in sys.modules)"
+
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+        self.assertEqual('False False', out.strip())
+
+        import metapack
+        from metapack.html import MetatabHtmlBackend, MetatabStyle, _citation_classes
+        from metapack.terms import Resource
+
+        self.assertIs(Resource, metapack.Resource)
+        self.assertTrue(metapack.__version__)
+        self.assertEqual((MetatabStyle, MetatabHtmlBackend), _citation_classes())
+
+    def test_subcommand_manifest(self):
+        import os
+        import subprocess
+        import sys
+        from os.path import exists, join
+        from unittest import mock
+
+        # Keep the manifest out of the user's cache
+        d = self.temp_dir()
+        manifest = join(d, 'subcommands.json')
+
+        code = ("import sys; from metapack.cli.mp import base_parser; base_parser(['config']); "
+                "print('metapack.cli.config' in sys.modules, 'metapack.cli.index' in sys.modules)")
+
+        def run():
+            return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+
+        with mock.patch.dict(os.environ, {'METAPACK_CACHE': d}):
+            run()  # Writes the manifest
+            self.assertTrue(exists(manifest))
+
+            # Only the module for the chosen subcommand is loaded
+            self.assertEqual('True False', run())
+
+        from metapack.cli.mp import base_parser
+
+        with mock.patch('metapack.cli.mp._manifest_path', return_value=manifest):
+            parser = base_parser(['index', '-h'])
+
+        self.assertIn('index', parser.format_help())
+        self.assertIn('search', parser.format_help())
+
+    def test_serve(self):
+        import os
+        import subprocess
+        import sys
+        import time
+        from os.path import exists, join
+
+        path = join(self.temp_dir(), 'mp.sock')
+        mp = 'import sys; from metapack.cli.mp import mp; sys.exit(mp())'
+
+        daemon = subprocess.Popen([sys.executable, '-c', mp, 'serve', '-s', path])
+
+        try:
+            for i in range(100):
+                if exists(path):
+                    break
+                time.sleep(.1)
+
+            env = dict(os.environ, METAPACK_SOCKET=path)
+            pkg = test_data('packages', 'example.com-iterators')
+
+            local = subprocess.run([sys.executable, '-c', mp, 'info', '-n', pkg], capture_output=True, text=True)
+            served = subprocess.run([sys.executable, '-c', mp, 'info', '-n', pkg], capture_output=True, text=True,
+                                    env=env)
+
+            self.assertEqual(0, served.returncode)
+            self.assertEqual(local.stdout, served.stdout)
+
+            failed = subprocess.run([sys.executable, '-c', mp, 'info', join(pkg, 'missing.csv')], env=env,
+                                    capture_output=True)
+            self.assertNotEqual(0, failed.returncode)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    def test_data_server(self):
+        import asyncio
+        import json
+        import threading
+        from urllib.error import HTTPError
+        from urllib.request import urlopen
+        from metapack.server import DataServer
+
+        pkg = open_package('example.com-iterators')
+        rows = list(pkg.resource('data1'))
+
+        server = DataServer([pkg], batch_size=3)
+
+        # Each request gets its own resource term
+        r = server.resource(pkg.nonver_name, 'data1')
+        self.assertIsNot(r, pkg.resource('data1'))
+        self.assertIsNot(r, server.resource(pkg.nonver_name, 'data1'))
+        self.assertEqual(rows, list(r))
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        async def start():
+            s = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+            start.port = s.sockets[0].getsockname()[1]
+            ready.set()
+            await s.serve_forever()
+
+        threading.Thread(target=loop.run_until_complete, args=(start(),), daemon=True).start()
+        ready.wait()
+
+        base = 'http://127.0.0.1:{}/packages/{}/resources/data1'.format(start.port, pkg.nonver_name)
+
+        lines = urlopen(base).read().decode('utf8').splitlines()
+        self.assertEqual(len(rows), len(lines))
+        self.assertEqual(','.join(rows[0]), lines[0])
+
+        lines = urlopen(base + '?format=jsonl&offset=2&limit=3&columns=row_num').read().decode('utf8').splitlines()
+        pos = rows[0].index('row_num')
+        self.assertEqual([{'row_num': r[pos]} for r in rows[3:6]], [json.loads(l) for l in lines])
+
+        with self.assertRaises(HTTPError) as e:
+            urlopen(base + '?columns=nothing')
+        self.assertEqual(400, e.exception.code)
+
+        loop.call_soon_threadsafe(loop.stop)
+
+    def test_itercolumns(self):
+        from metapack.exc import NoColumnError
+
+        pkg = open_package('example.com-iterators')
+
+        for name in ('data1', 'data2'):
+            r = pkg.resource(name)
+            rows = list(r)
+            columns = [rows[0][-1], rows[0][1]]
+            pos = [rows[0].index(c) for c in columns]
+
+            expected = [columns] + [[row[p] for p in pos] for row in rows[1:]]
+
+            self.assertEqual(expected, list(r.itercolumns(columns)))
+            self.assertEqual(rows, list(r.itercolumns(None)))
+
+            df = r.dataframe(columns=columns)
+            self.assertEqual(columns, list(df.columns))
+            self.assertEqual(len(rows) - 1, len(df))
+
+            self.assertEqual(columns, list(next(r.iterchunks(columns=columns)).columns))
+
+            with self.assertRaises(NoColumnError):
+                list(r.itercolumns(['nothing']))
+
+    def test_filter_nulls(self):
+        import pandas as pd
+        from metapack import open_package as op
+
+        data = b'a,b\n1,x\n,x\n3,\n7,y\n'
+        r = op(write_package(self.temp_dir(), 'data.csv', data, [('a', 'integer'), ('b', 'string')])).resource('data')
+
+        # A comparison with a null is false, and `or` and `not` apply to it like any other comparison
+        for expr, expected in (('a != 3', [1, 7]), ("a < 5 or b == 'x'", [1, None, 3]),
+                               ('not (a < 5)', [None, 7])):
+            rows = list(r.iterfilter(expr))[1:]
+            self.assertEqual(expected, [row[0] for row in rows], expr)
+
+            df = r.dataframe(filter=expr)
+            self.assertEqual(expected, [None if pd.isna(v) else v for v in df['a']], expr)
+
+    def test_iterfilter(self):
+        from metapack.exc import FilterError, NoColumnError
+
+        pkg = open_package('example.com-iterators')
+
+        for name in ('data1', 'data2'):
+            r = pkg.resource(name)
+            rows = list(r)
+            rn, v = rows[0].index('row_num'), rows[0].index('value')
+
+            expected = [rows[0]] + [row for row in rows[1:] if 3 <= row[rn] < 8 and row[v] != 'e']
+            self.assertEqual(expected, list(r.iterfilter("3 <= row_num < 8 and value != 'e'")))
+
+            expected = [['value']] + [[row[v]] for row in rows[1:] if row[rn] in (2, 4) or row[v] == 'j']
+            self.assertEqual(expected, list(r.iterfilter("row_num.isin([2, 4]) or value == 'j'", ['value'])))
+
+            df = r.dataframe(columns=['value'], filter='row_num > 7')
+            self.assertEqual([row[v] for row in rows[1:] if row[rn] > 7], list(df['value']))
+
+            with self.assertRaises(FilterError):
+                list(r.iterfilter('row_num +'))
+
+            with self.assertRaises(NoColumnError):
+                list(r.iterfilter('nothing > 1'))
+
+    def test_rows(self):
+        pkg = open_package('example.com-iterators')
+
+        for name in ('data0', 'data1', 'data2'):
+            r = pkg.resource(name)
+            rows = list(r)
+
+            self.assertEqual([rows[0]] + rows[3:6], list(r.rows(2, 5)))
+            self.assertEqual([rows[0]] + rows[8:], list(r.rows(7)))
+            self.assertEqual([rows[0]], list(r.rows(100, 200)))
+
+            sample = list(r.sample(4, seed=1))
+            self.assertEqual(rows[0], sample[0])
+            self.assertEqual(4, len(sample) - 1)
+            self.assertTrue(all(row in rows[1:] for row in sample[1:]))
+            self.assertEqual(sample, list(r.sample(4, seed=1)))
+
+    def test_sketch(self):
+        from collections import Counter
+        from metapack.sampling import reservoir_sample
+
+        pkg = open_package('example.com-iterators')
+        r = pkg.resource('data2')
+        rows = list(r)
+        counts = Counter(row[rows[0].index('column1')] for row in rows[1:])
+
+        s = r.sketch('column1', k=3)
+        self.assertEqual(len(rows) - 1, s.n)
+        self.assertEqual(len(counts), s.distinct)
+        self.assertEqual(counts.most_common(1)[0][1], s.most_common(1)[0][1])
+
+        self.assertEqual(list(range(5)), reservoir_sample(range(5), 10))
+
+        sample = reservoir_sample(range(1000), 10)
+        self.assertEqual(10, len(sample))
+        self.assertEqual(sorted(sample), sample)
+
+    def test_stats(self):
+        from collections import Counter
+
+        pkg = open_package('example.com-iterators')
+        r = pkg.resource('data2')
+        rows = list(r)
+        values = [row[rows[0].index('column1')] for row in rows[1:]]
+
+        ts = r.stats(chunksize=7, k=3)
+        cs = ts['column1']
+
+        self.assertEqual(len(values), cs.rows)
+        self.assertEqual(len([v for v in values if v not in (None, '')]), cs.count)
+        self.assertEqual(len(set(values)), cs.distinct)
+        self.assertEqual(Counter(values).most_common(1)[0][1], cs.most_common(1)[0][1])
+        self.assertEqual(len(r.headers), len(ts.dataframe()))
+
+        r.stats(k=3, write=True)
+        c = r.schema_term.find_first('Table.Column', value='column1')
+        self.assertEqual(str(cs.count), c.get_value('count'))
+
+    def test_open_binary(self):
+        pkg = open_package('example.com-iterators')
+        r = pkg.resource('data2')
+        path = r.resolved_url.get_resource().get_target().fspath
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        with r.open_binary() as f:
+            buf = f.buffer
+            self.assertEqual(data, bytes(buf))
+            buf.release()
+
+            f.seek(0)
+            self.assertEqual(data.splitlines(True)[0], f.readline())
+
+        with open(path) as f:
+            self.assertEqual(f.readlines(), r.readlines())
+
+        self.assertEqual(len(r.dataframe()), len(r.read_csv()))
+
+    def test_read_csv_compressed(self):
+        import gzip
+        from metapack import open_package as op
+
+        ref = write_package(self.temp_dir(), 'e.csv.gz', gzip.compress(b'a,b\n1,x\n2,y\n'),
+                            [('a', 'integer'), ('b', 'string')])
+        r = op(ref).resource('data')
+
+        df = r.read_csv()
+        self.assertEqual([1, 2], list(df['a']))
+        self.assertEqual(['x', 'y'], list(df['b']))
+
 
 if __name__ == '__main__':
     unittest.main()